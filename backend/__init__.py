@@ -1,5 +1,7 @@
 from flask import Flask
 from flask_jwt_extended import JWTManager
+from flask_sock import Sock
+from flask_migrate import Migrate, upgrade
 from dotenv import load_dotenv
 import os
 from .database import db  # Importez comme avant
@@ -9,6 +11,12 @@ load_dotenv()
 
 # Initialisation des extensions
 jwt = JWTManager()
+sock = Sock()  # WebSocket (canal temps réel des parties)
+migrate = Migrate()  # Migrations Alembic (backend/migrations)
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(__file__), "migrations")
+# Applique les migrations en attente au démarrage (0 : flask --app run db upgrade au déploiement)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "1") == "1"
 
 
 def create_app():
@@ -30,8 +38,28 @@ def create_app():
     # Initialisation des extensions
     db.init_app(app)
     jwt.init_app(app)  # <-- Ajoutez cette ligne
+    sock.init_app(app)
+    migrate.init_app(app, db, directory=MIGRATIONS_DIRECTORY)
+
+    from .events import init_events
+    init_events(app)
+
+    from .game_scheduler import init_game_scheduler
+    init_game_scheduler(app)
+
+    from .game_state import game_state
+    game_state.init_app(app)
 
     with app.app_context():
-        db.create_all()
+        if DB_AUTO_MIGRATE:
+            upgrade(directory=MIGRATIONS_DIRECTORY)
+        from .matchmaking import matchmaking
+        matchmaking.rebuild(db.session)
+        # Jobs de détection perdus lors d'un redémarrage (file en mémoire)
+        from .detection_jobs import fail_stale_jobs
+        fail_stale_jobs(db.session)
+
+    from .leaderboards import leaderboards
+    leaderboards.init_app(app)
 
     return app
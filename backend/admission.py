@@ -0,0 +1,137 @@
+"""
+Contrôle d'admission devant l'inférence (/photos/detect, /games/detect).
+
+Deux limites, vérifiées avant de lire l'image envoyée :
+- un seau à jetons par utilisateur (ADMISSION_USER_RATE jetons par seconde,
+  au plus ADMISSION_USER_BURST d'avance) -> 429 ;
+- un nombre max de demandes d'inférence en cours dans le worker
+  (ADMISSION_MAX_IN_FLIGHT) -> 503. Les classes moins urgentes que "battle"
+  sont refusées dès ADMISSION_LOW_PRIORITY_SHARE de cette limite, pour
+  garder de la place aux parties en cours.
+
+Les refus sont immédiats et portent un Retry-After : les routes légères
+restent rapides même quand l'inférence est saturée. Les compteurs sont
+propres au worker.
+"""
+import math
+import os
+import threading
+import time
+from functools import wraps
+from flask import g, jsonify
+from flask_jwt_extended import get_jwt_identity
+
+
+ADMISSION_USER_RATE = float(os.getenv("ADMISSION_USER_RATE", "1"))
+ADMISSION_USER_BURST = float(os.getenv("ADMISSION_USER_BURST", "5"))
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "32"))
+ADMISSION_LOW_PRIORITY_SHARE = float(os.getenv("ADMISSION_LOW_PRIORITY_SHARE", "0.75"))
+# Retry-After (secondes) renvoyé quand la limite globale est atteinte
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "2"))
+
+
+class AdmissionTicket:
+    """Place occupée dans la limite globale ; release() est idempotent"""
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+
+class AdmissionController:
+    def __init__(self, rate: float = ADMISSION_USER_RATE, burst: float = ADMISSION_USER_BURST,
+                 max_in_flight: int = ADMISSION_MAX_IN_FLIGHT,
+                 low_priority_share: float = ADMISSION_LOW_PRIORITY_SHARE):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_in_flight = max(1, max_in_flight)
+        self.low_priority_limit = max(1, int(self.max_in_flight * low_priority_share))
+        self._buckets = {}   # user_id -> (jetons, dernière mise à jour)
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, user_id, priority: str):
+        """
+        Retourne (ticket, None) si la demande est admise,
+        sinon (None, (code HTTP, message, Retry-After en secondes)).
+        """
+        now = time.monotonic()
+        with self._lock:
+            limit = self.max_in_flight if priority == "battle" else self.low_priority_limit
+            if self._in_flight >= limit:
+                return None, (503, "Serveur surchargé, réessayez plus tard", ADMISSION_RETRY_AFTER)
+
+            if self.rate > 0:
+                tokens, updated = self._buckets.get(user_id, (self.burst, now))
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens < 1:
+                    self._buckets[user_id] = (tokens, now)
+                    return None, (429, "Trop de demandes, réessayez plus tard",
+                                  math.ceil((1 - tokens) / self.rate))
+                self._buckets[user_id] = (tokens - 1, now)
+                if len(self._buckets) > 10000:
+                    self._prune(now)
+
+            self._in_flight += 1
+            return AdmissionTicket(self), None
+
+    def _prune(self, now: float):
+        # Un seau redevenu plein équivaut à un seau absent
+        full_after = self.burst / self.rate
+        for user_id, (_, updated) in list(self._buckets.items()):
+            if now - updated >= full_after:
+                del self._buckets[user_id]
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "low_priority_limit": self.low_priority_limit,
+                "tracked_users": len(self._buckets)
+            }
+
+
+admission = AdmissionController()
+
+
+def admission_control(priority: str):
+    """
+    Décorateur de route (après @jwt_required) : refuse tout de suite la
+    demande si l'utilisateur ou le worker est au-dessus de sa limite.
+    La place est libérée à la fin de la requête, sauf si la route la
+    reprend avec take_admission_ticket() (traitement asynchrone).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            ticket, refusal = admission.try_acquire(get_jwt_identity(), priority)
+            if refusal is not None:
+                status, message, retry_after = refusal
+                response = jsonify(error=message)
+                response.headers["Retry-After"] = str(max(1, retry_after))
+                return response, status
+
+            g.admission_ticket = ticket
+            try:
+                return f(*args, **kwargs)
+            finally:
+                ticket = g.pop("admission_ticket", None)
+                if ticket is not None:
+                    ticket.release()
+        return wrapper
+    return decorator
+
+
+def take_admission_ticket():
+    """Reprend la place de la requête courante ; l'appelant devra appeler release()"""
+    return g.pop("admission_ticket", None)
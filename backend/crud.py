@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, update, delete, bindparam, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm.attributes import flag_modified
-from .models import User, Quest, Photo, Game, GameObject, GameParticipant, Friend, Reward, Detection, TrainingAnnotation, ObjectList
+from .models import User, Quest, Photo, Game, GameObject, GameParticipant, ParticipantObject, GameResult, Friend, Reward, ChallengeCompletion, Detection, TrainingAnnotation, ObjectList, DetectionJob
 from datetime import date, datetime, timezone
+from .streaks import advance_streak
+from .leaderboards import leaderboards
+from .pagination import keyset, PAGE_SIZE_DEFAULT
 import uuid
 
 # Utilisateurs
@@ -26,8 +30,9 @@ def get_user_by_username(db: Session, username: str):
 # Quêtes
 
 
-def get_all_quests():
-    return Quest.query.order_by(Quest.quest_date.desc()).all()
+def get_all_quests(limit: int = PAGE_SIZE_DEFAULT, after=None):
+    """Quêtes, plus récentes d'abord, par pages (voir pagination.py)"""
+    return keyset(Quest.query, [Quest.quest_date, Quest.id], after, limit)
 
 
 def get_quest_by_date(target_date: date):
@@ -44,18 +49,53 @@ def get_today_rewards(db: Session, user_id: int):
         func.date(Reward.created_at) == func.date(datetime.now(timezone.utc))
     ).all()
 
-def check_challenge_completed_today(db: Session, user_id: int, challenge_id: int):
-    """Vérifier si un défi a déjà été complété aujourd'hui"""
-    return db.query(Reward).filter_by(
+def completion_day():
+    """Jour (UTC) utilisé pour les complétions de défis"""
+    return datetime.now(timezone.utc).date()
+
+def get_challenge_completion(db: Session, user_id: int, challenge_id: int, day: date = None):
+    """Complétion du défi pour ce jour (aujourd'hui par défaut), ou None"""
+    return db.query(ChallengeCompletion).filter_by(
         user_id=user_id,
-        challenge_id=challenge_id
-    ).filter(
-        func.date(Reward.created_at) == func.date(datetime.now(timezone.utc))
-    ).first() is not None
+        challenge_id=challenge_id,
+        completion_day=day or completion_day()
+    ).first()
 
-def update_user_stats(db: Session, user_id: int, points: int = 0, coins: int = 0):
-    """Met à jour les statistiques d'un utilisateur"""
-    user = get_user(db, user_id)
+def check_challenge_completed_today(db: Session, user_id: int, challenge_id: int):
+    """Vérifier si un défi a déjà été complété aujourd'hui"""
+    return get_challenge_completion(db, user_id, challenge_id) is not None
+
+def record_challenge_completion(db: Session, user_id: int, challenge_id: int, day: date = None):
+    """
+    Enregistre la complétion du jour sans valider la transaction.
+    Retourne son id, ou None si le défi était déjà complété ce jour-là
+    (y compris par une requête concurrente).
+    """
+    return db.execute(
+        pg_insert(ChallengeCompletion)
+        .values(user_id=user_id, challenge_id=challenge_id,
+                completion_day=day or completion_day(), created_at=datetime.utcnow())
+        .on_conflict_do_nothing(constraint="uq_challenge_completion_day")
+        .returning(ChallengeCompletion.id)
+    ).scalar()
+
+def set_completion_reward(db: Session, completion_id: int, reward_id: int):
+    db.execute(update(ChallengeCompletion)
+               .where(ChallengeCompletion.id == completion_id)
+               .values(reward_id=reward_id))
+
+def lock_user(db: Session, user_id: int):
+    """
+    Relit l'utilisateur et verrouille sa ligne jusqu'à la fin de la
+    transaction : deux défis validés en même temps se suivent au lieu de
+    partir du même état (points, streak).
+    """
+    return db.query(User).filter(User.id == user_id).with_for_update().populate_existing().first()
+
+
+def update_user_stats(db: Session, user_id: int, points: int = 0, coins: int = 0, day: date = None):
+    """Met à jour les statistiques d'un utilisateur après un défi complété le jour `day`"""
+    user = lock_user(db, user_id)
     if not user:
         return None
     
@@ -63,47 +103,16 @@ def update_user_stats(db: Session, user_id: int, points: int = 0, coins: int = 0
     user.total_coins += coins
     user.challenges_completed += 1
     
-    # Calculer et mettre à jour le streak
-    current_streak = calculate_user_streak(db, user_id)
-    user.current_streak = current_streak
-    
-    # Mettre à jour le meilleur streak si nécessaire
-    if current_streak > user.longest_streak:
-        user.longest_streak = current_streak
+    # Streak et record avancés en O(1) (voir streaks.py)
+    advance_streak(user, day or completion_day())
     
     user.updated_at = datetime.utcnow()
     
     db.commit()
     db.refresh(user)
+    leaderboards.record_points(user.id, user.total_points, points)
     return user
 
-def calculate_user_streak(db: Session, user_id: int):
-    """Calcule le streak actuel d'un utilisateur"""
-    # Récupérer les récompenses des 30 derniers jours, groupées par date
-    from sqlalchemy import distinct, func
-    
-    reward_dates = db.query(
-        func.date(Reward.created_at).label('reward_date')
-    ).filter_by(user_id=user_id).distinct().order_by(
-        func.date(Reward.created_at).desc()
-    ).limit(30).all()
-    
-    if not reward_dates:
-        return 0
-    
-    streak = 1
-    current_date = reward_dates[0].reward_date
-    
-    for i in range(1, len(reward_dates)):
-        prev_date = reward_dates[i].reward_date
-        if (current_date - prev_date).days == 1:
-            streak += 1
-            current_date = prev_date
-        else:
-            break
-    
-    return streak
-
 def get_user_statistics(db: Session, user_id: int):
     """Récupère les statistiques complètes d'un utilisateur"""
     user = get_user(db, user_id)
@@ -134,8 +143,16 @@ def create_photo(db: Session, user_id: int, file_path: str, is_analysed: bool):
     return photo
 
 
-def get_photos_by_user(user_id: int):
-    return Photo.query.filter_by(user_id=user_id).order_by(Photo.upload_date.desc()).all()
+def get_photos_by_user(user_id: int, limit: int = PAGE_SIZE_DEFAULT, after=None):
+    """Photos de l'utilisateur, plus récentes d'abord, par pages"""
+    return keyset(Photo.query.filter_by(user_id=user_id), [Photo.created_at, Photo.id], after, limit)
+
+
+def count_user_photos(db: Session, user_id: int):
+    """(nombre de photos, nombre de photos analysées) de l'utilisateur"""
+    return tuple(db.query(
+        func.count(Photo.id), func.count(Photo.id).filter(Photo.is_analysed.is_(True))
+    ).filter(Photo.user_id == user_id).one())
 
 
 def get_photo_by_id(photo_id: int, user_id: int):
@@ -160,9 +177,78 @@ def create_detection(db: Session, photo_id: int, object_name: str, confidence: f
     return detection
 
 
+def create_detections_bulk(db: Session, photo_id: int, rows: list[dict], commit: bool = True):
+    """
+    Insère toutes les détections d'une photo en un seul INSERT multi-lignes.
+    Chaque ligne contient les colonnes de Detection (object_name, confidence,
+    bbox, challenge_object, ...). Retourne les ids dans l'ordre des lignes.
+    """
+    if not rows:
+        return []
+    result = db.execute(
+        insert(Detection).values([{**row, "photo_id": photo_id} for row in rows]).returning(Detection.id)
+    )
+    ids = [row_id for (row_id,) in result]
+    if commit:
+        db.commit()
+    return ids
+
+
+def create_photo_with_detections(db: Session, user_id: int, file_path: str, rows: list[dict]):
+    """Enregistre une photo analysée et ses détections dans une seule transaction"""
+    photo = Photo(user_id=user_id, file_path=file_path, is_analysed=True)
+    db.add(photo)
+    db.flush()  # Récupère photo.id sans valider la transaction
+    ids = create_detections_bulk(db, photo.id, rows, commit=False)
+    db.commit()
+    return photo, ids
+
+
 def get_detections_by_photo_id(photo_id: int):
     return Detection.query.filter_by(photo_id=photo_id).all()
 
+
+# Jobs de détection asynchrones
+
+def create_detection_job(db: Session, job_id: str, user_id: int):
+    job = DetectionJob(id=job_id, user_id=user_id, status="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_detection_job(db: Session, job_id: str, user_id: int):
+    return db.query(DetectionJob).filter_by(id=job_id, user_id=user_id).first()
+
+
+def update_detection_job(db: Session, job_id: str, status: str, result: dict = None,
+                         error: str = None, finished_at: datetime = None):
+    job = db.query(DetectionJob).filter(DetectionJob.id == job_id).first()
+    if not job:
+        return None
+    job.status = status
+    if result is not None:
+        job.result = result
+    if error is not None:
+        job.error = error
+    if finished_at is not None:
+        job.finished_at = finished_at
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def fail_stale_detection_jobs(db: Session, created_before: datetime, error: str):
+    """Passe en échec les jobs encore en file ou en cours créés avant `created_before`"""
+    count = db.query(DetectionJob).filter(
+        DetectionJob.status.in_(("queued", "running")),
+        DetectionJob.created_at < created_before
+    ).update({"status": "failed", "error": error, "finished_at": datetime.utcnow()},
+             synchronize_session=False)
+    db.commit()
+    return count
+
 # --- Parties de jeu ---
 
 def create_game(db: Session, creator_id: int,
@@ -242,6 +328,47 @@ def add_game_object(db: Session, game_id: int, object_to_find: str, order_index:
     db.refresh(obj)
     return obj
 
+def start_game_countdown(db: Session, game_id: int, start_timestamp: datetime, object_names: list[str]):
+    """
+    Lance le compte à rebours d'une partie en une seule transaction : objets
+    de la partie, objets de chaque participant et statut "starting".
+
+    La ligne de la partie est verrouillée (SELECT ... FOR UPDATE) : si deux
+    départs se croisent, le second attend puis voit la partie déjà lancée et
+    ne modifie rien. Pour une revanche (partie terminée), les résultats figés
+    de la manche précédente sont supprimés dans la même transaction.
+    Retourne la partie, ou None si elle n'est pas lançable.
+    """
+    # populate_existing : relit le statut même si la partie est déjà en session
+    game = db.query(Game).filter(Game.id == game_id).with_for_update().populate_existing().first()
+    if not game or game.status in ("starting", "in_progress"):
+        db.rollback()
+        return None
+
+    db.execute(delete(GameResult).where(GameResult.game_id == game_id))
+    db.execute(delete(GameObject).where(GameObject.game_id == game_id))
+    db.execute(insert(GameObject), [
+        {"game_id": game_id, "object_to_find": name, "order_index": order_index}
+        for order_index, name in enumerate(object_names, start=1)
+    ])
+
+    participant_ids = [row.id for row in db.execute(
+        update(GameParticipant)
+        .where(GameParticipant.game_id == game_id)
+        .values(status="ready", start_time=None, end_time=None,  # Statut intermédiaire
+                version=GameParticipant.version + 1)
+        .returning(GameParticipant.id)
+    )]
+    create_participant_objects(db, participant_ids, object_names, commit=False)
+
+    game.status = "starting"
+    game.start_timestamp = start_timestamp
+    game.end_timestamp = None
+    db.commit()
+    db.refresh(game)
+    return game
+
+
 def list_game_objects(db: Session, game_id: int):
     return db.query(GameObject).filter_by(game_id=game_id).order_by(GameObject.order_index).all()
 
@@ -269,6 +396,42 @@ def add_participant(db: Session, game_id: int, user_id: int, is_creator: bool =
     return participant
 
 
+def join_open_game(db: Session, game_id: int, user_id: int):
+    """
+    Ajoute `user_id` à une partie publique en attente qui a encore de la
+    place. La ligne de la partie est verrouillée pour que deux joueurs ne
+    prennent pas la même dernière place.
+    Retourne (partie, participant ou None, nombre de joueurs, inséré) :
+    `inséré` est faux si le joueur était déjà dans la partie.
+    """
+    game = db.query(Game).filter(Game.id == game_id).with_for_update().populate_existing().first()
+    if not game or not game.is_public or game.status != "waiting":
+        db.rollback()
+        return game, None, 0, False
+
+    player_count = db.query(func.count(GameParticipant.id)).filter(GameParticipant.game_id == game_id).scalar()
+    existing = db.query(GameParticipant).filter_by(game_id=game_id, user_id=user_id).first()
+    if existing or player_count >= game.max_players:
+        db.rollback()
+        return game, existing, player_count, False
+
+    participant = GameParticipant(
+        game_id=game_id,
+        user_id=user_id,
+        join_code=uuid.uuid4().hex[:8],
+        is_creator=False,
+        objects_to_find=[obj.object_to_find for obj in list_game_objects(db, game_id)],
+        start_time=None,
+        end_time=None,
+        lap_times=[],
+        status='pending'
+    )
+    db.add(participant)
+    db.commit()
+    db.refresh(participant)
+    return game, participant, player_count + 1, True
+
+
 def list_participants(db: Session, game_id: int):
     return db.query(GameParticipant).filter_by(game_id=game_id).all()
 
@@ -276,6 +439,13 @@ def list_participants(db: Session, game_id: int):
 def get_participant(db: Session, participant_id: int):
     return db.query(GameParticipant).filter_by(id=participant_id).first()
 
+
+def is_game_member(db: Session, game_id: int, user_id: int):
+    """Vrai si l'utilisateur participe à la partie ou l'a créée"""
+    if db.query(GameParticipant.id).filter_by(game_id=game_id, user_id=user_id).first() is not None:
+        return True
+    return db.query(Game.id).filter_by(id=game_id, creator_id=user_id).first() is not None
+
 def update_participant_objects(db: Session, participant_id: int, objects: list[dict]):
     participant = db.query(GameParticipant).filter(GameParticipant.id == participant_id).first()
     if not participant:
@@ -297,6 +467,177 @@ def update_participant_status_and_start(db: Session, participant_id: int, start_
     return participant
 
 
+# Progression des participants (une ligne par participant et par objet)
+
+def create_participant_objects(db: Session, participant_ids: list[int], object_names: list[str], commit: bool = True):
+    """Remplace les objets des participants par `object_names` (order_index à partir de 1)"""
+    if not participant_ids:
+        return
+    db.execute(delete(ParticipantObject).where(ParticipantObject.participant_id.in_(participant_ids)))
+    db.execute(insert(ParticipantObject), [
+        {"participant_id": participant_id, "order_index": order_index, "object_name": name}
+        for participant_id in participant_ids
+        for order_index, name in enumerate(object_names, start=1)
+    ])
+    if commit:
+        db.commit()
+
+
+def list_participant_objects(db: Session, participant_ids: list[int]):
+    """{participant_id: [ParticipantObject triés par order_index]} en une requête"""
+    progress = {participant_id: [] for participant_id in participant_ids}
+    if not participant_ids:
+        return progress
+    rows = db.query(ParticipantObject).filter(
+        ParticipantObject.participant_id.in_(participant_ids)
+    ).order_by(ParticipantObject.participant_id, ParticipantObject.order_index).all()
+    for row in rows:
+        progress[row.participant_id].append(row)
+    return progress
+
+
+def save_participant_progress(db: Session, object_rows: list[dict], participant_rows: list[dict]):
+    """
+    Écrit des changements de progression en une transaction.
+    `object_rows` : une ligne participant_objects par dict (participant_id,
+    order_index et colonnes modifiées) ; `participant_rows` : id, version
+    lue, status, end_time.
+
+    Chaque participant est écrit en compare-and-swap sur `version` : si un
+    autre process l'a modifié depuis la lecture, rien n'est écrit pour lui.
+    Retourne les ids de ces participants en conflit.
+    """
+    conflicts = set()
+    for row in participant_rows:
+        result = db.execute(
+            update(GameParticipant.__table__)
+            .where(GameParticipant.id == row["id"], GameParticipant.version == row["version"])
+            .values(status=row["status"], end_time=row["end_time"], version=GameParticipant.version + 1)
+        )
+        if result.rowcount == 0:
+            conflicts.add(row["id"])
+
+    object_rows = [row for row in object_rows if row["participant_id"] not in conflicts]
+    table = ParticipantObject.__table__
+    if object_rows:
+        db.execute(
+            update(table).where(
+                table.c.participant_id == bindparam("b_participant_id"),
+                table.c.order_index == bindparam("b_order_index")
+            ),
+            [{"b_participant_id": row["participant_id"], "b_order_index": row["order_index"],
+              **{k: v for k, v in row.items() if k not in ("participant_id", "order_index")}}
+             for row in object_rows]
+        )
+    db.commit()
+    return conflicts
+
+
+def backfill_participant_objects(db: Session, participant_ids: list[int] = None):
+    """
+    Copie objects_to_find / lap_times (JSON) vers participant_objects, en une
+    requête SQL. Les lignes déjà présentes sont conservées.
+    """
+    where = "WHERE gp.id = ANY(:ids)" if participant_ids is not None else ""
+    result = db.execute(text(f"""
+        INSERT INTO participant_objects
+            (participant_id, order_index, object_name, found, skipped, lap_start, lap_end)
+        SELECT gp.id,
+               (o->>'order_index')::int,
+               o->>'objectname',
+               COALESCE((o->>'found')::boolean, false),
+               COALESCE((o->>'skipped')::boolean, false),
+               (lap->>'start_time')::timestamp,
+               (lap->>'end_time')::timestamp
+        FROM game_participants gp
+        CROSS JOIN LATERAL json_array_elements(
+            CASE WHEN json_typeof(gp.objects_to_find::json) = 'array' THEN gp.objects_to_find::json ELSE '[]'::json END
+        ) o
+        LEFT JOIN LATERAL (
+            SELECT l FROM json_array_elements(
+                CASE WHEN json_typeof(gp.lap_times::json) = 'array' THEN gp.lap_times::json ELSE '[]'::json END
+            ) l
+            WHERE l->>'order_index' = o->>'order_index'
+            LIMIT 1
+        ) laps(lap) ON true
+        {where}
+        {"AND" if where else "WHERE"} json_typeof(o) = 'object' AND o->>'order_index' IS NOT NULL
+        ON CONFLICT (participant_id, order_index) DO NOTHING
+    """), {"ids": list(participant_ids or [])})
+    db.commit()
+    return result.rowcount
+
+
+# Résultats des parties terminées
+
+def get_game_result(db: Session, game_id: int):
+    return db.query(GameResult).filter(GameResult.game_id == game_id).first()
+
+
+def create_game_result(db: Session, game_id: int, results: dict, etag: str):
+    """Enregistre le résultat ; si un autre process l'a déjà fait, garde le sien"""
+    db.execute(
+        pg_insert(GameResult)
+        .values(game_id=game_id, results=results, etag=etag, created_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["game_id"])
+    )
+    db.commit()
+    return get_game_result(db, game_id)
+
+
+# Transitions planifiées des parties (voir game_scheduler.py)
+
+def list_starting_games(db: Session):
+    """(id, start_timestamp) des parties en compte à rebours"""
+    return db.query(Game.id, Game.start_timestamp).filter(
+        Game.status == "starting", Game.start_timestamp.isnot(None)
+    ).all()
+
+
+def start_game_if_due(db: Session, game_id: int, now: datetime):
+    """
+    Passe la partie de "starting" à "in_progress" avec tous ses participants,
+    en une seule transaction. L'UPDATE conditionnel garantit qu'un seul
+    appelant (thread ou worker) effectue la transition ; les autres reçoivent None.
+    """
+    started = db.execute(
+        update(Game)
+        .where(Game.id == game_id, Game.status == "starting", Game.start_timestamp <= now)
+        .values(status="in_progress")
+        .returning(Game.start_timestamp)
+    ).first()
+    if started is None:
+        db.rollback()
+        return None
+    db.execute(
+        update(GameParticipant)
+        .where(GameParticipant.game_id == game_id)
+        .values(status="in_progress", start_time=started.start_timestamp,
+                version=GameParticipant.version + 1)
+    )
+    db.commit()
+    return get_game(db, game_id)
+
+
+def expire_games(db: Session, status: str, older_than: datetime, new_status: str, column=None):
+    """
+    Change en masse le statut des parties `status` dont `column`
+    (created_at par défaut) est antérieur à `older_than`. Retourne les parties modifiées.
+    """
+    column = column if column is not None else Game.created_at
+    values = {"status": new_status}
+    if new_status == "finished":
+        values["end_timestamp"] = datetime.utcnow()
+    ids = [row.id for row in db.execute(
+        update(Game)
+        .where(Game.status == status, column < older_than)
+        .values(**values)
+        .returning(Game.id)
+    )]
+    db.commit()
+    return db.query(Game).filter(Game.id.in_(ids)).all() if ids else []
+
+
 # Amis
 
 
@@ -311,10 +652,25 @@ def add_friend(db: Session, user_id: int, friend_id: int):
 def get_friends(db: Session, user_id: int):
     return db.query(Friend).filter(Friend.user_id == user_id).all()
 
+
+def list_friend_ids(db: Session, user_id: int):
+    """Ids des amis, dans les deux sens de la relation"""
+    rows = db.query(Friend.user_id, Friend.friend_id).filter(
+        (Friend.user_id == user_id) | (Friend.friend_id == user_id)
+    ).all()
+    return {friend_id if uid == user_id else uid for uid, friend_id in rows}
+
+
+def get_usernames(db: Session, user_ids):
+    if not user_ids:
+        return {}
+    return dict(db.query(User.id, User.username).filter(User.id.in_(list(user_ids))).all())
+
 # Récompenses
 
 
-def add_reward(db: Session, user_id: int, reward_type: str, reward_value: str, challenge_id: int = None):
+def add_reward(db: Session, user_id: int, reward_type: str, reward_value: str, challenge_id: int = None,
+               commit: bool = True):
     reward = Reward(
         user_id=user_id,
         reward_type=reward_type,
@@ -322,13 +678,23 @@ def add_reward(db: Session, user_id: int, reward_type: str, reward_value: str, c
         challenge_id=challenge_id  # Nouveau paramètre
     )
     db.add(reward)
-    db.commit()
-    db.refresh(reward)
+    if commit:
+        db.commit()
+        db.refresh(reward)
+    else:
+        db.flush()
     return reward
 
 
-def get_rewards(db: Session, user_id: int):
-    return db.query(Reward).filter(Reward.user_id == user_id).all()
+def get_rewards(db: Session, user_id: int, limit: int = PAGE_SIZE_DEFAULT, after=None):
+    """Récompenses de l'utilisateur, plus récentes d'abord, par pages"""
+    return keyset(db.query(Reward).filter(Reward.user_id == user_id),
+                  [Reward.created_at, Reward.id], after, limit)
+
+
+def get_recent_rewards(db: Session, user_id: int, limit: int = 10):
+    return db.query(Reward).filter(Reward.user_id == user_id).order_by(
+        Reward.created_at.desc(), Reward.id.desc()).limit(limit).all()
 
 # Entrainement de l'IA (annotations)
 
@@ -348,8 +714,10 @@ def create_annotation(db: Session, photo_id: int, user_id: int,
     return ann
 
 
-def get_annotations_by_user(db: Session, user_id: int):
-    return db.query(TrainingAnnotation).filter_by(user_id=user_id).all()
+def get_annotations_by_user(db: Session, user_id: int, limit: int = PAGE_SIZE_DEFAULT, after=None):
+    """Annotations de l'utilisateur, plus récentes d'abord, par pages"""
+    return keyset(db.query(TrainingAnnotation).filter_by(user_id=user_id),
+                  [TrainingAnnotation.created_at, TrainingAnnotation.id], after, limit)
 
 
 def get_annotations_by_photo(db: Session, user_id: int, photo_id: int):
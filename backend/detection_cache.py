@@ -0,0 +1,88 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from flask import has_app_context
+
+
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "1024"))
+# "1" = garder aussi les résultats dans la table detection_cache
+DETECTION_CACHE_PERSISTENT = os.getenv("DETECTION_CACHE_PERSISTENT", "0") == "1"
+
+
+def hash_image_bytes(data: bytes):
+    """Empreinte SHA-256 du fichier envoyé"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DetectionCache:
+    """
+    Cache des détections par contenu d'image.
+
+    La clé est (hash des octets, version du modèle, variante) : la variante
+    distingue une détection complète d'une cascade ou d'une vérification
+    ciblée, qui ne renvoient pas les mêmes détections. Un LRU borné garde
+    les entrées récentes en mémoire ; la table detection_cache, optionnelle,
+    les partage entre workers et redémarrages.
+    """
+
+    def __init__(self, maxsize: int = DETECTION_CACHE_SIZE, persistent: bool = DETECTION_CACHE_PERSISTENT):
+        self.maxsize = maxsize
+        self.persistent = persistent
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_hash: str, model_version: str, variant: str):
+        key = (image_hash, model_version, variant)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        # La table n'est accessible que dans un contexte Flask
+        if not self.persistent or not has_app_context():
+            return None
+
+        from .database import db
+        from .models import DetectionCacheEntry
+
+        entry = db.session.query(DetectionCacheEntry).filter_by(
+            image_hash=image_hash, model_version=model_version, variant=variant
+        ).first()
+        if entry is None:
+            return None
+        self._remember(key, entry.detections)
+        return entry.detections
+
+    def put(self, image_hash: str, model_version: str, variant: str, detections):
+        self._remember((image_hash, model_version, variant), detections)
+
+        if not self.persistent or not has_app_context():
+            return
+
+        from sqlalchemy.dialects.postgresql import insert
+        from sqlalchemy.orm import Session
+        from .database import db
+        from .models import DetectionCacheEntry
+
+        # Session à part : valider db.session validerait aussi les écritures
+        # en cours de la requête appelante
+        with Session(db.engine) as session:
+            # ON CONFLICT : deux requêtes identiques peuvent finir en même temps
+            session.execute(insert(DetectionCacheEntry).values(
+                image_hash=image_hash,
+                model_version=model_version,
+                variant=variant,
+                detections=detections
+            ).on_conflict_do_nothing())
+            session.commit()
+
+    def _remember(self, key, detections):
+        with self._lock:
+            self._entries[key] = detections
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+detection_cache = DetectionCache()
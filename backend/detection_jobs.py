@@ -0,0 +1,170 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from .database import db
+from .crud import (
+    create_photo, create_photo_with_detections, create_detections_bulk,
+    create_detection_job, update_detection_job, fail_stale_detection_jobs
+)
+from .events import publish_event
+from .admission import take_admission_ticket
+from .utils import detect_objects, verify_object, detect_objects_in_background
+
+
+# Threads qui traitent la file des détections asynchrones (par worker web)
+DETECTION_JOB_WORKERS = int(os.getenv("DETECTION_JOB_WORKERS", "4"))
+# Un job encore en file ou en cours après ce délai a été perdu (worker
+# redémarré) : la file est en mémoire, il ne sera jamais repris
+DETECTION_JOB_STALE_SECONDS = int(os.getenv("DETECTION_JOB_STALE_SECONDS", "600"))
+
+_job_executor = ThreadPoolExecutor(max_workers=DETECTION_JOB_WORKERS, thread_name_prefix="detection-job")
+
+
+def job_channel(job_id: str):
+    return f"job:{job_id}"
+
+
+def detection_row(det, challenge_object=None, challenge_id=None, game_participant_id=None):
+    """Ligne de la table detections pour une détection YOLO"""
+    return {
+        "object_name": det["name"],
+        "confidence": det["score"],
+        "bbox": {"box": det["box"]},
+        "challenge_object": challenge_object,
+        "is_challenge_object": bool(challenge_object) and det["name"].lower() == challenge_object.lower(),
+        "challenge_id": challenge_id,
+        "game_participant_id": game_participant_id
+    }
+
+
+def run_photo_detection(user_id, upload, challenge_id=None, challenge_object=None, verify=False):
+    """
+    Enregistre la photo, lance la détection et retourne la réponse de /photos/detect.
+
+    Avec `verify`, seule la classe du défi est analysée avant la réponse ;
+    la détection complète est enregistrée en arrière-plan.
+    """
+    # Un défi du jour passe avant une simple photo de galerie
+    priority = "daily" if challenge_id is not None else "gallery"
+    if challenge_object and verify:
+        photo = create_photo(db.session, file_path=upload.file_url,
+                             user_id=user_id, is_analysed=True)
+        found, matches = verify_object(upload.image, challenge_object,
+                                       image_hash=upload.image_hash, scale=upload.scale,
+                                       priority=priority)
+        app_obj = current_app._get_current_object()
+        photo_id = photo.id
+
+        def save_full_detections(detections):
+            with app_obj.app_context():
+                create_detections_bulk(db.session, photo_id, [
+                    detection_row(det, challenge_object, challenge_id) for det in detections
+                ])
+
+        detect_objects_in_background(upload.image, save_full_detections,
+                                     image_hash=upload.image_hash, scale=upload.scale)
+
+        return {
+            "photo": {"id": photo.id, "file_path": photo.file_path},
+            "detections": [{
+                "object_name": det["name"],
+                "confidence": det["score"],
+                "bbox": {"box": det["box"]},
+                "challenge_object": challenge_object,
+                "is_challenge_object": True,
+                "challenge_id": challenge_id
+            } for det in matches],
+            "challenge_completed": found
+        }
+
+    # L'objet du défi étant connu, la cascade peut éviter yolo11x
+    detections = detect_objects(upload.image, target=challenge_object,
+                                image_hash=upload.image_hash, scale=upload.scale,
+                                priority=priority)
+
+    # Photo et détections écrites en une seule transaction
+    rows = [detection_row(det, challenge_object, challenge_id) for det in detections]
+    photo, ids = create_photo_with_detections(db.session, user_id, upload.file_url, rows)
+
+    detection_entries = [{
+        "id": detection_id,
+        "object_name": row["object_name"],
+        "confidence": row["confidence"],
+        "bbox": row["bbox"],
+        "challenge_object": row["challenge_object"],
+        "is_challenge_object": row["is_challenge_object"],
+        "challenge_id": row["challenge_id"]
+    } for detection_id, row in zip(ids, rows)]
+    return {
+        "photo": {"id": photo.id, "file_path": photo.file_path},
+        "detections": detection_entries,
+        "challenge_completed": any(det["is_challenge_object"] for det in detection_entries)
+    }
+
+
+def _run_job(app, job_id, user_id, upload, challenge_id, challenge_object, verify, ticket=None):
+    with app.app_context():
+        update_detection_job(db.session, job_id, status="running")
+        try:
+            result = run_photo_detection(user_id, upload, challenge_id, challenge_object, verify)
+        except Exception as e:
+            db.session.rollback()
+            update_detection_job(db.session, job_id, status="failed", error=str(e),
+                                 finished_at=datetime.utcnow())
+            publish_event(job_channel(job_id), "failed", {"job_id": job_id, "error": str(e)})
+            return
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+        update_detection_job(db.session, job_id, status="done", result=result,
+                             finished_at=datetime.utcnow())
+        publish_event(job_channel(job_id), "done", {"job_id": job_id, "result": result})
+
+
+def submit_detection_job(user_id, upload, challenge_id=None, challenge_object=None, verify=False):
+    """
+    Enregistre un job de détection et le place dans la file ; retourne le job.
+    La place d'admission de la requête (admission.py) reste prise jusqu'à la
+    fin du job. Elle n'est reprise qu'une fois le job enregistré : si
+    l'enregistrement échoue, la requête la libère comme d'habitude.
+    """
+    job = create_detection_job(db.session, uuid.uuid4().hex, user_id)
+    ticket = take_admission_ticket()
+    try:
+        _job_executor.submit(_run_job, current_app._get_current_object(), job.id, user_id,
+                             upload, challenge_id, challenge_object, verify, ticket)
+    except Exception:
+        if ticket is not None:
+            ticket.release()
+        raise
+    return job
+
+
+def fail_stale_jobs(session):
+    """Passe en échec les jobs perdus (appelé au démarrage) ; retourne leur nombre"""
+    return fail_stale_detection_jobs(
+        session, datetime.utcnow() - timedelta(seconds=DETECTION_JOB_STALE_SECONDS),
+        "Job interrompu par un redémarrage du serveur")
+
+
+def expire_if_stale(session, job):
+    """Passe `job` en échec s'il a été perdu depuis le démarrage ; retourne le job à jour"""
+    stale_before = datetime.utcnow() - timedelta(seconds=DETECTION_JOB_STALE_SECONDS)
+    if job.status in ("queued", "running") and job.created_at < stale_before:
+        fail_stale_jobs(session)
+        session.refresh(job)
+    return job
+
+
+def serialize_job(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None
+    }
@@ -0,0 +1,137 @@
+import json
+import os
+import select
+import threading
+import time
+from collections import defaultdict
+from queue import Queue, Empty
+
+
+# "memory" : événements visibles seulement dans le worker qui les publie
+# "postgres" : diffusés à tous les workers via LISTEN/NOTIFY
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+PG_NOTIFY_CHANNEL = "pikit_events"
+
+
+class EventBroker:
+    """
+    Publication/abonnement en mémoire, par canal (ex: "job:<id>").
+
+    Chaque abonné reçoit sa propre file ; publish() ne bloque jamais.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str):
+        queue = Queue()
+        with self._lock:
+            self._subscribers[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel: str, queue):
+        with self._lock:
+            self._subscribers[channel].discard(queue)
+            if not self._subscribers[channel]:
+                del self._subscribers[channel]
+
+    def publish(self, channel: str, event: str, data: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for queue in subscribers:
+            queue.put((event, data))
+
+
+broker = EventBroker()
+
+
+class PostgresEventBridge:
+    """
+    Relaie les événements entre workers web via LISTEN/NOTIFY.
+
+    publish() envoie un NOTIFY ; chaque worker (y compris l'émetteur)
+    écoute le canal et republie les messages sur son broker local.
+    """
+
+    def __init__(self, dsn: str, local_broker: EventBroker):
+        self.dsn = dsn
+        self.broker = local_broker
+        self._connection = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    def publish(self, channel: str, event: str, data: dict):
+        payload = json.dumps({"channel": channel, "event": event, "data": data}, default=str)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._connection is None or self._connection.closed:
+                        self._connection = self._connect()
+                    with self._connection.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (PG_NOTIFY_CHANNEL, payload))
+                    return
+                except Exception:
+                    self._connection = None
+                    if attempt:
+                        raise
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+            self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                conn = self._connect()
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {PG_NOTIFY_CHANNEL}")
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        message = json.loads(conn.notifies.pop(0).payload)
+                        self.broker.publish(message["channel"], message["event"], message["data"])
+            except Exception as e:
+                print(f"Events listener error: {e}, reconnecting")
+                time.sleep(1)
+
+
+_bridge = None
+
+
+def init_events(app):
+    """Active la diffusion entre workers si EVENTS_BACKEND=postgres"""
+    global _bridge
+    if EVENTS_BACKEND == "postgres" and _bridge is None:
+        _bridge = PostgresEventBridge(app.config["SQLALCHEMY_DATABASE_URI"], broker)
+        _bridge.start()
+
+
+def publish_event(channel: str, event: str, data: dict):
+    """Publie un événement à tous les abonnés, dans tous les workers si possible"""
+    if _bridge is not None:
+        _bridge.publish(channel, event, data)
+    else:
+        broker.publish(channel, event, data)
+
+
+def format_sse(event: str, data: dict):
+    """Formate un message Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def next_event(queue, timeout: float):
+    """Attend un événement ; None si rien n'arrive avant `timeout`"""
+    try:
+        return queue.get(timeout=timeout)
+    except Empty:
+        return None
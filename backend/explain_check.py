@@ -0,0 +1,181 @@
+"""
+Vérifie les plans des requêtes de lecture de crud.py : aucune ne doit
+parcourir une table entière.
+
+Dans une transaction annulée à la fin, le script insère un petit jeu de
+données, appelle chaque fonction de crud.py en capturant le SQL émis, puis
+lance EXPLAIN sur chaque requête avec enable_seqscan désactivé : s'il reste
+un Seq Scan, ou un parcours d'index sans condition, aucun index ne sert la
+requête. Le code de sortie est 1 dans ce cas ; les tests font la même
+vérification avec RUN_DB_TESTS=1 (tests/test_explain_check.py).
+ALLOWED_SCANS liste les parcours voulus, chacun avec sa raison.
+
+    python -m backend.explain_check
+"""
+import json
+import sys
+import uuid
+from datetime import date, datetime
+from types import SimpleNamespace
+from sqlalchemy import event, text
+from .database import db
+from . import crud
+from .models import (
+    User, Quest, Photo, Detection, Reward, Friend, Game, GameObject, GameParticipant,
+    ParticipantObject, GameResult, TrainingAnnotation, ObjectList, DetectionJob, ChallengeCompletion
+)
+
+
+# (fonction, problème) acceptés : la première page des quêtes n'a pas de
+# filtre, elle lit l'index (quest_date, id) dans l'ordre et s'arrête après
+# `limit` lignes (LIMIT), sans parcourir la table.
+ALLOWED_SCANS = {
+    ("get_all_quests", "Index Scan without condition on quests"),
+    ("get_all_quests", "Index Only Scan without condition on quests"),
+}
+
+
+def seed(session):
+    """Une ligne de chaque sorte, reliées entre elles ; rien n'est validé"""
+    suffix = uuid.uuid4().hex[:8]
+    user = User(username=f"explain-{suffix}", email=f"explain-{suffix}@example.invalid", password_hash="-")
+    friend = User(username=f"explain-f-{suffix}", email=f"explain-f-{suffix}@example.invalid", password_hash="-")
+    quest = Quest(name="explain", object_to_find="cup", reward_points=1, quest_date=date(1900, 1, 1))
+    session.add_all([user, friend, quest])
+    session.flush()
+
+    photo = Photo(user_id=user.id, file_path="explain.jpg", is_analysed=True)
+    game = Game(creator_id=user.id, code=suffix, status="starting", start_timestamp=datetime.utcnow(),
+                created_at=datetime.utcnow())
+    object_list = ObjectList(name=f"explain-{suffix}", list='["cup"]')
+    session.add_all([photo, game, object_list])
+    session.flush()
+
+    participant = GameParticipant(game_id=game.id, user_id=user.id, objects_to_find=[], lap_times=[],
+                                  is_creator=True, status="ready", created_at=datetime.utcnow())
+    job = DetectionJob(id=suffix, user_id=user.id, status="queued", created_at=datetime.utcnow())
+    reward = Reward(user_id=user.id, reward_type="points", reward_value="1", challenge_id=quest.id,
+                    created_at=datetime.utcnow())
+    annotation = TrainingAnnotation(photo_id=photo.id, user_id=user.id, object_name="cup",
+                                    bbox={"box": [0, 0, 1, 1]}, created_at=datetime.utcnow())
+    session.add_all([
+        participant, job, reward, annotation,
+        Detection(photo_id=photo.id, object_name="cup", confidence=0.9, bbox={"box": [0, 0, 1, 1]}),
+        ChallengeCompletion(user_id=user.id, challenge_id=quest.id, completion_day=crud.completion_day()),
+        Friend(user_id=user.id, friend_id=friend.id),
+        GameObject(game_id=game.id, object_to_find="cup", order_index=1),
+        GameResult(game_id=game.id, results={}, etag="-", created_at=datetime.utcnow()),
+    ])
+    session.flush()
+    session.add(ParticipantObject(participant_id=participant.id, order_index=1, object_name="cup"))
+    session.flush()
+
+    return SimpleNamespace(user=user, quest=quest, photo=photo, game=game, participant=participant,
+                           job=job, object_list=object_list, reward=reward, annotation=annotation)
+
+
+def crud_queries(s):
+    """(nom, appel) des fonctions de lecture de crud.py"""
+    session = db.session
+    return [
+        ("get_user", lambda: crud.get_user(session, s.user.id)),
+        ("get_user_by_username", lambda: crud.get_user_by_username(session, s.user.username)),
+        ("lock_user", lambda: crud.lock_user(session, s.user.id)),
+        ("get_today_rewards", lambda: crud.get_today_rewards(session, s.user.id)),
+        ("get_challenge_completion", lambda: crud.get_challenge_completion(session, s.user.id, s.quest.id)),
+        ("check_challenge_completed_today",
+         lambda: crud.check_challenge_completed_today(session, s.user.id, s.quest.id)),
+        ("get_rewards", lambda: crud.get_rewards(session, s.user.id)),
+        ("get_rewards (page 2)",
+         lambda: crud.get_rewards(session, s.user.id, after=[s.reward.created_at.isoformat(), s.reward.id])),
+        ("get_recent_rewards", lambda: crud.get_recent_rewards(session, s.user.id)),
+        ("get_all_quests", lambda: crud.get_all_quests()),
+        ("get_all_quests (page 2)",
+         lambda: crud.get_all_quests(after=[s.quest.quest_date.isoformat(), s.quest.id])),
+        ("get_quest_by_date", lambda: crud.get_quest_by_date(s.quest.quest_date)),
+        ("get_quest_by_id", lambda: crud.get_quest_by_id(s.quest.id)),
+        ("get_photos_by_user", lambda: crud.get_photos_by_user(s.user.id)),
+        ("get_photos_by_user (page 2)",
+         lambda: crud.get_photos_by_user(s.user.id, after=[s.photo.created_at.isoformat(), s.photo.id])),
+        ("count_user_photos", lambda: crud.count_user_photos(session, s.user.id)),
+        ("get_photo_by_id", lambda: crud.get_photo_by_id(s.photo.id, s.user.id)),
+        ("get_detections_by_photo_id", lambda: crud.get_detections_by_photo_id(s.photo.id)),
+        ("get_detection_job", lambda: crud.get_detection_job(session, s.job.id, s.user.id)),
+        ("get_game", lambda: crud.get_game(session, s.game.id)),
+        ("get_game_by_code", lambda: crud.get_game_by_code(session, s.game.code)),
+        ("list_game_objects", lambda: crud.list_game_objects(session, s.game.id)),
+        ("list_participants", lambda: crud.list_participants(session, s.game.id)),
+        ("get_participant", lambda: crud.get_participant(session, s.participant.id)),
+        ("is_game_member", lambda: crud.is_game_member(session, s.game.id, s.user.id + 1)),
+        ("list_participant_objects", lambda: crud.list_participant_objects(session, [s.participant.id])),
+        ("get_game_result", lambda: crud.get_game_result(session, s.game.id)),
+        ("list_starting_games", lambda: crud.list_starting_games(session)),
+        ("get_friends", lambda: crud.get_friends(session, s.user.id)),
+        ("list_friend_ids", lambda: crud.list_friend_ids(session, s.user.id)),
+        ("get_annotations_by_user", lambda: crud.get_annotations_by_user(session, s.user.id)),
+        ("get_annotations_by_user (page 2)",
+         lambda: crud.get_annotations_by_user(
+             session, s.user.id, after=[s.annotation.created_at.isoformat(), s.annotation.id])),
+        ("get_annotations_by_photo", lambda: crud.get_annotations_by_photo(session, s.user.id, s.photo.id)),
+        ("get_object_list_by_name", lambda: crud.get_object_list_by_name(session, s.object_list.name)),
+    ]
+
+
+def full_scans(plan):
+    """Nœuds du plan qui lisent une table entière"""
+    found = []
+    if plan["Node Type"] == "Seq Scan":
+        found.append(f"Seq Scan on {plan.get('Relation Name')}")
+    elif plan["Node Type"] in ("Index Scan", "Index Only Scan") and "Index Cond" not in plan:
+        found.append(f"{plan['Node Type']} without condition on {plan.get('Relation Name')}")
+    for child in plan.get("Plans", []):
+        found.extend(full_scans(child))
+    return found
+
+
+def capture_statements(session, call):
+    """SELECT émis par `call`, avec leurs paramètres"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def check_plans():
+    """Retourne {nom de la fonction: [problèmes]} pour les requêtes mal indexées"""
+    session = db.session
+    failures = {}
+    try:
+        queries = crud_queries(seed(session))
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        connection = session.connection()
+        for name, call in queries:
+            for statement, parameters in capture_statements(session, call):
+                row = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+                plan = (row if isinstance(row, list) else json.loads(row))[0]["Plan"]
+                problems = [p for p in full_scans(plan) if (name, p) not in ALLOWED_SCANS]
+                if problems:
+                    failures.setdefault(name, []).extend(problems)
+    finally:
+        session.rollback()
+    return failures
+
+
+if __name__ == "__main__":
+    from . import create_app
+
+    with create_app().app_context():
+        failures = check_plans()
+    for name, problems in failures.items():
+        print(f"{name}: {', '.join(problems)}")
+    print(f"{len(failures)} crud queries without a supporting index")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,121 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime
+from .models import User
+from .crud import get_game, list_participants, list_participant_objects
+from .events import publish_event
+from .game_state import game_state, ParticipantState
+
+
+# WebSocket de parties ouverts en même temps par un utilisateur, par worker :
+# chaque socket occupe un thread du worker pendant toute la partie
+GAME_CHANNEL_MAX_SOCKETS_PER_USER = int(os.getenv("GAME_CHANNEL_MAX_SOCKETS_PER_USER", "3"))
+
+_open_sockets = defaultdict(int)   # user_id -> sockets ouverts
+_open_sockets_lock = threading.Lock()
+
+
+def game_channel(game_id: int):
+    return f"game:{game_id}"
+
+
+def acquire_game_socket(user_id: int):
+    """Réserve un socket pour l'utilisateur ; False s'il en a déjà trop d'ouverts"""
+    with _open_sockets_lock:
+        if _open_sockets[user_id] >= GAME_CHANNEL_MAX_SOCKETS_PER_USER:
+            return False
+        _open_sockets[user_id] += 1
+        return True
+
+
+def release_game_socket(user_id: int):
+    with _open_sockets_lock:
+        _open_sockets[user_id] -= 1
+        if _open_sockets[user_id] <= 0:
+            del _open_sockets[user_id]
+
+
+def serialize_game(game):
+    return {
+        "id": game.id,
+        "code": game.code,
+        "creator_id": game.creator_id,
+        "is_public": game.is_public,
+        "max_players": game.max_players,
+        "max_objects": game.max_objects,
+        "mode": game.mode,
+        "filters": game.filters,
+        "status": game.status,
+        "start_timestamp": game.start_timestamp.isoformat() if game.start_timestamp else None,
+        "end_timestamp": game.end_timestamp.isoformat() if game.end_timestamp else None,
+        "created_at": game.created_at.isoformat() if game.created_at else None,
+    }
+
+
+def serialize_participant(p, username: str = None):
+    data = {
+        "id": p.id,
+        "game_id": p.game_id,
+        "user_id": p.user_id,
+        "is_creator": p.is_creator,
+        "join_code": p.join_code,
+        "objects_to_find": p.objects_to_find,    # JSON
+        "start_time": p.start_time.isoformat() if isinstance(p.start_time, datetime) else p.start_time,
+        "end_time": p.end_time.isoformat() if isinstance(p.end_time, datetime) else p.end_time,
+        "lap_times": p.lap_times,                # JSON list
+        "status": p.status,
+        "created_at": p.created_at.isoformat() if p.created_at else None,
+    }
+    if username is not None:
+        data["username"] = username
+    return data
+
+
+def serialize_participants(db, participants):
+    """Participants avec leur progression (table participant_objects)"""
+    progress = list_participant_objects(db, [p.id for p in participants])
+    # Sans lignes : partie pas encore lancée ou ancienne partie au format JSON
+    return [ParticipantState(p, progress[p.id]).to_dict() if progress[p.id] else serialize_participant(p)
+            for p in participants]
+
+
+def status_payload(game):
+    """Statut de la partie avec le temps restant avant le départ"""
+    seconds_remaining = None
+    if game.status == "starting" and game.start_timestamp:
+        seconds_remaining = max(0, int((game.start_timestamp - datetime.utcnow()).total_seconds()))
+    return {
+        "status": game.status,
+        "start_timestamp": game.start_timestamp.isoformat() if game.start_timestamp else None,
+        "end_timestamp": game.end_timestamp.isoformat() if game.end_timestamp else None,
+        "seconds_remaining": seconds_remaining
+    }
+
+
+def game_snapshot(db, game_id: int):
+    """État complet envoyé à la connexion (et à chaque reconnexion) d'un client"""
+    game = get_game(db, game_id)
+    if not game:
+        return None
+    # Partie en cours : progression lue dans l'état en mémoire
+    participants = game_state.participants(game_id)
+    if participants is None:
+        participants = serialize_participants(db, list_participants(db, game_id))
+    usernames = dict(db.query(User.id, User.username).filter(
+        User.id.in_([p["user_id"] for p in participants])).all()) if participants else {}
+    for p in participants:
+        p["username"] = usernames.get(p["user_id"])
+    return {
+        "game": serialize_game(game),
+        "status": status_payload(game),
+        "participants": participants
+    }
+
+
+def publish_game_event(game_id: int, event: str, data: dict):
+    publish_event(game_channel(game_id), event, data)
+
+
+def publish_game_status(game):
+    publish_game_event(game.id, "status", status_payload(game))
@@ -0,0 +1,115 @@
+"""
+Résultats des parties terminées.
+
+Le classement, les temps totaux et les temps intermédiaires par objet sont
+calculés une seule fois, à la fin de la partie, puis stockés dans
+game_results avec leur ETag. /games/<id>/results sert ensuite ce résultat
+tel quel : une partie terminée ne change plus, donc un client qui a déjà
+la réponse reçoit un 304.
+"""
+import hashlib
+import json
+from .models import User
+from .crud import get_game, list_participants, list_game_objects, list_participant_objects, get_game_result, create_game_result
+from .game_state import game_state, ParticipantState
+
+
+def _seconds(start, end):
+    if start is None or end is None:
+        return None
+    return round((end - start).total_seconds(), 3)
+
+
+def participant_result(state: ParticipantState, username: str = None):
+    """Résumé d'un participant : objets trouvés, temps total et intermédiaires"""
+    splits = []
+    previous = state.start_time
+    for slot in range(len(state.names)):
+        found = bool(state.found >> slot & 1)
+        end = state.lap_end[slot] if found else None
+        splits.append({
+            "order_index": state.order_indexes[slot],
+            "objectname": state.names[slot],
+            "found": found,
+            "skipped": bool(state.skipped >> slot & 1),
+            "end_time": end.isoformat() if end else None,
+            # Temps depuis l'objet précédent (ou le départ)
+            "split_seconds": _seconds(previous, end)
+        })
+        if end is not None:
+            previous = end
+
+    finished = state.all_found
+    return {
+        "participant_id": state.id,
+        "user_id": state.user_id,
+        "username": username,
+        "status": state.status,
+        "finished": finished,
+        "found_count": bin(state.found).count("1"),
+        "skipped_count": bin(state.skipped).count("1"),
+        "total_objects": len(state.names),
+        "start_time": state.start_time.isoformat() if state.start_time else None,
+        "end_time": state.end_time.isoformat() if state.end_time else None,
+        "total_time_seconds": _seconds(state.start_time, state.end_time) if finished else None,
+        "splits": splits
+    }
+
+
+def _ranking_key(result):
+    # Ceux qui ont tout trouvé d'abord (par heure de fin), puis par nombre
+    # d'objets trouvés, puis par heure du dernier objet trouvé
+    last_found = max((s["end_time"] for s in result["splits"] if s["end_time"]), default="~")
+    if result["finished"]:
+        return (0, result["end_time"] or "~", 0, "")
+    return (1, "", -result["found_count"], last_found)
+
+
+def compute_game_results(db, game):
+    """Calcule le classement d'une partie terminée à partir de la base"""
+    participants = list_participants(db, game.id)
+    progress = list_participant_objects(db, [p.id for p in participants])
+    usernames = dict(db.query(User.id, User.username).filter(
+        User.id.in_([p.user_id for p in participants])).all()) if participants else {}
+
+    results = [participant_result(ParticipantState(p, progress[p.id]), usernames.get(p.user_id))
+               for p in participants if progress[p.id]]
+    results.sort(key=_ranking_key)
+    for rank, result in enumerate(results, start=1):
+        result["rank"] = rank
+
+    return {
+        "game_id": game.id,
+        "code": game.code,
+        "mode": game.mode,
+        "start_timestamp": game.start_timestamp.isoformat() if game.start_timestamp else None,
+        "end_timestamp": game.end_timestamp.isoformat() if game.end_timestamp else None,
+        "objects": [{"order_index": o.order_index, "objectname": o.object_to_find}
+                    for o in list_game_objects(db, game.id)],
+        "winner": results[0] if results else None,
+        "rankings": results
+    }
+
+
+def results_etag(results: dict):
+    """ETag fort : empreinte du JSON canonique"""
+    return hashlib.sha256(json.dumps(results, sort_keys=True).encode()).hexdigest()
+
+
+def store_game_results(db, game_id: int):
+    """
+    Calcule et enregistre le résultat d'une partie terminée (une seule fois).
+    Retourne la ligne GameResult, ou None si la partie n'est pas terminée.
+    """
+    stored = get_game_result(db, game_id)
+    if stored is not None:
+        return stored
+    game = get_game(db, game_id)
+    if not game or game.status != "finished":
+        return None
+
+    # La progression encore en mémoire doit être en base avant le calcul
+    # (write-behind : ce worker est le seul à servir la partie)
+    game_state.flush_game(db, game_id)
+    results = compute_game_results(db, game)
+    return create_game_result(db, game_id, results, results_etag(results))
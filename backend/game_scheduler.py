@@ -0,0 +1,137 @@
+"""
+Transitions de statut des parties, faites par le serveur et non par les clients.
+
+Un tas trié par start_timestamp réveille le thread au moment exact où une
+partie "starting" doit passer "in_progress" ; la transition (partie et
+participants) se fait en une transaction, et l'UPDATE conditionnel de
+start_game_if_due garantit qu'elle n'a lieu qu'une fois même si plusieurs
+workers ont la partie dans leur tas.
+
+Un balayage périodique rattrape les départs manqués (redémarrage, partie
+lancée par un autre worker) et fait expirer les parties abandonnées :
+- "waiting" depuis plus de GAME_WAITING_TTL_MINUTES -> "expired"
+- "starting" dont le départ date de plus de GAME_STARTING_TTL_MINUTES -> "expired"
+- "in_progress" depuis plus de GAME_MAX_DURATION_MINUTES -> "finished"
+"""
+import heapq
+import os
+import threading
+from datetime import datetime, timedelta
+from .database import db
+from .crud import list_starting_games, start_game_if_due, expire_games
+from .models import Game
+from .game_events import publish_game_status
+from .game_state import game_state
+from .matchmaking import matchmaking
+from .game_results import store_game_results
+
+
+GAME_SWEEP_SECONDS = float(os.getenv("GAME_SWEEP_SECONDS", "5"))
+GAME_WAITING_TTL_MINUTES = float(os.getenv("GAME_WAITING_TTL_MINUTES", "60"))
+GAME_STARTING_TTL_MINUTES = float(os.getenv("GAME_STARTING_TTL_MINUTES", "10"))
+GAME_MAX_DURATION_MINUTES = float(os.getenv("GAME_MAX_DURATION_MINUTES", "60"))
+
+
+class GameScheduler:
+    """Tas (start_timestamp, game_id) servi par un thread dédié"""
+
+    def __init__(self, app, sweep_seconds: float = GAME_SWEEP_SECONDS):
+        self.app = app
+        self.sweep_seconds = sweep_seconds
+        self._heap = []
+        self._condition = threading.Condition()
+        self._thread = None
+        self._next_sweep = 0.0
+
+    def schedule_start(self, game_id: int, start_timestamp: datetime):
+        """Planifie le passage en "in_progress" de la partie à `start_timestamp`"""
+        self.ensure_started()
+        with self._condition:
+            heapq.heappush(self._heap, (start_timestamp, game_id))
+            # Réveille le thread si ce départ est plus proche que le précédent
+            self._condition.notify()
+
+    def ensure_started(self):
+        # Démarrage paresseux, dans le process qui sert les requêtes
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="game-scheduler", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            due = []
+            with self._condition:
+                now = datetime.utcnow()
+                timeout = max(0.0, self._next_sweep - now.timestamp())
+                if self._heap:
+                    timeout = min(timeout, max(0.0, (self._heap[0][0] - now).total_seconds()))
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    now = datetime.utcnow()
+                while self._heap and self._heap[0][0] <= now:
+                    due.append(heapq.heappop(self._heap)[1])
+
+            try:
+                with self.app.app_context():
+                    for game_id in due:
+                        self._start(game_id, now)
+                    if now.timestamp() >= self._next_sweep:
+                        self._next_sweep = now.timestamp() + self.sweep_seconds
+                        self.sweep(now)
+            except Exception as e:
+                print(f"Game scheduler error: {e}")
+            finally:
+                db.session.remove()
+
+    def _start(self, game_id: int, now: datetime):
+        game = start_game_if_due(db.session, game_id, now)
+        if game is not None:
+            # La base vient de passer les participants en jeu : l'état en
+            # mémoire de ce worker (lobby, départ précédent) est périmé
+            game_state.forget_game(game_id)
+            publish_game_status(game)
+
+    def sweep(self, now: datetime):
+        """Parties abandonnées puis départs en retard"""
+        expired = (
+            expire_games(db.session, "waiting", now - timedelta(minutes=GAME_WAITING_TTL_MINUTES), "expired")
+            + expire_games(db.session, "starting", now - timedelta(minutes=GAME_STARTING_TTL_MINUTES),
+                           "expired", Game.start_timestamp)
+            + expire_games(db.session, "in_progress", now - timedelta(minutes=GAME_MAX_DURATION_MINUTES),
+                           "finished", Game.start_timestamp)
+        )
+        for game in expired:
+            matchmaking.remove(game.id)
+            if game.status == "finished":
+                store_game_results(db.session, game.id)
+            publish_game_status(game)
+
+        with self._condition:
+            scheduled = {game_id for _, game_id in self._heap}
+        for game_id, start_timestamp in list_starting_games(db.session):
+            if start_timestamp <= now:
+                self._start(game_id, now)
+            elif game_id not in scheduled:
+                # Partie lancée par un autre worker ou avant un redémarrage
+                with self._condition:
+                    heapq.heappush(self._heap, (start_timestamp, game_id))
+
+
+game_scheduler = None
+
+
+def init_game_scheduler(app):
+    """Crée le scheduler ; son thread démarre au premier départ planifié ou à la première requête"""
+    global game_scheduler
+    if game_scheduler is None:
+        game_scheduler = GameScheduler(app)
+        app.before_request(game_scheduler.ensure_started)
+    return game_scheduler
+
+
+def schedule_game_start(game_id: int, start_timestamp: datetime):
+    if game_scheduler is not None:
+        game_scheduler.schedule_start(game_id, start_timestamp)
@@ -0,0 +1,462 @@
+"""
+État des parties en cours, tenu en mémoire par le worker.
+
+Chaque participant a un slot par objet : bitmasks trouvé / passé et tableaux
+de temps de tour. Trouver ou passer un objet est une opération O(1) sur ces
+structures ; /games/<id>/participants et le snapshot du canal temps réel
+lisent directement la mémoire.
+
+Par défaut l'état est relu depuis la base à chaque requête, reste propre
+à cette requête, et chaque mutation est écrite immédiatement. Avec GAME_STATE_WRITE_BEHIND=1, la base
+n'est écrite qu'en différé : un thread enregistre toutes les
+GAME_STATE_FLUSH_SECONDS secondes les objets modifiés (une ligne
+participant_objects par objet, une transaction par passage), et la fin
+d'un participant est écrite tout de suite. Les parties inactives depuis
+GAME_STATE_IDLE_SECONDS sont retirées de la mémoire après écriture et
+rechargées depuis la base au besoin.
+
+Les écritures sont des compare-and-swap sur GameParticipant.version : aucun
+verrou n'est tenu pendant l'inférence, seule l'étape de fusion (relire,
+réappliquer la mutation) est rejouée en cas de conflit.
+
+Le write-behind suppose qu'un seul worker sert toutes les requêtes d'une
+partie (un seul worker, ou routage par partie) : sinon un worker lit un
+état périmé, et les résultats d'une partie (game_results.py) sont figés
+sans la progression encore en mémoire dans les autres workers.
+"""
+import atexit
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from .database import db
+from .models import GameParticipant
+from .crud import list_participant_objects, save_participant_progress, backfill_participant_objects
+
+
+# "1" seulement si toutes les requêtes d'une partie vont au même worker
+GAME_STATE_WRITE_BEHIND = os.getenv("GAME_STATE_WRITE_BEHIND", "0") == "1"
+GAME_STATE_FLUSH_SECONDS = float(os.getenv("GAME_STATE_FLUSH_SECONDS", "1"))
+GAME_STATE_IDLE_SECONDS = float(os.getenv("GAME_STATE_IDLE_SECONDS", "300"))
+GAME_STATE_CAS_RETRIES = int(os.getenv("GAME_STATE_CAS_RETRIES", "5"))
+
+
+class ProgressConflict(Exception):
+    """La progression a changé à chaque tentative de compare-and-swap"""
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def parse_client_time(value: str):
+    """Heure ISO 8601 envoyée par l'app (ex: 2024-05-01T10:00:00.000Z) en UTC naïf"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+class ParticipantState:
+    """Progression d'un participant : slot i = i-ème objet de la partie"""
+
+    __slots__ = ("id", "game_id", "user_id", "join_code", "is_creator", "start_time", "created_at",
+                 "order_indexes", "names", "slot_of", "found", "skipped", "lap_start", "lap_end",
+                 "found_at", "skipped_at", "status", "end_time", "version", "pending")
+
+    def __init__(self, participant, progress):
+        # progress : lignes ParticipantObject du participant, triées par order_index
+        self.id = participant.id
+        self.game_id = participant.game_id
+        self.user_id = participant.user_id
+        self.join_code = participant.join_code
+        self.is_creator = participant.is_creator
+        self.start_time = participant.start_time
+        self.created_at = participant.created_at
+        self.status = participant.status
+        self.end_time = participant.end_time
+        self.version = participant.version
+        # Slots modifiés d'un état propre à une requête (sans write-behind)
+        self.pending = set()
+
+        self.order_indexes = [row.order_index for row in progress]
+        self.names = [row.object_name for row in progress]
+        self.slot_of = {order_index: slot for slot, order_index in enumerate(self.order_indexes)}
+        self.found = 0
+        self.skipped = 0
+        for slot, row in enumerate(progress):
+            if row.found:
+                self.found |= 1 << slot
+            if row.skipped:
+                self.skipped |= 1 << slot
+        self.lap_start = [row.lap_start for row in progress]
+        self.lap_end = [row.lap_end for row in progress]
+        self.found_at = [row.found_at for row in progress]
+        self.skipped_at = [row.skipped_at for row in progress]
+
+    @property
+    def all_found(self):
+        return self.found == (1 << len(self.names)) - 1
+
+    def next_slot(self):
+        """Premier objet ni trouvé ni passé (None si tout est fait)"""
+        free = ~(self.found | self.skipped) & ((1 << len(self.names)) - 1)
+        return (free & -free).bit_length() - 1 if free else None
+
+    def object_at(self, slot: int):
+        return {
+            "order_index": self.order_indexes[slot],
+            "objectname": self.names[slot],
+            "found": bool(self.found >> slot & 1),
+            "skipped": bool(self.skipped >> slot & 1)
+        }
+
+    def lap_at(self, slot: int):
+        return {
+            "order_index": self.order_indexes[slot],
+            "start_time": _isoformat(self.lap_start[slot]),
+            "end_time": _isoformat(self.lap_end[slot])
+        }
+
+    def objects_to_find(self):
+        return [self.object_at(slot) for slot in range(len(self.names))]
+
+    def lap_times(self):
+        # Les objets sont trouvés dans l'ordre : ordre des slots = ordre des tours
+        return [self.lap_at(slot) for slot in range(len(self.names)) if self.found >> slot & 1]
+
+    def to_dict(self):
+        # Mêmes clés que game_events.serialize_participant
+        return {
+            "id": self.id,
+            "game_id": self.game_id,
+            "user_id": self.user_id,
+            "is_creator": self.is_creator,
+            "join_code": self.join_code,
+            "objects_to_find": self.objects_to_find(),
+            "start_time": _isoformat(self.start_time),
+            "end_time": _isoformat(self.end_time),
+            "lap_times": self.lap_times(),
+            "status": self.status,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+
+    def object_row(self, slot: int):
+        """Ligne participant_objects du slot, pour le flush"""
+        return {
+            "participant_id": self.id,
+            "order_index": self.order_indexes[slot],
+            "found": bool(self.found >> slot & 1),
+            "skipped": bool(self.skipped >> slot & 1),
+            "lap_start": self.lap_start[slot],
+            "lap_end": self.lap_end[slot],
+            "found_at": self.found_at[slot],
+            "skipped_at": self.skipped_at[slot]
+        }
+
+    def participant_row(self):
+        return {"id": self.id, "version": self.version, "status": self.status, "end_time": self.end_time}
+
+    def merge(self, other, dirty: set):
+        """
+        Reprend l'état `other` relu en base en gardant les slots modifiés
+        localement (`dirty`). Un objet trouvé des deux côtés garde le temps
+        de tour déjà écrit (premier arrivé) et n'est plus à écrire.
+        """
+        for slot in range(len(self.names)):
+            bit = 1 << slot
+            if slot in dirty:
+                if not (other.found & self.found & bit):
+                    continue
+                dirty.discard(slot)
+            self.found = (self.found & ~bit) | (other.found & bit)
+            self.skipped = (self.skipped & ~bit) | (other.skipped & bit)
+            self.lap_start[slot] = other.lap_start[slot]
+            self.lap_end[slot] = other.lap_end[slot]
+            self.found_at[slot] = other.found_at[slot]
+            self.skipped_at[slot] = other.skipped_at[slot]
+        self.start_time = other.start_time
+        if other.status == "finished" or self.status != "finished":
+            self.status = other.status
+            self.end_time = other.end_time
+        if self.all_found and self.status != "finished":
+            self.status = "finished"
+            self.end_time = max(end for end in self.lap_end if end is not None)
+        self.version = other.version
+
+
+def load_progress(session, participants):
+    """
+    Lignes participant_objects des participants ; celles des participants
+    encore au format JSON (anciennes parties) sont créées au passage.
+    """
+    ids = [p.id for p in participants]
+    progress = list_participant_objects(session, ids)
+    legacy = [p.id for p in participants if not progress[p.id]
+              and any(isinstance(o, dict) for o in p.objects_to_find or [])]
+    if legacy:
+        backfill_participant_objects(session, legacy)
+        progress.update(list_participant_objects(session, legacy))
+    return progress
+
+
+class GameStateEngine:
+    def __init__(self, write_behind: bool = GAME_STATE_WRITE_BEHIND,
+                 flush_seconds: float = GAME_STATE_FLUSH_SECONDS,
+                 idle_seconds: float = GAME_STATE_IDLE_SECONDS):
+        self.write_behind = write_behind
+        self.flush_seconds = flush_seconds
+        self.idle_seconds = idle_seconds
+        self.app = None
+        self._games = {}          # game_id -> {participant_id: ParticipantState}
+        self._participants = {}   # participant_id -> ParticipantState
+        self._last_activity = {}  # game_id -> time.monotonic()
+        self._dirty = {}          # participant_id -> slots modifiés
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        if self.write_behind:
+            # Dernier flush à l'arrêt du worker
+            atexit.register(self._flush_at_exit)
+
+    # --- Chargement ---
+
+    def _load_game(self, session, game_id: int):
+        participants = session.query(GameParticipant).filter_by(game_id=game_id).all()
+        progress = load_progress(session, participants)
+        # Un participant sans objets (partie pas encore lancée) n'a pas d'état
+        states = {p.id: ParticipantState(p, progress[p.id]) for p in participants if progress[p.id]}
+        with self._lock:
+            if game_id in self._games:
+                return self._games[game_id]  # Chargé entre-temps par un autre thread
+            self._games[game_id] = states
+            self._participants.update(states)
+            self._last_activity[game_id] = time.monotonic()
+        return states
+
+    def participant(self, session, participant_id: int):
+        """
+        État du participant. Avec write-behind, l'état partagé du worker,
+        chargé avec toute sa partie si besoin ; sans, un état relu en base et
+        propre à l'appelant, qui n'est jamais partagé entre requêtes.
+        """
+        if not self.write_behind:
+            participant = session.query(GameParticipant).filter(
+                GameParticipant.id == participant_id).populate_existing().first()
+            if participant is None:
+                return None
+            progress = load_progress(session, [participant])[participant.id]
+            return ParticipantState(participant, progress) if progress else None
+
+        with self._lock:
+            state = self._participants.get(participant_id)
+        if state is not None:
+            return state
+
+        game_id = session.query(GameParticipant.game_id).filter(
+            GameParticipant.id == participant_id).scalar()
+        if game_id is None:
+            return None
+        return self._load_game(session, game_id).get(participant_id)
+
+    def participants(self, game_id: int):
+        """Participants d'une partie en mémoire (None si elle n'y est pas)"""
+        if not self.write_behind:
+            return None
+        with self._lock:
+            states = self._games.get(game_id)
+            return [s.to_dict() for s in states.values()] if states is not None else None
+
+    def forget_game(self, game_id: int):
+        """Oublie une partie dont la base vient d'être modifiée (nouveau départ)"""
+        with self._lock:
+            for participant_id in self._games.pop(game_id, {}):
+                self._participants.pop(participant_id, None)
+                self._dirty.pop(participant_id, None)
+            self._last_activity.pop(game_id, None)
+
+    # --- Mutations O(1) ---
+
+    def mark_found(self, state: ParticipantState, slot: int, start_time, end_time):
+        """Marque l'objet du slot trouvé ; retourne le temps de tour ajouté"""
+        with self._lock:
+            bit = 1 << slot
+            if (state.found | state.skipped) & bit:
+                return None
+            state.found |= bit
+            state.lap_start[slot] = start_time
+            state.lap_end[slot] = end_time
+            state.found_at[slot] = datetime.utcnow()
+            if state.all_found:
+                state.status = "finished"
+                state.end_time = end_time
+            self._touch(state, slot)
+            return state.lap_at(slot)
+
+    def mark_skipped(self, state: ParticipantState, order_index: int):
+        """Marque l'objet `order_index` passé ; False s'il n'existe pas"""
+        with self._lock:
+            slot = state.slot_of.get(order_index)
+            if slot is None:
+                return False
+            state.skipped |= 1 << slot
+            state.skipped_at[slot] = datetime.utcnow()
+            self._touch(state, slot)
+            return True
+
+    def _touch(self, state: ParticipantState, slot: int):
+        if not self.write_behind:
+            state.pending.add(slot)
+            return
+        self._dirty.setdefault(state.id, set()).add(slot)
+        self._last_activity[state.game_id] = time.monotonic()
+        self._ensure_started()
+
+    # --- Écriture en base ---
+
+    def update(self, session, participant_id: int, mutate):
+        """
+        Applique `mutate(state)` (mark_found, mark_skipped...) et la rend
+        durable : au prochain flush avec write-behind, tout de suite sinon ou
+        quand le participant a fini (résultat final).
+
+        L'écriture est un compare-and-swap sur la version. En cas de conflit,
+        sans write-behind, l'état est relu et `mutate` rejoué ; avec
+        write-behind, l'état relu est fusionné avec les changements locaux ;
+        si la fusion garde la version de la base pour un slot modifié par
+        `mutate` (objet trouvé par une autre requête), le résultat devient None.
+        Retourne (état, résultat de mutate) ; un résultat faux n'est pas écrit.
+        """
+        if not self.write_behind:
+            return self._update_now(session, participant_id, mutate)
+
+        state = self.participant(session, participant_id)
+        if state is None:
+            return None, None
+        with self._lock:
+            before = set(self._dirty.get(state.id, ()))
+            result = mutate(state)
+            touched = self._dirty.get(state.id, set()) - before
+        for _ in range(GAME_STATE_CAS_RETRIES):
+            if not result or state.status != "finished":
+                return state, result
+            if not self.flush(session, [state.id]):
+                return state, result
+
+            self._merge_from_db(session, [state.id])
+            with self._lock:
+                if not touched <= self._dirty.get(state.id, set()):
+                    # Déjà écrit par une autre requête : son résultat prime
+                    result = None
+        raise ProgressConflict(f"Participant {participant_id} progress kept changing")
+
+    def _update_now(self, session, participant_id: int, mutate):
+        """
+        Sans write-behind : l'état et ses slots modifiés sont propres à la
+        requête, et seules ses lignes sont écrites. Une requête concurrente
+        ne peut donc ni écrire ni effacer les changements de celle-ci.
+        """
+        for _ in range(GAME_STATE_CAS_RETRIES):
+            state = self.participant(session, participant_id)
+            if state is None:
+                return None, None
+            result = mutate(state)
+            if not result or not state.pending:
+                return state, result
+            conflicts = save_participant_progress(
+                session, [state.object_row(slot) for slot in sorted(state.pending)], [state.participant_row()])
+            if not conflicts:
+                state.version += 1
+                state.pending.clear()
+                return state, result
+            # Modifié entre la lecture et l'écriture : relire et rejouer `mutate`
+        raise ProgressConflict(f"Participant {participant_id} progress kept changing")
+
+    def flush(self, session, participant_ids=None):
+        """
+        Écrit les objets modifiés (une ligne chacun) en une seule transaction.
+        Retourne les participants en conflit de version, qui restent à écrire.
+        """
+        with self._lock:
+            ids = list(self._dirty) if participant_ids is None else [
+                pid for pid in participant_ids if pid in self._dirty]
+            dirty = {pid: self._dirty.pop(pid) for pid in ids}
+            states = [self._participants[pid] for pid in dirty if pid in self._participants]
+            object_rows = [s.object_row(slot) for s in states for slot in sorted(dirty[s.id])]
+            participant_rows = [s.participant_row() for s in states]
+        if not object_rows:
+            return set()
+        try:
+            conflicts = save_participant_progress(session, object_rows, participant_rows)
+        except Exception:
+            session.rollback()
+            conflicts = set(dirty)
+            raise
+        finally:
+            with self._lock:
+                for s in states:
+                    if s.id in conflicts:
+                        self._dirty.setdefault(s.id, set()).update(dirty[s.id])
+                    else:
+                        s.version += 1
+        return conflicts
+
+    def flush_game(self, session, game_id: int):
+        """Écrit tout de suite la progression en mémoire d'une partie (fin de partie)"""
+        with self._lock:
+            participant_ids = list(self._games.get(game_id, {}))
+        for _ in range(GAME_STATE_CAS_RETRIES):
+            conflicts = self.flush(session, participant_ids)
+            if not conflicts:
+                return
+            self._merge_from_db(session, list(conflicts))
+        raise ProgressConflict(f"Game {game_id} progress kept changing")
+
+    def _merge_from_db(self, session, participant_ids):
+        """Fusionne l'état relu en base dans l'état en mémoire (après un conflit)"""
+        participants = session.query(GameParticipant).filter(
+            GameParticipant.id.in_(participant_ids)).populate_existing().all()
+        progress = list_participant_objects(session, participant_ids)
+        with self._lock:
+            for p in participants:
+                state = self._participants.get(p.id)
+                if state is not None and progress[p.id]:
+                    state.merge(ParticipantState(p, progress[p.id]), self._dirty.setdefault(p.id, set()))
+
+    def _evict_idle(self):
+        deadline = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [game_id for game_id, last in self._last_activity.items()
+                    if last < deadline and not any(pid in self._dirty for pid in self._games.get(game_id, {}))]
+        for game_id in idle:
+            self.forget_game(game_id)
+
+    def _ensure_started(self):
+        if not self.write_behind or self.app is None:
+            return
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="game-state-flusher", daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.flush_seconds)
+            with self.app.app_context():
+                try:
+                    conflicts = self.flush(db.session)
+                    if conflicts:
+                        self._merge_from_db(db.session, list(conflicts))
+                    self._evict_idle()
+                except Exception as e:
+                    print(f"Game state flush error: {e}")
+                finally:
+                    db.session.remove()
+
+    def _flush_at_exit(self):
+        with self.app.app_context():
+            self.flush(db.session)
+
+
+game_state = GameStateEngine()
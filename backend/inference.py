@@ -0,0 +1,170 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+# Classes de priorité, de la plus urgente à la moins urgente :
+# - battle : vérification d'une photo pendant une partie (/games/detect)
+# - daily : photo d'un défi (/photos/detect avec challenge_id)
+# - gallery : photo sans défi
+# - background : détections complètes enregistrées après la réponse
+PRIORITY_CLASSES = ("battle", "daily", "gallery", "background")
+DEFAULT_PRIORITY = "gallery"
+_PRIORITY_RANKS = {name: rank for rank, name in enumerate(PRIORITY_CLASSES)}
+
+# Nombre d'attentes récentes gardées par classe pour les percentiles
+METRICS_WINDOW = 500
+
+
+class _ClassMetrics:
+    """Profondeur de file et temps d'attente d'une classe de priorité"""
+
+    def __init__(self):
+        self.queued = 0
+        self.processed = 0
+        self.max_wait = 0.0
+        self.recent_waits = deque(maxlen=METRICS_WINDOW)
+
+    def to_dict(self):
+        waits = sorted(self.recent_waits)
+
+        def percentile(p):
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2)
+
+        return {
+            "queued": self.queued,
+            "processed": self.processed,
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(self.max_wait * 1000, 2)
+        }
+
+
+class InferenceScheduler:
+    """
+    Regroupe les demandes d'inférence concurrentes en micro-lots.
+
+    Chaque appelant soumet une image et reçoit un Future. Un thread dédié
+    attend au plus `max_wait_ms` millisecondes (ou `max_batch_size` images)
+    puis lance un seul appel batché et redistribue les résultats.
+    `max_concurrent_batches` > 1 permet d'alimenter plusieurs workers
+    d'inférence en parallèle (voir inference_pool.py).
+
+    La file est triée par classe de priorité (PRIORITY_CLASSES) puis par
+    ordre d'arrivée : une demande "battle" passe devant toutes les demandes
+    moins urgentes en attente, et un lot ne contient jamais de demandes
+    moins urgentes que la première, pour ne pas allonger son inférence.
+    Sous charge, ce sont les classes basses qui attendent.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int = 8, max_wait_ms: float = 10,
+                 max_concurrent_batches: int = 1):
+        # run_batch(list[item]) -> list[résultat], dans le même ordre
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_concurrent_batches = max(1, int(max_concurrent_batches))
+        self._heap = []   # (rang de priorité, n° d'arrivée, heure d'arrivée, item, future)
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._metrics = {name: _ClassMetrics() for name in PRIORITY_CLASSES}
+        self._thread = None
+        self._lock = threading.Lock()
+        # Un slot par lot en cours : tant qu'aucun slot n'est libre, la file
+        # s'allonge et le lot suivant sera plus gros
+        self._slots = threading.Semaphore(self.max_concurrent_batches)
+
+    def submit(self, item, priority: str = DEFAULT_PRIORITY) -> Future:
+        """Ajoute une image à la file et retourne le Future de son résultat"""
+        self._ensure_started()
+        future = Future()
+        rank = _PRIORITY_RANKS.get(priority, _PRIORITY_RANKS[DEFAULT_PRIORITY])
+        with self._condition:
+            heapq.heappush(self._heap, (rank, next(self._counter), time.monotonic(), item, future))
+            self._metrics[PRIORITY_CLASSES[rank]].queued += 1
+            self._condition.notify()
+        return future
+
+    def infer(self, item, timeout: float = None, priority: str = DEFAULT_PRIORITY):
+        """Version bloquante de submit()"""
+        return self.submit(item, priority).result(timeout)
+
+    def stats(self):
+        """Profondeur de file et temps d'attente (ms) par classe de priorité"""
+        with self._condition:
+            return {name: metrics.to_dict() for name, metrics in self._metrics.items()}
+
+    def _ensure_started(self):
+        # Démarrage paresseux : le thread doit vivre dans le process qui sert
+        # les requêtes (et pas dans le parent d'un serveur WSGI qui fork)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name="inference-scheduler", daemon=True)
+                self._thread.start()
+
+    def _pop(self):
+        # Retire la demande la plus prioritaire (appelé avec self._condition)
+        rank, _, enqueued_at, item, future = heapq.heappop(self._heap)
+        metrics = self._metrics[PRIORITY_CLASSES[rank]]
+        wait = time.monotonic() - enqueued_at
+        metrics.queued -= 1
+        metrics.processed += 1
+        metrics.max_wait = max(metrics.max_wait, wait)
+        metrics.recent_waits.append(wait)
+        return rank, item, future
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._heap:
+                self._condition.wait()
+            rank, item, future = self._pop()
+            batch = [(item, future)]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if self._heap and self._heap[0][0] <= rank:
+                    batch.append(self._pop()[1:])
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return batch
+
+    def _loop(self):
+        while True:
+            self._slots.acquire()
+            batch = self._next_batch()
+
+            if self.max_concurrent_batches == 1:
+                self._run(batch)
+            else:
+                threading.Thread(target=self._run, args=(batch,),
+                                 name="inference-batch", daemon=True).start()
+
+    def _run(self, batch):
+        try:
+            # Ignore les demandes annulées entre-temps
+            batch = [(item, future) for item, future in batch
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                return
+
+            try:
+                results = self.run_batch([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        finally:
+            self._slots.release()
@@ -0,0 +1,134 @@
+"""
+Backends d'inférence CPU derrière detect_objects.
+
+INFERENCE_BACKEND choisit le format du modèle :
+- "torch"    : le .pt d'origine (PyTorch eager)
+- "onnx"     : export ONNX exécuté par ONNX Runtime
+- "openvino" : export OpenVINO (le plus rapide sur CPU Intel)
+- "openvino-int8" : modèle OpenVINO quantifié INT8, produit et validé par
+  `python -m backend.quantization` (jamais exporté automatiquement)
+
+Les exports sont créés à côté du .pt au premier chargement. Ultralytics
+garde le même post-traitement pour tous les formats, donc les détections
+ont exactement la même forme qu'avec PyTorch.
+
+Vérifier la parité avec PyTorch sur quelques photos :
+    python -m backend.inference_backends onnx photo1.jpg photo2.jpg
+"""
+import os
+import sys
+import threading
+
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+
+BACKENDS = ("torch", "onnx", "openvino", "openvino-int8")
+
+_export_lock = threading.Lock()
+
+
+def exported_model_path(model_path: str, backend: str = INFERENCE_BACKEND):
+    """Chemin du modèle exporté pour un backend donné"""
+    stem = os.path.splitext(model_path)[0]
+    if backend == "onnx":
+        return f"{stem}.onnx"
+    if backend == "openvino":
+        return f"{stem}_openvino_model"
+    if backend == "openvino-int8":
+        return f"{stem}_int8_openvino_model"
+    return model_path
+
+
+def load_model(model_path: str, backend: str = INFERENCE_BACKEND):
+    """Charge `model_path` avec le backend demandé, en l'exportant si besoin"""
+    from ultralytics import YOLO
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "torch":
+        return YOLO(model_path)
+
+    path = exported_model_path(model_path, backend)
+    if backend == "openvino-int8":
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, run python -m backend.quantization first")
+        return YOLO(path, task="detect")
+
+    with _export_lock:
+        if not os.path.exists(path):
+            # dynamic=True : taille de lot variable pour le micro-batching
+            YOLO(model_path).export(format=backend, dynamic=True)
+    return YOLO(path, task="detect")
+
+
+def box_iou(a, b):
+    """IoU entre deux boîtes [x1, y1, x2, y2]"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare_detections(reference, candidate, box_tolerance: float = 2.0, min_score: float = 0.3):
+    """
+    Compare deux listes de détections, dans les deux sens.
+
+    Chaque détection de référence au-dessus de `min_score` doit avoir dans
+    `candidate` une détection de même classe dont les coordonnées diffèrent
+    d'au plus `box_tolerance` pixels, et chaque détection de `candidate`
+    au-dessus de `min_score` doit correspondre ainsi à une détection de
+    référence. Retourne la liste des écarts ({"expected": None, "got": ...}
+    pour une détection en trop).
+    """
+    mismatches = []
+    remaining = list(candidate)
+    # Les détections sous le seuil servent aussi à l'appariement : un score
+    # qui passe de 0.29 à 0.31 n'est pas une détection en trop
+    for ref in sorted(reference, key=lambda d: d["score"], reverse=True):
+        same_class = [c for c in remaining if c["class_id"] == ref["class_id"]]
+        best = max(same_class, key=lambda c: box_iou(ref["box"], c["box"]), default=None)
+        if best is None or max(abs(r - c) for r, c in zip(ref["box"], best["box"])) > box_tolerance:
+            if ref["score"] >= min_score:
+                mismatches.append({"expected": ref, "got": best})
+                if best is not None:
+                    # Déjà signalée avec `ref`, pas une seconde fois comme détection en trop
+                    remaining.remove(best)
+            continue
+        remaining.remove(best)
+    mismatches.extend({"expected": None, "got": extra} for extra in remaining if extra["score"] >= min_score)
+    return mismatches
+
+
+def check_parity(image_paths, backend: str, model_path: str = None, box_tolerance: float = 2.0):
+    """Compare les détections de `backend` à celles de PyTorch sur des images"""
+    from PIL import Image
+    import numpy as np
+    from .utils import YOLO_MODEL, run_model
+
+    model_path = model_path or YOLO_MODEL
+    reference_model = load_model(model_path, "torch")
+    candidate_model = load_model(model_path, backend)
+
+    report = {}
+    for path in image_paths:
+        img_array = np.array(Image.open(path).convert('RGB'))
+        reference = run_model(reference_model, [img_array])[0]
+        candidate = run_model(candidate_model, [img_array])[0]
+        report[path] = compare_detections(reference, candidate, box_tolerance)
+    return report
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python -m backend.inference_backends <onnx|openvino> image [image ...]")
+        sys.exit(2)
+
+    report = check_parity(sys.argv[2:], sys.argv[1])
+    failures = {path: m for path, m in report.items() if m}
+    for path, mismatches in failures.items():
+        print(f"{path}: {len(mismatches)} detection(s) differ")
+        for m in mismatches:
+            print(f"  expected {m['expected']}, got {m['got']}")
+    print(f"{len(report) - len(failures)}/{len(report)} images match the torch backend")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,172 @@
+"""
+Pool de process d'inférence, séparé des workers web.
+
+Le serveur (`python -m backend.inference_pool`) charge le modèle YOLO dans
+INFERENCE_WORKERS process. Les workers web ne gardent qu'un client léger :
+ils copient les images décodées dans un segment de mémoire partagée et
+n'envoient sur le socket que son nom et la forme des images, jamais les
+pixels eux-mêmes. Le serveur et les workers web doivent donc tourner sur
+la même machine.
+
+Les messages du socket sont des pickles : le serveur et les clients
+refusent de démarrer sans INFERENCE_POOL_AUTHKEY, une clé secrète partagée
+(par exemple `python -c "import secrets; print(secrets.token_hex(32))"`).
+"""
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+from queue import Queue, Empty
+import numpy as np
+
+
+INFERENCE_POOL_ADDRESS = os.getenv("INFERENCE_POOL_ADDRESS")  # ex: "127.0.0.1:6001"
+# Pas de valeur par défaut : une clé connue permettrait d'envoyer des pickles au pool
+INFERENCE_POOL_AUTHKEY = os.getenv("INFERENCE_POOL_AUTHKEY", "").encode()
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# 0 = laisser torch choisir (tous les coeurs), à réduire si plusieurs workers
+INFERENCE_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", "0"))
+
+
+def parse_address(address: str):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+def require_authkey(authkey: bytes):
+    if not authkey:
+        raise RuntimeError("INFERENCE_POOL_AUTHKEY doit être défini pour utiliser le pool d'inférence")
+    return authkey
+
+
+# --- Côté worker d'inférence ---
+
+_worker_models = {}
+
+
+def _init_worker(torch_threads: int):
+    if torch_threads:
+        import torch
+        torch.set_num_threads(torch_threads)
+
+
+def _worker_model(model_path: str):
+    if model_path not in _worker_models:
+        from .inference_backends import load_model
+        _worker_models[model_path] = load_model(model_path)
+    return _worker_models[model_path]
+
+
+def _detect_from_shm(request: dict):
+    # Exécuté dans un worker : lit les images depuis la mémoire partagée
+    from .utils import run_model
+
+    options = request.get("options", {})
+    shm = shared_memory.SharedMemory(name=request["shm"])
+    # Le segment appartient au client, qui le supprime : sans ceci le
+    # resource_tracker du worker le supprimerait aussi (ou signalerait une fuite)
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        arrays = [
+            np.ndarray(shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+            for offset, shape in request["items"]
+        ]
+        detections = run_model(_worker_model(request["model"]), arrays, options.get("target"))
+        # Les vues numpy doivent disparaître avant de fermer le segment
+        del arrays
+    finally:
+        shm.close()
+    return detections
+
+
+def _handle_connection(conn, executor):
+    with conn:
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                conn.send(("ok", executor.submit(_detect_from_shm, request).result()))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+
+
+def serve(address: str = None, workers: int = None, torch_threads: int = None):
+    """Lance le pool d'inférence et accepte les connexions des workers web"""
+    address = address or INFERENCE_POOL_ADDRESS or "127.0.0.1:6001"
+    workers = workers or INFERENCE_WORKERS
+    torch_threads = INFERENCE_TORCH_THREADS if torch_threads is None else torch_threads
+    authkey = require_authkey(INFERENCE_POOL_AUTHKEY)
+
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        # spawn : pas d'état torch hérité d'un fork
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(torch_threads,)
+    )
+    listener = Listener(parse_address(address), authkey=authkey)
+    print(f"Inference pool listening on {address} with {workers} workers")
+    try:
+        while True:
+            conn = listener.accept()
+            threading.Thread(target=_handle_connection, args=(conn, executor),
+                             daemon=True).start()
+    finally:
+        listener.close()
+        executor.shutdown()
+
+
+# --- Côté worker web ---
+
+class InferencePoolClient:
+    """Envoie des lots d'images au pool via la mémoire partagée"""
+
+    def __init__(self, address: str, authkey: bytes = INFERENCE_POOL_AUTHKEY):
+        self.address = parse_address(address)
+        self.authkey = require_authkey(authkey)
+        # Connexions réutilisables, une par lot en cours
+        self._connections = Queue()
+
+    def _connection(self):
+        try:
+            return self._connections.get_nowait()
+        except Empty:
+            return Client(self.address, authkey=self.authkey)
+
+    def run_batch(self, img_arrays, model_path: str, options: dict = None):
+        img_arrays = [np.ascontiguousarray(a, dtype=np.uint8) for a in img_arrays]
+        shm = shared_memory.SharedMemory(create=True, size=max(1, sum(a.nbytes for a in img_arrays)))
+        try:
+            items = []
+            offset = 0
+            for a in img_arrays:
+                view = np.ndarray(a.shape, dtype=np.uint8, buffer=shm.buf, offset=offset)
+                view[...] = a
+                del view
+                items.append((offset, a.shape))
+                offset += a.nbytes
+
+            conn = self._connection()
+            try:
+                conn.send({"shm": shm.name, "items": items,
+                           "model": model_path, "options": options or {}})
+                status, payload = conn.recv()
+            except Exception:
+                conn.close()
+                raise
+            self._connections.put(conn)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        if status != "ok":
+            raise RuntimeError(f"Inference pool error: {payload}")
+        return payload
+
+
+if __name__ == "__main__":
+    serve()
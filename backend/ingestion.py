@@ -0,0 +1,66 @@
+import io
+import os
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import current_app
+from PIL import Image
+from werkzeug.utils import secure_filename
+from .detection_cache import hash_image_bytes
+
+
+# Taille d'entrée du modèle : inutile de décoder un JPEG plus grand
+INFERENCE_INPUT_SIZE = int(os.getenv("INFERENCE_INPUT_SIZE", "640"))
+UPLOAD_WRITER_THREADS = int(os.getenv("UPLOAD_WRITER_THREADS", "2"))
+
+# Écriture des originaux sur disque, hors du chemin critique
+_writer = ThreadPoolExecutor(max_workers=UPLOAD_WRITER_THREADS, thread_name_prefix="upload-writer")
+
+Upload = namedtuple("Upload", ["file_url", "image", "scale", "image_hash"])
+
+
+def decode_upload(data: bytes, target_size: int = INFERENCE_INPUT_SIZE):
+    """
+    Décode une image depuis la mémoire pour l'inférence.
+
+    Pour un JPEG, le mode draft laisse libjpeg décoder directement à une
+    échelle réduite (1/2, 1/4, 1/8) qui reste au moins aussi grande que
+    l'entrée du modèle. Retourne l'image RGB et le facteur (sx, sy) qui
+    ramène ses coordonnées à celles de l'original.
+    """
+    image = Image.open(io.BytesIO(data))
+    original_width, original_height = image.size
+    if image.format == "JPEG":
+        image.draft("RGB", (target_size, target_size))
+    image = image.convert("RGB")
+    return image, (original_width / image.width, original_height / image.height)
+
+
+def _write_file(data: bytes, path: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def save_upload_async(data: bytes, path: str):
+    """Écrit l'original sur disque en arrière-plan"""
+    return _writer.submit(_write_file, data, path)
+
+
+def ingest_upload(file, user_id):
+    """Lit un fichier envoyé en mémoire, programme sa sauvegarde et le décode"""
+    data = file.read()
+
+    ext = os.path.splitext(secure_filename(file.filename))[1]
+    unique_name = f"{user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}{ext}"
+    uploads_dir = os.path.join(current_app.root_path, 'static', 'uploads')
+    save_upload_async(data, os.path.join(uploads_dir, unique_name))
+
+    image, scale = decode_upload(data)
+    return Upload(
+        file_url=f"/static/uploads/{unique_name}",
+        image=image,
+        scale=scale,
+        image_hash=hash_image_bytes(data)
+    )
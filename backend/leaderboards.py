@@ -0,0 +1,162 @@
+"""
+Classements des joueurs : général (total_points), hebdomadaire et amis.
+
+Chaque classement est une SortedList de (-points, user_id) tenue à jour à
+chaque gain de points (update_user_stats) : le top N et le rang d'un joueur
+se lisent en O(log n), sans ORDER BY sur la table users.
+
+Le classement hebdomadaire porte sur la semaine en cours (lundi 00:00 UTC)
+et se vide au changement de semaine. Un thread recharge les deux
+classements depuis la base toutes les LEADERBOARD_REBUILD_SECONDS, ce qui
+rattrape aussi les points gagnés via un autre worker. Le classement des
+amis est pris dans le classement général, restreint aux amis (table
+friends).
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from sortedcontainers import SortedList
+from sqlalchemy import func, cast, Integer
+from .database import db
+from .models import User, Reward
+
+
+LEADERBOARD_REBUILD_SECONDS = float(os.getenv("LEADERBOARD_REBUILD_SECONDS", "600"))
+
+
+def week_start(now: datetime = None):
+    """Début (lundi 00:00 UTC) de la semaine de `now`"""
+    now = now or datetime.utcnow()
+    return datetime(now.year, now.month, now.day) - timedelta(days=now.weekday())
+
+
+class Leaderboard:
+    """Scores par joueur, triés en continu"""
+
+    def __init__(self):
+        self._scores = {}   # user_id -> points
+        self._ranked = SortedList()   # (-points, user_id)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _set(self, user_id: int, points: int):
+        old = self._scores.get(user_id)
+        if old is not None:
+            self._ranked.remove((-old, user_id))
+        self._scores[user_id] = points
+        self._ranked.add((-points, user_id))
+
+    def set(self, user_id: int, points: int):
+        with self._lock:
+            self._set(user_id, points)
+
+    def add(self, user_id: int, delta: int):
+        with self._lock:
+            self._set(user_id, self._scores.get(user_id, 0) + delta)
+
+    def load(self, rows):
+        """Remplace tout le classement par les lignes (user_id, points)"""
+        scores = {user_id: points for user_id, points in rows}
+        ranked = SortedList((-points, user_id) for user_id, points in scores.items())
+        with self._lock:
+            self._scores, self._ranked = scores, ranked
+
+    def clear(self):
+        self.load([])
+
+    def top(self, limit: int):
+        """[(rang, user_id, points)] des `limit` premiers"""
+        with self._lock:
+            return [(rank, user_id, -negative)
+                    for rank, (negative, user_id) in enumerate(self._ranked.islice(0, limit), start=1)]
+
+    def rank(self, user_id: int):
+        """(rang, points) du joueur, ou None s'il n'est pas classé"""
+        with self._lock:
+            points = self._scores.get(user_id)
+            if points is None:
+                return None
+            return self._ranked.index((-points, user_id)) + 1, points
+
+    def scores(self, user_ids):
+        with self._lock:
+            return {user_id: self._scores.get(user_id, 0) for user_id in user_ids}
+
+
+class LeaderboardService:
+    def __init__(self, rebuild_seconds: float = LEADERBOARD_REBUILD_SECONDS):
+        self.rebuild_seconds = rebuild_seconds
+        self.global_board = Leaderboard()
+        self.weekly_board = Leaderboard()
+        self.week = week_start()
+        self.app = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Charge les classements ; le thread de reconstruction démarre à la première requête"""
+        self.app = app
+        with app.app_context():
+            self.rebuild(db.session)
+        app.before_request(self.ensure_started)
+
+    def ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="leaderboards", daemon=True)
+                self._thread.start()
+
+    def _loop(self):
+        while True:
+            # Réveil au plus tard au changement de semaine
+            next_week = (self.week + timedelta(days=7) - datetime.utcnow()).total_seconds()
+            time.sleep(max(1.0, min(self.rebuild_seconds, next_week)))
+            try:
+                with self.app.app_context():
+                    self.rebuild(db.session)
+            except Exception as e:
+                print(f"Leaderboard rebuild error: {e}")
+            finally:
+                db.session.remove()
+
+    def rebuild(self, session):
+        """Recharge le classement général et celui de la semaine depuis la base"""
+        start = week_start()
+        self.global_board.load(
+            session.query(User.id, User.total_points).filter(User.total_points > 0).all())
+        # Points des défis : reward_value est le nombre de points gagnés
+        self.weekly_board.load(
+            session.query(Reward.user_id, func.sum(cast(Reward.reward_value, Integer))).filter(
+                Reward.created_at >= start,
+                Reward.user_id.isnot(None),
+                Reward.reward_value.op("~")("^[0-9]+$")
+            ).group_by(Reward.user_id).all())
+        self.week = start
+
+    def record_points(self, user_id: int, total_points: int, points: int):
+        """Après un gain de points validé en base"""
+        self.global_board.set(user_id, total_points)
+        start = week_start()
+        if start != self.week:
+            # Nouvelle semaine : le classement repart de zéro
+            self.weekly_board.clear()
+            self.week = start
+        if points:
+            self.weekly_board.add(user_id, points)
+
+    def board(self, name: str):
+        return {"global": self.global_board, "weekly": self.weekly_board}[name]
+
+    def friends(self, user_id: int, friend_ids):
+        """[(rang, user_id, points)] du joueur et de ses amis"""
+        scores = self.global_board.scores(set(friend_ids) | {user_id})
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(rank, uid, points) for rank, (uid, points) in enumerate(ranked, start=1)]
+
+
+leaderboards = LeaderboardService()
@@ -0,0 +1,88 @@
+"""
+Index des parties publiques ouvertes, pour /games/quickjoin.
+
+Les parties publiques en "waiting" avec au moins une place libre sont
+rangées par (mode, max_objects). Chaque groupe est un tas trié par places
+libres puis ancienneté : on remplit d'abord les parties presque pleines
+pour qu'elles démarrent vite. Trouver une partie coûte O(log n) ; les
+entrées périmées sont ignorées quand elles arrivent en tête du tas.
+
+L'index est propre au worker. La base reste la référence : le quick-join
+revérifie la partie (ligne verrouillée) avant d'ajouter le joueur, et
+l'index est reconstruit depuis l'index partiel ix_games_open_public au
+démarrage et quand un groupe est vide.
+"""
+import heapq
+import threading
+from sqlalchemy import func
+from .models import Game, GameParticipant
+
+
+class MatchmakingIndex:
+    def __init__(self):
+        self._buckets = {}   # (mode, max_objects) -> tas [(places libres, created_at, game_id)]
+        self._entries = {}   # game_id -> entrée valide
+        self._lock = threading.Lock()
+
+    def update(self, game, player_count: int):
+        """Ajoute, met à jour ou retire une partie selon son état"""
+        if not game.is_public or game.status != "waiting" or player_count >= game.max_players:
+            self.remove(game.id)
+            return
+        key = (game.mode, game.max_objects)
+        entry = (game.max_players - player_count, game.created_at, game.id)
+        with self._lock:
+            if self._entries.get(game.id) == (key, entry):
+                return
+            self._entries[game.id] = (key, entry)
+            heapq.heappush(self._buckets.setdefault(key, []), entry)
+
+    def remove(self, game_id: int):
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+    def reserve(self, mode: str = None, max_objects: int = None):
+        """
+        Retourne la meilleure partie ouverte (None s'il n'y en a pas) et lui
+        retire une place dans l'index. L'appelant corrige ensuite l'entrée
+        avec update() ou remove() selon ce que dit la base.
+        """
+        with self._lock:
+            best_key, best = None, None
+            for key, heap in self._buckets.items():
+                if (mode is not None and key[0] != mode) or (max_objects is not None and key[1] != max_objects):
+                    continue
+                # Entrées périmées en tête du tas
+                while heap and self._entries.get(heap[0][2]) != (key, heap[0]):
+                    heapq.heappop(heap)
+                if heap and (best is None or heap[0] < best):
+                    best_key, best = key, heap[0]
+            if best is None:
+                return None
+
+            heapq.heappop(self._buckets[best_key])
+            free_slots, created_at, game_id = best
+            if free_slots > 1:
+                entry = (free_slots - 1, created_at, game_id)
+                self._entries[game_id] = (best_key, entry)
+                heapq.heappush(self._buckets[best_key], entry)
+            else:
+                self._entries.pop(game_id, None)
+            return game_id
+
+    def rebuild(self, session):
+        """Recharge l'index depuis la base (index partiel sur les parties ouvertes)"""
+        rows = session.query(Game, func.count(GameParticipant.id)).outerjoin(
+            GameParticipant, GameParticipant.game_id == Game.id
+        ).filter(
+            Game.is_public.is_(True), Game.status == "waiting"
+        ).group_by(Game.id).all()
+        with self._lock:
+            self._buckets.clear()
+            self._entries.clear()
+        for game, player_count in rows:
+            self.update(game, player_count)
+        return len(self._entries)
+
+
+matchmaking = MatchmakingIndex()
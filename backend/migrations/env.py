@@ -0,0 +1,72 @@
+import logging
+from logging.config import fileConfig
+
+from flask import current_app
+from sqlalchemy import text
+from alembic import context
+
+# Objet de configuration Alembic (alembic.ini)
+config = context.config
+
+fileConfig(config.config_file_name)
+logger = logging.getLogger("alembic.env")
+
+# Verrou consultatif PostgreSQL : au démarrage, chaque worker web lance
+# les migrations (DB_AUTO_MIGRATE) ; un seul à la fois les applique
+MIGRATION_LOCK_ID = 74201
+
+
+def get_engine():
+    return current_app.extensions["migrate"].db.engine
+
+
+def get_engine_url():
+    return get_engine().url.render_as_string(hide_password=False).replace("%", "%%")
+
+
+config.set_main_option("sqlalchemy.url", get_engine_url())
+target_db = current_app.extensions["migrate"].db
+
+
+def get_metadata():
+    return target_db.metadata
+
+
+def run_migrations_offline():
+    """Génère le SQL sans connexion (flask db upgrade --sql)"""
+    context.configure(url=config.get_main_option("sqlalchemy.url"),
+                      target_metadata=get_metadata(), literal_binds=True)
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # Pas de révision vide quand le schéma n'a pas changé
+    def process_revision_directives(context, revision, directives):
+        if getattr(config.cmd_opts, "autogenerate", False):
+            script = directives[0]
+            if script.upgrade_ops.is_empty():
+                directives[:] = []
+                logger.info("No changes in schema detected.")
+
+    conf_args = current_app.extensions["migrate"].configure_args
+    if conf_args.get("process_revision_directives") is None:
+        conf_args["process_revision_directives"] = process_revision_directives
+
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        connection.commit()
+        try:
+            context.configure(connection=connection, target_metadata=get_metadata(), **conf_args)
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+            connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
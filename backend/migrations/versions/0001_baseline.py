@@ -0,0 +1,217 @@
+"""Schéma de départ (tables créées jusqu'ici par db.create_all)
+
+Sur une base déjà créée par db.create_all(), les tables présentes sont
+conservées et seuls les ajouts faits depuis (anciennement SCHEMA_UPGRADES)
+sont appliqués.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _create_table(name, *columns, indexes=()):
+    # Idempotent : une table existante (db.create_all) est laissée telle quelle
+    if sa.inspect(op.get_bind()).has_table(name):
+        return
+    op.create_table(name, *columns)
+    for index_name, index_columns, kwargs in indexes:
+        op.create_index(index_name, name, index_columns, **kwargs)
+
+
+def upgrade():
+    _create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String(80), nullable=False, unique=True),
+        sa.Column("email", sa.String(120), nullable=False, unique=True),
+        sa.Column("password_hash", sa.String(128), nullable=False),
+        sa.Column("total_points", sa.Integer()),
+        sa.Column("total_coins", sa.Integer()),
+        sa.Column("current_streak", sa.Integer()),
+        sa.Column("longest_streak", sa.Integer()),
+        sa.Column("challenges_completed", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    _create_table(
+        "quests",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("object_to_find", sa.String()),
+        sa.Column("reward_points", sa.Integer()),
+        sa.Column("quest_date", sa.Date(), unique=True),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("ix_quests_id", ["id"], {})],
+    )
+    _create_table(
+        "object_lists",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(100), nullable=False, unique=True),
+        sa.Column("list", sa.Text(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    _create_table(
+        "photos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE")),
+        sa.Column("file_path", sa.Text(), nullable=False),
+        sa.Column("upload_date", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("is_analysed", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        indexes=[("ix_photos_id", ["id"], {})],
+    )
+    _create_table(
+        "games",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("creator_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("code", sa.String(8), nullable=False, unique=True),
+        sa.Column("is_public", sa.Boolean(), nullable=False),
+        sa.Column("max_players", sa.Integer(), nullable=False),
+        sa.Column("max_objects", sa.Integer(), nullable=False),
+        sa.Column("mode", sa.String(50), nullable=False),
+        sa.Column("filters", sa.JSON()),
+        sa.Column("status", sa.String(50), nullable=False),
+        sa.Column("start_timestamp", sa.DateTime()),
+        sa.Column("end_timestamp", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("password", sa.String(50)),
+    )
+    _create_table(
+        "game_objects",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("game_id", sa.Integer(), sa.ForeignKey("games.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("object_to_find", sa.String(100), nullable=False),
+        sa.Column("order_index", sa.Integer(), nullable=False),
+    )
+    _create_table(
+        "game_participants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("game_id", sa.Integer(), sa.ForeignKey("games.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("join_code", sa.String(8)),
+        sa.Column("is_creator", sa.Boolean(), nullable=False),
+        sa.Column("objects_to_find", sa.JSON(), nullable=False),
+        sa.Column("start_time", sa.DateTime()),
+        sa.Column("end_time", sa.DateTime()),
+        sa.Column("lap_times", sa.JSON(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+    _create_table(
+        "detections",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("photo_id", sa.Integer(), sa.ForeignKey("photos.id", ondelete="CASCADE")),
+        sa.Column("object_name", sa.String(100)),
+        sa.Column("confidence", sa.Float()),
+        sa.Column("bbox", sa.JSON()),
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("quests.id", ondelete="CASCADE")),
+        sa.Column("challenge_object", sa.String(100)),
+        sa.Column("is_challenge_object", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("game_participant_id", sa.Integer(),
+                  sa.ForeignKey("game_participants.id", ondelete="SET NULL")),
+        indexes=[("ix_detections_id", ["id"], {})],
+    )
+    _create_table(
+        "training_annotations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("photo_id", sa.Integer(), sa.ForeignKey("photos.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("quests.id", ondelete="SET NULL")),
+        sa.Column("object_name", sa.String(100), nullable=False),
+        sa.Column("bbox", sa.JSON(), nullable=False),
+        sa.Column("validated", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        indexes=[("ix_training_annotations_id", ["id"], {})],
+    )
+    _create_table(
+        "participant_objects",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("participant_id", sa.Integer(),
+                  sa.ForeignKey("game_participants.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("order_index", sa.Integer(), nullable=False),
+        sa.Column("object_name", sa.String(100), nullable=False),
+        sa.Column("found", sa.Boolean(), nullable=False),
+        sa.Column("skipped", sa.Boolean(), nullable=False),
+        sa.Column("lap_start", sa.DateTime()),
+        sa.Column("lap_end", sa.DateTime()),
+        sa.Column("found_at", sa.DateTime()),
+        sa.Column("skipped_at", sa.DateTime()),
+        sa.UniqueConstraint("participant_id", "order_index", name="uq_participant_object_order"),
+        indexes=[("ix_participant_objects_object_name", ["object_name"], {})],
+    )
+    _create_table(
+        "game_results",
+        sa.Column("game_id", sa.Integer(), sa.ForeignKey("games.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("results", sa.JSON(), nullable=False),
+        sa.Column("etag", sa.String(64), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    _create_table(
+        "friends",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("friend_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("status", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("ix_friends_id", ["id"], {})],
+    )
+    _create_table(
+        "rewards",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("reward_type", sa.String()),
+        sa.Column("reward_value", sa.String()),
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("quests.id", ondelete="CASCADE")),
+        sa.Column("created_at", sa.DateTime()),
+        indexes=[("ix_rewards_id", ["id"], {})],
+    )
+    _create_table(
+        "detection_cache",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("image_hash", sa.String(64), nullable=False),
+        sa.Column("model_version", sa.String(200), nullable=False),
+        sa.Column("variant", sa.String(120), nullable=False),
+        sa.Column("detections", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+        sa.UniqueConstraint("image_hash", "model_version", "variant", name="uq_detection_cache_key"),
+    )
+    _create_table(
+        "detection_jobs",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("result", sa.JSON()),
+        sa.Column("error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime()),
+    )
+
+    # Ajouts aux tables existantes, appliqués jusqu'ici au démarrage
+    # (SCHEMA_UPGRADES) ; sans effet sur une base neuve
+    op.execute("ALTER TABLE game_participants ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0")
+    # Parties publiques ouvertes (quick-join)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_games_open_public ON games (mode, max_objects, created_at) "
+               "WHERE is_public AND status = 'waiting'")
+
+
+def downgrade():
+    for name in ("detection_jobs", "detection_cache", "rewards", "friends", "game_results",
+                 "participant_objects", "training_annotations", "detections", "game_participants",
+                 "game_objects", "games", "photos", "object_lists", "quests", "users"):
+        op.drop_table(name)
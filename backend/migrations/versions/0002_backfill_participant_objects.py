@@ -0,0 +1,53 @@
+"""Reprise de la progression JSON (objects_to_find / lap_times) dans participant_objects
+
+Remplace python -m backend.data_migrations. Les lignes déjà présentes sont
+conservées ; les participants oubliés sont encore repris à la volée par
+game_state.load_progress.
+
+Revision ID: 0002_backfill_participant_objects
+Revises: 0001_baseline
+Create Date: 2026-10-18 10:05:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0002_backfill_participant_objects"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Même requête que crud.backfill_participant_objects, figée ici pour que
+    # la migration ne dépende pas du code de l'application
+    op.execute("""
+        INSERT INTO participant_objects
+            (participant_id, order_index, object_name, found, skipped, lap_start, lap_end)
+        SELECT gp.id,
+               (o->>'order_index')::int,
+               o->>'objectname',
+               COALESCE((o->>'found')::boolean, false),
+               COALESCE((o->>'skipped')::boolean, false),
+               (lap->>'start_time')::timestamp,
+               (lap->>'end_time')::timestamp
+        FROM game_participants gp
+        CROSS JOIN LATERAL json_array_elements(
+            CASE WHEN json_typeof(gp.objects_to_find::json) = 'array' THEN gp.objects_to_find::json ELSE '[]'::json END
+        ) o
+        LEFT JOIN LATERAL (
+            SELECT l FROM json_array_elements(
+                CASE WHEN json_typeof(gp.lap_times::json) = 'array' THEN gp.lap_times::json ELSE '[]'::json END
+            ) l
+            WHERE l->>'order_index' = o->>'order_index'
+            LIMIT 1
+        ) laps(lap) ON true
+        WHERE json_typeof(o) = 'object' AND o->>'order_index' IS NOT NULL
+        ON CONFLICT (participant_id, order_index) DO NOTHING
+    """)
+
+
+def downgrade():
+    # Les colonnes JSON n'ont pas été modifiées : rien à défaire
+    pass
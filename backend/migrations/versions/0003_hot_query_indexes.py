@@ -0,0 +1,48 @@
+"""Index des requêtes fréquentes de crud.py
+
+Créés avec CREATE INDEX CONCURRENTLY pour ne pas bloquer les écritures
+sur une base en production. Vérification des plans :
+python -m backend.explain_check
+
+Revision ID: 0003_hot_query_indexes
+Revises: 0002_backfill_participant_objects
+Create Date: 2026-10-18 10:10:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003_hot_query_indexes"
+down_revision = "0002_backfill_participant_objects"
+branch_labels = None
+depends_on = None
+
+
+# (nom, table, colonnes ou expressions)
+INDEXES = [
+    # Récompenses du jour, défi déjà fait aujourd'hui, streak :
+    # index d'expression sur date(created_at), comme dans les requêtes
+    ("ix_rewards_user_day_challenge", "rewards", ["user_id", sa.text("date(created_at)"), "challenge_id"]),
+    ("ix_detections_photo_id", "detections", ["photo_id"]),
+    ("ix_photos_user_upload_date", "photos", ["user_id", "upload_date"]),
+    ("ix_game_participants_game_user", "game_participants", ["game_id", "user_id"]),
+    ("ix_game_objects_game_order", "game_objects", ["game_id", "order_index"]),
+    ("ix_friends_user_id", "friends", ["user_id"]),
+    ("ix_training_annotations_user_photo", "training_annotations", ["user_id", "photo_id"]),
+    ("ix_games_status_start_timestamp", "games", ["status", "start_timestamp"]),
+]
+
+
+def upgrade():
+    # CONCURRENTLY est interdit dans une transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,44 @@
+"""Registre des complétions de défis (un défi au plus une fois par jour)
+
+Repris depuis rewards : une complétion par (utilisateur, défi, jour), liée
+à la première récompense de ce jour-là.
+
+Revision ID: 0004_challenge_completions
+Revises: 0003_hot_query_indexes
+Create Date: 2026-10-18 11:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004_challenge_completions"
+down_revision = "0003_hot_query_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "challenge_completions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("challenge_id", sa.Integer(), sa.ForeignKey("quests.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("completion_day", sa.Date(), nullable=False),
+        sa.Column("reward_id", sa.Integer(), sa.ForeignKey("rewards.id", ondelete="SET NULL")),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("user_id", "challenge_id", "completion_day", name="uq_challenge_completion_day"),
+    )
+    op.execute("""
+        INSERT INTO challenge_completions (user_id, challenge_id, completion_day, reward_id, created_at)
+        SELECT DISTINCT ON (user_id, challenge_id, date(created_at))
+               user_id, challenge_id, date(created_at), id, created_at
+        FROM rewards
+        WHERE user_id IS NOT NULL AND challenge_id IS NOT NULL AND created_at IS NOT NULL
+        ORDER BY user_id, challenge_id, date(created_at), id
+    """)
+
+
+def downgrade():
+    op.drop_table("challenge_completions")
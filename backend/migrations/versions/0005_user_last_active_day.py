@@ -0,0 +1,47 @@
+"""Streak incrémental : users.last_active_day, puis recalcul de tous les streaks
+
+Revision ID: 0005_user_last_active_day
+Revises: 0004_challenge_completions
+Create Date: 2026-10-18 11:30:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0005_user_last_active_day"
+down_revision = "0004_challenge_completions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("last_active_day", sa.Date()))
+    # Même requête que streaks.repair_streaks, figée ici
+    op.execute("""
+        WITH days AS (
+            SELECT DISTINCT user_id, completion_day AS day FROM challenge_completions
+        ), islands AS (
+            SELECT user_id, day,
+                   day - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day))::int AS island
+            FROM days
+        ), runs AS (
+            SELECT user_id, COUNT(*) AS length, MAX(day) AS last_day
+            FROM islands GROUP BY user_id, island
+        ), per_user AS (
+            SELECT user_id, MAX(last_day) AS last_day, MAX(length) AS longest,
+                   (ARRAY_AGG(length ORDER BY last_day DESC))[1] AS current
+            FROM runs GROUP BY user_id
+        )
+        UPDATE users u
+        SET last_active_day = p.last_day,
+            current_streak = COALESCE(p.current, 0),
+            longest_streak = GREATEST(COALESCE(u.longest_streak, 0), COALESCE(p.longest, 0))
+        FROM users u2 LEFT JOIN per_user p ON p.user_id = u2.id
+        WHERE u.id = u2.id
+    """)
+
+
+def downgrade():
+    op.drop_column("users", "last_active_day")
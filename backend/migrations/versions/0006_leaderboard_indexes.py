@@ -0,0 +1,33 @@
+"""Index des classements : points de la semaine et amis dans les deux sens
+
+Revision ID: 0006_leaderboard_indexes
+Revises: 0005_user_last_active_day
+Create Date: 2026-10-18 12:00:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0006_leaderboard_indexes"
+down_revision = "0005_user_last_active_day"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_rewards_created_at", "rewards", ["created_at"]),
+    ("ix_friends_friend_id", "friends", ["friend_id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
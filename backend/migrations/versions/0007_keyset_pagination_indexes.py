@@ -0,0 +1,41 @@
+"""Index de la pagination par curseur : (user_id, created_at, id)
+
+ix_photos_user_upload_date est remplacé : la galerie est maintenant triée
+par (created_at, id).
+
+Revision ID: 0007_keyset_pagination_indexes
+Revises: 0006_leaderboard_indexes
+Create Date: 2026-10-18 12:30:00
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "0007_keyset_pagination_indexes"
+down_revision = "0006_leaderboard_indexes"
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ("ix_photos_user_created_id", "photos", ["user_id", "created_at", "id"]),
+    ("ix_rewards_user_created_id", "rewards", ["user_id", "created_at", "id"]),
+    ("ix_training_annotations_user_created_id", "training_annotations", ["user_id", "created_at", "id"]),
+]
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+        op.drop_index("ix_photos_user_upload_date", table_name="photos",
+                      postgresql_concurrently=True, if_exists=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.create_index("ix_photos_user_upload_date", "photos", ["user_id", "upload_date"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
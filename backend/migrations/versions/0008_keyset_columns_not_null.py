@@ -0,0 +1,41 @@
+"""Colonnes des curseurs de pagination NOT NULL
+
+Un NULL dans une clé de tri casse la pagination par curseur : il passe en
+tête d'un ORDER BY ... DESC et (NULL, id) < (valeur, id) n'est jamais vrai.
+Les lignes sans date sont rangées comme les plus anciennes : quêtes sans
+quest_date au 1er janvier de l'an 1 plus leur id (quest_date est unique),
+photos à leur upload_date, le reste au 1er janvier 1970.
+
+Revision ID: 0008_keyset_columns_not_null
+Revises: 0007_keyset_pagination_indexes
+Create Date: 2026-10-18 14:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008_keyset_columns_not_null"
+down_revision = "0007_keyset_pagination_indexes"
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = [
+    ("quests", "quest_date", sa.Date(), "DATE '0001-01-01' + id"),
+    ("rewards", "created_at", sa.DateTime(), "TIMESTAMP '1970-01-01'"),
+    ("photos", "created_at", sa.DateTime(), "COALESCE(upload_date, TIMESTAMP '1970-01-01')"),
+    ("training_annotations", "created_at", sa.DateTime(), "TIMESTAMP '1970-01-01'"),
+]
+
+
+def upgrade():
+    for table, column, type_, backfill in COLUMNS:
+        op.execute(f"UPDATE {table} SET {column} = {backfill} WHERE {column} IS NULL")
+        op.alter_column(table, column, existing_type=type_, nullable=False)
+
+
+def downgrade():
+    for table, column, type_, _ in reversed(COLUMNS):
+        op.alter_column(table, column, existing_type=type_, nullable=True)
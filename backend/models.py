@@ -14,6 +14,8 @@ class User(db.Model):
     total_coins = db.Column(db.Integer, default=0)
     current_streak = db.Column(db.Integer, default=0)
     longest_streak = db.Column(db.Integer, default=0)
+    # Dernier jour (UTC) avec un défi complété, pour avancer le streak
+    last_active_day = db.Column(db.Date)
     challenges_completed = db.Column(db.Integer, default=0)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -26,7 +28,7 @@ class Quest(db.Model):
     description = db.Column(db.String)
     object_to_find = db.Column(db.String)
     reward_points = db.Column(db.Integer)
-    quest_date = db.Column(db.Date, unique=True)
+    quest_date = db.Column(db.Date, unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
@@ -48,7 +50,12 @@ class Photo(db.Model):
     upload_date = db.Column(db.DateTime, server_default=db.func.now())
     # Indique si la photo a été analysée par l'IA
     is_analysed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        # Galerie : photos d'un utilisateur, plus récentes d'abord (pagination.py)
+        db.Index("ix_photos_user_created_id", "user_id", "created_at", "id"),
+    )
 
 
 class Detection(db.Model):
@@ -67,6 +74,10 @@ class Detection(db.Model):
     created_at = db.Column(db.DateTime, server_default=db.func.now())
     game_participant_id = db.Column(db.Integer, db.ForeignKey("game_participants.id", ondelete="SET NULL"),nullable=True)
 
+    __table_args__ = (
+        db.Index("ix_detections_photo_id", "photo_id"),
+    )
+
 
 class TrainingAnnotation(db.Model):
     __tablename__ = "training_annotations"
@@ -77,7 +88,12 @@ class TrainingAnnotation(db.Model):
     object_name = db.Column(db.String(100), nullable=False)
     bbox = db.Column(db.JSON, nullable=False)
     validated = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    created_at = db.Column(db.DateTime, server_default=db.func.now(), nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_training_annotations_user_photo", "user_id", "photo_id"),
+        db.Index("ix_training_annotations_user_created_id", "user_id", "created_at", "id"),
+    )
 
 
 class Game(db.Model):
@@ -96,6 +112,14 @@ class Game(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     password = db.Column(db.String(50))
 
+    __table_args__ = (
+        # Index partiel des parties publiques ouvertes (matchmaking.py)
+        db.Index("ix_games_open_public", "mode", "max_objects", "created_at",
+                 postgresql_where=db.text("is_public AND status = 'waiting'")),
+        # Départs et expirations (game_scheduler.py)
+        db.Index("ix_games_status_start_timestamp", "status", "start_timestamp"),
+    )
+
 
 class GameObject(db.Model):
     __tablename__ = "game_objects"
@@ -104,6 +128,10 @@ class GameObject(db.Model):
     object_to_find = db.Column(db.String(100), nullable=False)
     order_index = db.Column(db.Integer, default=1, nullable=False)
 
+    __table_args__ = (
+        db.Index("ix_game_objects_game_order", "game_id", "order_index"),
+    )
+
 
 class GameParticipant(db.Model):
     __tablename__ = "game_participants"
@@ -118,6 +146,43 @@ class GameParticipant(db.Model):
     lap_times = db.Column(db.JSON, default=list, nullable=False)
     status = db.Column(db.String(20), default="pending", nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Incrémentée à chaque écriture de la progression (compare-and-swap)
+    version = db.Column(db.Integer, default=0, server_default="0", nullable=False)
+
+    __table_args__ = (
+        # Participants d'une partie, et recherche d'un joueur dans une partie
+        db.Index("ix_game_participants_game_user", "game_id", "user_id"),
+    )
+
+
+class ParticipantObject(db.Model):
+    """Progression d'un participant sur un objet (remplace objects_to_find / lap_times)"""
+    __tablename__ = "participant_objects"
+    id = db.Column(db.Integer, primary_key=True)
+    participant_id = db.Column(db.Integer, db.ForeignKey("game_participants.id", ondelete="CASCADE"), nullable=False)
+    order_index = db.Column(db.Integer, nullable=False)
+    object_name = db.Column(db.String(100), nullable=False, index=True)
+    found = db.Column(db.Boolean, default=False, nullable=False)
+    skipped = db.Column(db.Boolean, default=False, nullable=False)
+    # Temps de tour envoyés par l'app
+    lap_start = db.Column(db.DateTime)
+    lap_end = db.Column(db.DateTime)
+    # Horodatage serveur des changements
+    found_at = db.Column(db.DateTime)
+    skipped_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint("participant_id", "order_index", name="uq_participant_object_order"),
+    )
+
+
+class GameResult(db.Model):
+    """Classement figé d'une partie terminée (voir game_results.py)"""
+    __tablename__ = "game_results"
+    game_id = db.Column(db.Integer, db.ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
+    results = db.Column(db.JSON, nullable=False)
+    etag = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
 
 class Friend(db.Model):
@@ -128,6 +193,11 @@ class Friend(db.Model):
     status = db.Column(db.String, default="en attente")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_friends_user_id", "user_id"),
+        db.Index("ix_friends_friend_id", "friend_id"),
+    )
+
 
 class Reward(db.Model):
     __tablename__ = "rewards"
@@ -136,4 +206,64 @@ class Reward(db.Model):
     reward_type = db.Column(db.String)
     reward_value = db.Column(db.String)
     challenge_id = db.Column(db.Integer, db.ForeignKey("quests.id", ondelete="CASCADE"), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # Index d'expression : les requêtes filtrent sur date(created_at).
+        # (user_id, jour) d'abord pour servir aussi les récompenses du jour
+        # et le calcul du streak, qui ne filtrent pas sur challenge_id
+        db.Index("ix_rewards_user_day_challenge", "user_id",
+                 db.text("date(created_at)"), "challenge_id"),
+        # Points de la semaine (leaderboards.py)
+        db.Index("ix_rewards_created_at", "created_at"),
+        # Historique paginé (pagination.py)
+        db.Index("ix_rewards_user_created_id", "user_id", "created_at", "id"),
+    )
+
+
+class ChallengeCompletion(db.Model):
+    """Défi complété par un utilisateur un jour donné (au plus une fois par jour)"""
+    __tablename__ = "challenge_completions"
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    challenge_id = db.Column(db.Integer, db.ForeignKey("quests.id", ondelete="CASCADE"), nullable=False)
+    # Jour UTC de la complétion
+    completion_day = db.Column(db.Date, nullable=False)
+    reward_id = db.Column(db.Integer, db.ForeignKey("rewards.id", ondelete="SET NULL"))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        # "Déjà complété aujourd'hui ?" = une lecture de cet index ; deux
+        # envois simultanés ne peuvent pas créer deux complétions
+        db.UniqueConstraint("user_id", "challenge_id", "completion_day", name="uq_challenge_completion_day"),
+    )
+
+
+class DetectionCacheEntry(db.Model):
+    __tablename__ = "detection_cache"
+    id = db.Column(db.Integer, primary_key=True)
+    # SHA-256 des octets de l'image envoyée
+    image_hash = db.Column(db.String(64), nullable=False)
+    # Modèle, backend et réglages de cascade ayant produit le résultat
+    model_version = db.Column(db.String(200), nullable=False)
+    # "full", "cascade:<objet>" ou "verify:<objet>"
+    variant = db.Column(db.String(120), nullable=False)
+    detections = db.Column(db.JSON, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("image_hash", "model_version", "variant", name="uq_detection_cache_key"),
+    )
+
+
+class DetectionJob(db.Model):
+    __tablename__ = "detection_jobs"
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # queued -> running -> done | failed
+    status = db.Column(db.String(20), default="queued", nullable=False)
+    # Même contenu que la réponse synchrone de /photos/detect
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime)
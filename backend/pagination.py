@@ -0,0 +1,98 @@
+"""
+Pagination par curseur (keyset) des listes : /photos/me, /quests, /rewards,
+/annotations.
+
+Une page est lue avec WHERE (created_at, id) < (clé de la dernière ligne)
+ORDER BY created_at DESC, id DESC LIMIT n : le coût ne dépend pas de la
+position dans l'historique, et une ligne ajoutée entre deux pages ne
+décale pas la suite.
+
+La réponse reste une liste ; le curseur de la page suivante est dans
+l'en-tête X-Next-Cursor (absent sur la dernière page) et se renvoie tel
+quel dans ?cursor=. Il est signé et lié à la route et à l'utilisateur :
+un client ne peut ni le fabriquer ni le réutiliser ailleurs.
+"""
+import os
+from datetime import date, datetime
+from flask import current_app, request
+from itsdangerous import URLSafeSerializer, BadSignature
+from sqlalchemy import Date, DateTime, tuple_
+
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "20"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "100"))
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _serializer(scope: str):
+    return URLSafeSerializer(current_app.config["JWT_SECRET_KEY"], salt=f"page-cursor:{scope}")
+
+
+def _encode_value(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+
+def _decode_value(column, value):
+    if value is not None and isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if value is not None and isinstance(column.type, Date):
+        return date.fromisoformat(value)
+    return value
+
+
+def page_params(scope: str, owner):
+    """
+    (taille de page, clé après laquelle reprendre ou None) depuis ?limit= et
+    ?cursor=. Lève InvalidCursor si le curseur n'a pas été émis pour cette
+    route et cet utilisateur.
+    """
+    try:
+        limit = int(request.args.get("limit", PAGE_SIZE_DEFAULT))
+    except ValueError:
+        raise InvalidCursor("limit doit être un entier")
+    limit = max(1, min(limit, PAGE_SIZE_MAX))
+
+    cursor = request.args.get("cursor")
+    if not cursor:
+        return limit, None
+    try:
+        payload = _serializer(scope).loads(cursor)
+    except BadSignature:
+        raise InvalidCursor("Curseur invalide")
+    if payload.get("o") != str(owner):
+        raise InvalidCursor("Curseur invalide")
+    return limit, payload["k"]
+
+
+def keyset(query, columns, after, limit: int):
+    """
+    Applique l'ordre décroissant sur `columns` (la dernière doit être unique,
+    en général l'id), reprend après la clé `after` et lit une ligne de plus
+    que la page pour savoir s'il y a une suite. Les colonnes doivent être
+    NOT NULL : un NULL passe en tête du tri décroissant et n'est jamais
+    inférieur à une clé.
+    """
+    if after is not None:
+        values = [_decode_value(column, value) for column, value in zip(columns, after)]
+        query = query.filter(tuple_(*columns) < tuple_(*values))
+    return query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+
+
+def split_page(rows, limit: int, key, scope: str, owner):
+    """(lignes de la page, curseur de la page suivante ou None)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    cursor = _serializer(scope).dumps({"o": str(owner), "k": [_encode_value(v) for v in key(rows[-1])]})
+    return rows, cursor
+
+
+def with_next_cursor(response, cursor):
+    """Ajoute l'en-tête X-Next-Cursor à une réponse (jsonify, code)"""
+    body, status = response
+    if cursor:
+        body.headers["X-Next-Cursor"] = cursor
+    return body, status
@@ -0,0 +1,227 @@
+"""
+Production d'un modèle YOLO11 quantifié INT8 (OpenVINO) pour le CPU.
+
+1. Calibration : un dataset YOLO est construit à partir de nos photos
+   stockées et des lignes TrainingAnnotation.
+2. Export : ultralytics/NNCF quantifie le modèle avec ce dataset.
+3. Contrôle de précision : le rappel sur les classes des défis est mesuré
+   pour le modèle fp32 et le modèle INT8 sur des photos annotées qui n'ont
+   pas servi à la calibration. Si une classe perd plus de
+   INT8_MAX_RECALL_DROP, le modèle n'est pas promu.
+
+Une fois promu, le modèle est servi avec INFERENCE_BACKEND=openvino-int8.
+
+    python -m backend.quantization
+"""
+import os
+import shutil
+import sys
+import tempfile
+import numpy as np
+from PIL import Image
+
+
+INT8_MAX_RECALL_DROP = float(os.getenv("INT8_MAX_RECALL_DROP", "0.02"))
+INT8_CALIBRATION_LIMIT = int(os.getenv("INT8_CALIBRATION_LIMIT", "300"))
+# Une photo annotée sur INT8_EVAL_MODULO sert à l'évaluation, pas à la calibration
+INT8_EVAL_MODULO = int(os.getenv("INT8_EVAL_MODULO", "5"))
+IOU_THRESHOLD = 0.5
+
+
+def photo_disk_path(app, photo):
+    # Photo.file_path est une URL du type /static/uploads/<nom>
+    return os.path.join(app.root_path, photo.file_path.lstrip("/"))
+
+
+def load_annotated_photos(app, db_session):
+    """Retourne {photo_id: (chemin, [(object_name, box)])} pour les photos annotées"""
+    from .models import Photo, TrainingAnnotation
+
+    rows = db_session.query(TrainingAnnotation, Photo).join(
+        Photo, Photo.id == TrainingAnnotation.photo_id
+    ).order_by(TrainingAnnotation.validated.desc(), TrainingAnnotation.id).all()
+
+    samples = {}
+    for ann, photo in rows:
+        path = photo_disk_path(app, photo)
+        box = (ann.bbox or {}).get("box")
+        if not os.path.exists(path) or not isinstance(box, list) or len(box) != 4:
+            continue
+        samples.setdefault(photo.id, (path, []))[1].append((ann.object_name, box))
+    return samples
+
+
+def challenge_classes(db_session):
+    """Classes utilisées par les défis : quêtes et listes d'objets des parties"""
+    from .models import Quest, ObjectList
+    from .crud import get_objects_from_list
+
+    classes = {q.object_to_find for q in db_session.query(Quest.object_to_find).distinct() if q.object_to_find}
+    for object_list in db_session.query(ObjectList).all():
+        classes.update(get_objects_from_list(db_session, object_list.name) or [])
+    return {c.lower() for c in classes}
+
+
+def split_samples(samples):
+    calibration = {pid: s for pid, s in samples.items() if pid % INT8_EVAL_MODULO != 0}
+    evaluation = {pid: s for pid, s in samples.items() if pid % INT8_EVAL_MODULO == 0}
+    return calibration, evaluation
+
+
+def build_calibration_dataset(samples, class_names, output_dir, limit=INT8_CALIBRATION_LIMIT):
+    """Écrit un dataset au format YOLO (images, labels, data.yaml) pour la calibration"""
+    name_to_id = {name.lower(): class_id for class_id, name in class_names.items()}
+    images_dir = os.path.join(output_dir, "images", "calib")
+    labels_dir = os.path.join(output_dir, "labels", "calib")
+    os.makedirs(images_dir, exist_ok=True)
+    os.makedirs(labels_dir, exist_ok=True)
+
+    for photo_id, (path, annotations) in list(samples.items())[:limit]:
+        stem = f"photo_{photo_id}"
+        image_path = os.path.join(images_dir, stem + os.path.splitext(path)[1])
+        shutil.copyfile(path, image_path)
+
+        width, height = Image.open(path).size
+        lines = []
+        for object_name, (x1, y1, x2, y2) in annotations:
+            class_id = name_to_id.get(object_name.lower())
+            if class_id is None:
+                continue
+            lines.append(
+                f"{class_id} {(x1 + x2) / 2 / width:.6f} {(y1 + y2) / 2 / height:.6f} "
+                f"{(x2 - x1) / width:.6f} {(y2 - y1) / height:.6f}"
+            )
+        with open(os.path.join(labels_dir, stem + ".txt"), "w") as f:
+            f.write("\n".join(lines))
+
+    data_yaml = os.path.join(output_dir, "data.yaml")
+    with open(data_yaml, "w") as f:
+        f.write(f"path: {os.path.abspath(output_dir)}\n")
+        f.write("train: images/calib\n")
+        f.write("val: images/calib\n")
+        f.write("names:\n")
+        for class_id, name in sorted(class_names.items()):
+            f.write(f"  {class_id}: {name}\n")
+    return data_yaml
+
+
+def export_int8(model_path, data_yaml):
+    """
+    Quantifie `model_path` en INT8 OpenVINO et retourne le dossier candidat.
+
+    L'export se fait depuis une copie du .pt dans un dossier temporaire :
+    ultralytics écrit à côté du modèle, et le dossier servi ne doit être
+    touché que par promote(), après le contrôle de précision.
+    """
+    from ultralytics import YOLO
+
+    work_dir = tempfile.mkdtemp(prefix="int8_export_")
+    try:
+        model_copy = os.path.join(work_dir, os.path.basename(model_path))
+        shutil.copyfile(model_path, model_copy)
+        return str(YOLO(model_copy).export(format="openvino", int8=True, dynamic=True, data=data_yaml))
+    except BaseException:
+        # Sinon la copie des poids reste dans le dossier temporaire ; après
+        # un export réussi, c'est quantize() qui le supprime
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+
+def evaluate_recall(yolo_model, samples, classes):
+    """Rappel par classe (IoU >= 0.5, même classe) sur les photos annotées"""
+    from .inference_backends import box_iou
+    from .utils import run_model
+
+    found = {c: 0 for c in classes}
+    total = {c: 0 for c in classes}
+    for path, annotations in samples.values():
+        img_array = np.array(Image.open(path).convert('RGB'))
+        detections = run_model(yolo_model, [img_array])[0]
+        for object_name, box in annotations:
+            name = object_name.lower()
+            if name not in total:
+                continue
+            total[name] += 1
+            if any(det["name"].lower() == name and box_iou(det["box"], box) >= IOU_THRESHOLD
+                   for det in detections):
+                found[name] += 1
+    return {c: found[c] / total[c] for c in classes if total[c]}
+
+
+def accuracy_gate(fp32_recall, int8_recall, max_drop=INT8_MAX_RECALL_DROP):
+    """Retourne les classes dont le rappel INT8 baisse de plus de `max_drop`"""
+    return {
+        c: (fp32_recall[c], int8_recall.get(c, 0.0))
+        for c in fp32_recall
+        if fp32_recall[c] - int8_recall.get(c, 0.0) > max_drop
+    }
+
+
+def promote(candidate, model_path):
+    """Remplace le modèle INT8 servi par le candidat"""
+    from .inference_backends import exported_model_path
+
+    target = exported_model_path(model_path, "openvino-int8")
+    # Copie à côté du modèle servi (le candidat est dans un dossier
+    # temporaire, parfois sur un autre disque), puis échange par renommage
+    staged, previous = target + ".candidate", target + ".previous"
+    for path in (staged, previous):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+    shutil.move(candidate, staged)
+    if os.path.exists(target):
+        os.rename(target, previous)
+    os.rename(staged, target)
+    if os.path.exists(previous):
+        shutil.rmtree(previous)
+    return target
+
+
+def quantize(app, model_path, work_dir="int8_calibration"):
+    """Calibration, export INT8 et promotion si le contrôle de précision passe"""
+    from .database import db
+    from .inference_backends import load_model
+
+    with app.app_context():
+        samples = load_annotated_photos(app, db.session)
+        classes = challenge_classes(db.session)
+
+    calibration, evaluation = split_samples(samples)
+    if not calibration or not evaluation:
+        raise RuntimeError("Pas assez de photos annotées pour calibrer et évaluer")
+
+    fp32_model = load_model(model_path, "torch")
+    # Classes des défis présentes dans le jeu d'évaluation (toutes à défaut)
+    evaluated = {name.lower() for _, anns in evaluation.values() for name, _ in anns}
+    classes = (classes & evaluated) or evaluated
+
+    data_yaml = build_calibration_dataset(calibration, fp32_model.names, work_dir)
+    candidate = export_int8(model_path, data_yaml)
+    try:
+        from ultralytics import YOLO
+        int8_model = YOLO(candidate, task="detect")
+
+        fp32_recall = evaluate_recall(fp32_model, evaluation, classes)
+        int8_recall = evaluate_recall(int8_model, evaluation, classes)
+        regressions = accuracy_gate(fp32_recall, int8_recall)
+
+        for c in sorted(fp32_recall):
+            print(f"{c:20s} fp32={fp32_recall[c]:.3f} int8={int8_recall.get(c, 0.0):.3f}")
+
+        if regressions:
+            print(f"INT8 model NOT promoted: recall drop > {INT8_MAX_RECALL_DROP} on {sorted(regressions)}")
+            return None
+
+        target = promote(candidate, model_path)
+        print(f"INT8 model promoted to {target}")
+        return target
+    finally:
+        # Dossier temporaire de l'export (copie du .pt, candidat refusé)
+        shutil.rmtree(os.path.dirname(candidate), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    from . import create_app
+    from .utils import YOLO_MODEL
+
+    sys.exit(0 if quantize(create_app(), YOLO_MODEL) else 1)
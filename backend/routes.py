@@ -1,7 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import (
     jwt_required, create_access_token,
-    get_jwt_identity, verify_jwt_in_request
+    get_jwt_identity, verify_jwt_in_request, decode_token
 )
 from flask import current_app  # Pour obtenir le chemin racine de l'app
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -18,14 +18,36 @@ from .crud import (
     get_detections_by_photo_id,
     create_game, update_game, get_game, get_game_by_code,
     add_game_object, get_object_list_by_name, get_objects_from_list, create_object_list, update_object_list,
-    add_participant, get_participant, list_participants, update_participant_status_and_start, update_participant_objects,
-    add_friend, get_friends,
-    add_reward, get_rewards, create_detection,
+    add_participant, get_participant, list_participants, is_game_member, start_game_countdown, join_open_game,
+    add_friend, get_friends, list_friend_ids, get_usernames,
+    add_reward, get_rewards, get_recent_rewards, count_user_photos, create_detection, create_detections_bulk,
+    get_challenge_completion, record_challenge_completion, set_completion_reward,
     create_annotation, get_annotations_by_user, get_annotations_by_photo,
-    update_user_stats, calculate_user_streak, get_user_statistics
+    get_detection_job,
+    lock_user, update_user_stats, get_user_statistics, completion_day
 )
+from .streaks import next_streak
+from .leaderboards import leaderboards
+from .pagination import page_params, split_page, with_next_cursor, InvalidCursor
 from .daily_quest_creation import create_daily_quest
-from .utils import detect_objects
+from .utils import verify_object, detect_objects_in_background, inference_stats
+from .admission import admission, admission_control
+from .ingestion import ingest_upload
+from .detection_jobs import (
+    run_photo_detection, submit_detection_job, serialize_job, job_channel, detection_row, expire_if_stale
+)
+from .events import broker, format_sse, next_event
+from .game_events import (
+    game_channel, game_snapshot, serialize_game, serialize_participant, serialize_participants,
+    publish_game_event, publish_game_status, acquire_game_socket, release_game_socket
+)
+from .game_scheduler import schedule_game_start
+from .game_state import game_state, parse_client_time, ProgressConflict
+from .matchmaking import matchmaking
+from .game_results import store_game_results
+from . import sock
+from simple_websocket import ConnectionClosed
+import json
 from PIL import Image
 from .database import db
 from .models import Reward
@@ -33,6 +55,17 @@ from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import timedelta
 import os
+import time
+
+
+# Durée max d'un flux SSE de job avant que le client ne se reconnecte
+DETECTION_JOB_STREAM_TIMEOUT = int(os.getenv("DETECTION_JOB_STREAM_TIMEOUT", "120"))
+# Message "ping" périodique pour garder le WebSocket ouvert derrière un proxy
+GAME_CHANNEL_PING_SECONDS = int(os.getenv("GAME_CHANNEL_PING_SECONDS", "25"))
+# Parties essayées par /games/quickjoin avant d'en créer une
+QUICKJOIN_ATTEMPTS = int(os.getenv("QUICKJOIN_ATTEMPTS", "3"))
+# Nombre max d'entrées renvoyées par /leaderboards/<classement>
+LEADERBOARD_MAX_LIMIT = int(os.getenv("LEADERBOARD_MAX_LIMIT", "100"))
 
 
 def create_routes(app):
@@ -79,6 +112,34 @@ def create_routes(app):
         
         return jsonify(stats), 200
 
+    @app.route('/leaderboards/<string:board>', methods=['GET'])
+    @jwt_required()
+    def get_leaderboard(board):
+        """Classement global, hebdomadaire ou des amis, avec le rang de l'utilisateur"""
+        user_id = int(get_jwt_identity())
+        if board not in ("global", "weekly", "friends"):
+            return jsonify({"error": "Classement inconnu"}), 404
+        try:
+            limit = max(1, min(int(request.args.get("limit", 10)), LEADERBOARD_MAX_LIMIT))
+        except ValueError:
+            return jsonify({"error": "limit doit être un entier"}), 400
+
+        if board == "friends":
+            ranked = leaderboards.friends(user_id, list_friend_ids(db.session, user_id))
+            entries = ranked[:limit]
+            me = next(((rank, points) for rank, uid, points in ranked if uid == user_id), None)
+        else:
+            entries = leaderboards.board(board).top(limit)
+            me = leaderboards.board(board).rank(user_id)
+
+        usernames = get_usernames(db.session, {uid for _, uid, _ in entries})
+        return jsonify({
+            "board": board,
+            "entries": [{"rank": rank, "user_id": uid, "username": usernames.get(uid), "points": points}
+                        for rank, uid, points in entries],
+            "me": {"rank": me[0], "points": me[1]} if me else None
+        }), 200
+
     @app.route('/users/profile', methods=['GET'])
     @jwt_required()
     def get_user_profile():
@@ -89,8 +150,10 @@ def create_routes(app):
         if not user:
             return jsonify({"error": "Utilisateur introuvable"}), 404
         
-        # Récupérer les récompenses récentes
-        recent_rewards = get_rewards(db.session, user_id)[-10:]  # 10 dernières
+        # Récupérer les récompenses récentes (10 dernières, de la plus ancienne à la plus récente)
+        recent_rewards = get_recent_rewards(db.session, user_id, limit=10)[::-1]
+        # Comptés en base : /photos/me ne renvoie plus qu'une page
+        photos_count, analysed_photos = count_user_photos(db.session, user_id)
         
         return jsonify({
             "user": {
@@ -105,6 +168,8 @@ def create_routes(app):
                 "created_at": user.created_at,
                 "updated_at": user.updated_at
             },
+            "photos_count": photos_count,
+            "analysed_photos": analysed_photos,
             "recent_rewards": [{
                 "id": r.id,
                 "reward_type": r.reward_type,
@@ -131,7 +196,12 @@ def create_routes(app):
 
     @app.route('/quests', methods=['GET'])
     def fetch_all_quests():
-        quests = get_all_quests()
+        try:
+            limit, after = page_params("quests", "all")
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        quests, cursor = split_page(get_all_quests(limit, after), limit,
+                                    lambda q: (q.quest_date, q.id), "quests", "all")
         quests_data = [{
             "id": q.id,
             "name": q.name,
@@ -140,7 +210,7 @@ def create_routes(app):
             "reward_points": q.reward_points,
             "quest_date": q.quest_date.isoformat() if q.quest_date else None
         } for q in quests]
-        return jsonify(quests_data), 200
+        return with_next_cursor((jsonify(quests_data), 200), cursor)
 
     @app.route('/quests/<string:quest_date>', methods=['GET'])
     def fetch_quest_by_date(quest_date):
@@ -189,15 +259,10 @@ def create_routes(app):
         if not challenge_id:
             return jsonify({"error": "challenge_id requis"}), 400
         
-        # Trouver la récompense du jour pour ce défi
-        reward = db.session.query(Reward).filter_by(
-            user_id=user_id,
-            challenge_id=challenge_id
-        ).filter(
-            func.date(Reward.created_at) == func.date(datetime.now(timezone.utc))
-        ).first()
+        # Trouver la récompense du jour pour ce défi (registre des complétions)
+        completion = get_challenge_completion(db.session, user_id, challenge_id)
         
-        if not reward:
+        if not completion or completion.reward_id is None:
             return jsonify({"error": "Aucune récompense à réclamer"}), 404
         
         # Marquer comme réclamée (si vous ajoutez un champ 'claimed' à votre modèle)
@@ -206,7 +271,7 @@ def create_routes(app):
         
         return jsonify({
             "message": "Récompense réclamée avec succès !",
-            "reward_id": reward.id
+            "reward_id": completion.reward_id
         }), 200
 
     @app.route('/friends/', methods=['POST'])
@@ -235,8 +300,16 @@ def create_routes(app):
         user_id = request.args.get('user_id')
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
-        rewards = get_rewards(db.session, user_id)
-        return jsonify([{"id": r.id, "user_id": r.user_id, "reward_type": r.reward_type, "reward_value": r.reward_value} for r in rewards])
+        try:
+            limit, after = page_params("rewards", user_id)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        rewards, cursor = split_page(get_rewards(db.session, user_id, limit, after), limit,
+                                     lambda r: (r.created_at, r.id), "rewards", user_id)
+        return with_next_cursor((jsonify([{
+            "id": r.id, "user_id": r.user_id, "reward_type": r.reward_type, "reward_value": r.reward_value,
+            "created_at": r.created_at.isoformat() if r.created_at else None
+        } for r in rewards]), 200), cursor)
 
 # Get detections by photo
     @app.route('/photos/detections/<int:photo_id>', methods=['GET'])
@@ -306,6 +379,7 @@ def create_routes(app):
 # Upload and detect photo
     @app.route('/photos/detect', methods=['POST'])
     @jwt_required()
+    @admission_control("daily")
     def detect_and_save_photo():
         current_user_id = get_jwt_identity()
 
@@ -316,27 +390,6 @@ def create_routes(app):
         if file.filename == "":
             return jsonify({"error": "Nom de fichier vide"}), 400
 
-        ext = os.path.splitext(secure_filename(file.filename))[1]
-        unique_name = f"{current_user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}{ext}"
-
-        ext = os.path.splitext(secure_filename(file.filename))[1]
-        unique_name = f"{current_user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}{ext}"
-
-        uploads_dir = os.path.join(current_app.root_path, 'static', 'uploads')
-        os.makedirs(uploads_dir, exist_ok=True)
-        file_path = os.path.join(uploads_dir, unique_name)
-        file_path = os.path.join(uploads_dir, unique_name)
-        file.save(file_path)
-
-        file_url = f"/static/uploads/{unique_name}"
-        file_url = f"/static/uploads/{unique_name}"
-        image = Image.open(file_path).convert('RGB')
-
-        photo = create_photo(db.session, file_path=file_url,
-                             user_id=current_user_id, is_analysed=True)
-
-        detections = detect_objects(image)
-
         challenge_id = request.form.get("challenge_id")
         challenge_object = None
 
@@ -354,34 +407,71 @@ def create_routes(app):
                 challenge_data = response.get_json()
                 challenge_object = challenge_data.get("object_to_find")
 
-        detection_entries = []
-        for det in detections:
-            is_challenge = challenge_object and det["name"].lower(
-            ) == challenge_object.lower()
-            entry = create_detection(
-                db.session,
-                photo_id=photo.id,
-                object_name=det["name"],
-                confidence=det["score"],
-                bbox={"box": det["box"]},
-                challenge_object=challenge_object,
-                is_challenge_object=is_challenge,
-                challenge_id=challenge_id
-            )
-            detection_entries.append({
-                "id": entry.id,
-                "object_name": entry.object_name,
-                "confidence": entry.confidence,
-                "bbox": entry.bbox,
-                "challenge_object": entry.challenge_object,
-                "is_challenge_object": entry.is_challenge_object,
-                "challenge_id": entry.challenge_id
-            })
-        return jsonify({
-            "photo": {"id": photo.id, "file_path": photo.file_path},
-            "detections": detection_entries,
-            "challenge_completed": any(det["is_challenge_object"] for det in detection_entries)
-        }), 201
+        # Décodage en mémoire ; l'original est écrit sur disque en arrière-plan
+        upload = ingest_upload(file, current_user_id)
+        verify = request.form.get("mode") == "verify"
+
+        if request.form.get("async") == "1" or request.args.get("async") == "1":
+            # Mode asynchrone : réponse immédiate, détection traitée par la file.
+            # Résultat via GET /photos/detect/jobs/<id> ou le flux SSE .../events
+            # La place d'admission reste prise jusqu'à la fin du job
+            job = submit_detection_job(current_user_id, upload, challenge_id, challenge_object, verify)
+            return jsonify({
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": f"/photos/detect/jobs/{job.id}",
+                "events_url": f"/photos/detect/jobs/{job.id}/events"
+            }), 202
+
+        result = run_photo_detection(current_user_id, upload, challenge_id, challenge_object, verify)
+        return jsonify(result), 201
+
+    @app.route('/photos/detect/jobs/<string:job_id>', methods=['GET'])
+    @jwt_required()
+    def get_detection_job_route(job_id):
+        job = get_detection_job(db.session, job_id, get_jwt_identity())
+        if not job:
+            return jsonify({"error": "Job introuvable"}), 404
+        return jsonify(serialize_job(expire_if_stale(db.session, job))), 200
+
+    @app.route('/photos/detect/jobs/<string:job_id>/events', methods=['GET'])
+    @jwt_required()
+    def stream_detection_job(job_id):
+        """Flux SSE : envoie le résultat du job dès qu'il est prêt"""
+        user_id = get_jwt_identity()
+        if not get_detection_job(db.session, job_id, user_id):
+            return jsonify({"error": "Job introuvable"}), 404
+
+        def stream():
+            channel = job_channel(job_id)
+            queue = broker.subscribe(channel)
+            try:
+                deadline = time.monotonic() + DETECTION_JOB_STREAM_TIMEOUT
+                while True:
+                    # Relecture en base : le job peut tourner dans un autre worker
+                    db.session.expire_all()
+                    job = expire_if_stale(db.session, get_detection_job(db.session, job_id, user_id))
+                    if job.status in ("done", "failed"):
+                        yield format_sse(job.status, serialize_job(job))
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        # Fin du flux : le client se reconnecte ou interroge status_url
+                        yield format_sse("timeout", {"job_id": job_id, "status": job.status})
+                        return
+                    yield format_sse("status", {"job_id": job_id, "status": job.status})
+                    next_event(queue, timeout=min(5, remaining))
+            finally:
+                broker.unsubscribe(channel, queue)
+
+        return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.route('/inference/stats', methods=['GET'])
+    @jwt_required()
+    def get_inference_stats():
+        """File d'inférence de ce worker : profondeur et attente par classe de priorité"""
+        return jsonify(models=inference_stats(), admission=admission.stats()), 200
 
     @app.route('/annotations/submit', methods=['POST'])
     @jwt_required()
@@ -430,8 +520,13 @@ def create_routes(app):
     @jwt_required()
     def get_user_annotations():
         current_user_id = get_jwt_identity()
-        annotations = get_annotations_by_user(
-            db.session, user_id=current_user_id)
+        try:
+            limit, after = page_params("annotations", current_user_id)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        annotations, cursor = split_page(
+            get_annotations_by_user(db.session, user_id=current_user_id, limit=limit, after=after),
+            limit, lambda a: (a.created_at, a.id), "annotations", current_user_id)
 
         result = []
         for ann in annotations:
@@ -448,7 +543,7 @@ def create_routes(app):
         if not result:
             return jsonify({"Aucun résultat": "Aucun résultat pour cet utilisateur"}), 200
 
-        return jsonify(result), 200
+        return with_next_cursor((jsonify(result), 200), cursor)
 
 # Get les annotations de l'utilisateur pour une photo précise
     @app.route('/annotations/<int:photo_id>', methods=['GET'])
@@ -496,16 +591,6 @@ def create_routes(app):
         if not quest:
             return jsonify({"error": "Challenge introuvable"}), 404
         
-        # Vérifier si l'utilisateur a déjà complété ce défi aujourd'hui
-        existing_reward = db.session.query(Reward).filter_by(
-            user_id=user_id,
-            challenge_id=challenge_id,
-            created_at=func.date(datetime.now(timezone.utc))  # Même jour
-        ).first()
-        
-        if existing_reward:
-            return jsonify({"error": "Défi déjà complété aujourd'hui"}), 400
-        
         # Si photo_id fourni, vérifier la détection
         if photo_id:
             detections = get_detections_by_photo_id(photo_id)
@@ -516,35 +601,52 @@ def create_routes(app):
             if not valid_detection:
                 return jsonify({"error": "Objet requis non détecté dans la photo"}), 400
         
+        # Réserve la complétion du jour : une seule ligne possible par
+        # (utilisateur, défi, jour), même si l'app envoie deux fois la demande
+        day = completion_day()
+        completion_id = record_challenge_completion(db.session, user_id, challenge_id, day)
+        if completion_id is None:
+            db.session.rollback()
+            return jsonify({"error": "Défi déjà complété aujourd'hui"}), 400
+        
         # Calculer les récompenses
         base_points = quest.reward_points
         base_coins = quest.reward_points // 2  # Exemple : moitié en pièces
         
-        # Bonus de streak (optionnel)
-        current_streak = calculate_user_streak(db.session, user_id) + 1  # +1 car ce défi va incrémenter
+        # Bonus de streak (optionnel), calculé sur la ligne verrouillée
+        # jusqu'à update_user_stats : un défi validé en parallèle attend
+        user = lock_user(db.session, user_id)
+        if not user:
+            db.session.rollback()
+            return jsonify({"error": "Utilisateur introuvable"}), 404
+        current_streak = next_streak(user, day)  # Streak après ce défi
         streak_bonus = min(current_streak * 5, 50)  # Max 50 points de bonus
         
         total_points = base_points + streak_bonus
         total_coins = base_coins
         
-        # Créer la récompense
+        # Créer la récompense (validée avec la complétion et les stats)
         reward = add_reward(
             db.session, 
             user_id, 
             reward_type=quest.name,
             reward_value=str(total_points),
-            challenge_id=challenge_id
+            challenge_id=challenge_id,
+            commit=False
         )
+        set_completion_reward(db.session, completion_id, reward.id)
         
         # IMPORTANT : Mettre à jour les stats de l'utilisateur
         updated_user = update_user_stats(
             db.session, 
             user_id, 
             points=total_points, 
-            coins=total_coins
+            coins=total_coins,
+            day=day
         )
         
         if not updated_user:
+            db.session.rollback()
             return jsonify({"error": "Erreur lors de la mise à jour du profil"}), 500
         
         return jsonify({
@@ -605,7 +707,12 @@ def create_routes(app):
         if not user_id:
             return jsonify({"error": "user_id is required"}), 400
 
-        photos = get_photos_by_user(user_id)
+        try:
+            limit, after = page_params("photos", user_id)
+        except InvalidCursor as e:
+            return jsonify({"error": str(e)}), 400
+        photos, cursor = split_page(get_photos_by_user(user_id, limit, after), limit,
+                                    lambda p: (p.created_at, p.id), "photos", user_id)
         photos_data = [{
             "id": p.id,
             "file_path": p.file_path,
@@ -613,7 +720,7 @@ def create_routes(app):
             "is_analysed": p.is_analysed
         } for p in photos]
 
-        return jsonify(photos_data), 200
+        return with_next_cursor((jsonify(photos_data), 200), cursor)
 
     @app.route('/photos/me/<int:photo_id>', methods=['GET'])
     @jwt_required()
@@ -654,8 +761,59 @@ def create_routes(app):
         # creator joins
         is_creator = True
         participant = add_participant(db.session, game.id, uid, is_creator)
+        matchmaking.update(game, 1)
+        publish_game_event(game.id, "participant_joined", serialize_participant(participant))
         return jsonify(game_id=game.id, code=game.code), 201
 
+    @app.route('/games/quickjoin', methods=['POST'])
+    @jwt_required()
+    def quick_join():
+        """
+        Place le joueur dans la meilleure partie publique ouverte
+        (mode / max_objects optionnels), ou en crée une s'il n'y en a pas.
+        """
+        uid = int(get_jwt_identity())
+        data = request.get_json() or {}
+        mode = data.get('mode')
+        max_objects = data.get('max_objects')
+
+        rebuilt = False
+        for _ in range(QUICKJOIN_ATTEMPTS):
+            game_id = matchmaking.reserve(mode, max_objects)
+            if game_id is None and not rebuilt:
+                # Groupe vide : parties créées par un autre worker ?
+                matchmaking.rebuild(db.session)
+                rebuilt = True
+                game_id = matchmaking.reserve(mode, max_objects)
+            if game_id is None:
+                break
+
+            # La base tranche : l'index peut être en retard
+            game, participant, player_count, joined = join_open_game(db.session, game_id, uid)
+            if game:
+                matchmaking.update(game, player_count)
+            else:
+                matchmaking.remove(game_id)
+            if participant:
+                if joined:
+                    user = get_user(db.session, uid)
+                    publish_game_event(game.id, "participant_joined",
+                                       serialize_participant(participant, user.username if user else None))
+                return jsonify(game_id=game.id, code=game.code, participant_id=participant.id, created=False), 200
+
+        game = create_game(
+            db.session,
+            creator_id=uid,
+            max_players=data.get('max_players', 4),
+            max_objects=max_objects or 5,
+            mode=mode or 'classique',
+            is_public=True
+        )
+        participant = add_participant(db.session, game.id, uid, is_creator=True)
+        matchmaking.update(game, 1)
+        publish_game_event(game.id, "participant_joined", serialize_participant(participant))
+        return jsonify(game_id=game.id, code=game.code, participant_id=participant.id, created=True), 201
+
     @app.route('/games/id/<int:game_id>', methods=['GET'])
     @jwt_required()
     def get_game_by_id_route(game_id):
@@ -663,20 +821,7 @@ def create_routes(app):
         if not game:
             return jsonify({"error": "Game not found"}), 404
 
-        return jsonify({
-            "id": game.id,
-            "code": game.code,
-            "creator_id": game.creator_id,
-            "is_public": game.is_public,
-            "max_players": game.max_players,
-            "max_objects": game.max_objects,
-            "mode": game.mode,
-            "filters": game.filters,
-            "status": game.status,
-            "start_timestamp": game.start_timestamp.isoformat() if game.start_timestamp else None,
-            "end_timestamp": game.end_timestamp.isoformat() if game.end_timestamp else None,
-            "created_at": game.created_at.isoformat() if game.created_at else None,
-        }), 200
+        return jsonify(serialize_game(game)), 200
 
     @app.route('/games/<int:game_id>/start', methods=['PUT'])
     @jwt_required()
@@ -698,18 +843,6 @@ def create_routes(app):
         if game.status == "in_progress":
             return jsonify(error='The game has already started'), 400
 
-        # Calculer le timestamp de démarrage (maintenant + countdown)
-        from datetime import datetime, timedelta
-        start_timestamp = datetime.utcnow() + timedelta(seconds=countdown_seconds)
-        
-        # Mettre à jour le statut de la partie à "starting" avec le timestamp
-        updated = update_game(
-            db.session,
-            game_id=game_id,
-            status='starting',
-            start_timestamp=start_timestamp
-        )
-
         # Récupérer la liste d'objets depuis la base de données
         objects_pool = get_objects_from_list(db.session, list_name)
         
@@ -736,20 +869,22 @@ def create_routes(app):
             return jsonify(error=f'Not enough objects in list "{list_name}". Required: {game.max_objects}, Available: {len(objects_pool)}'), 400
 
         selection = random.sample(objects_pool, k=game.max_objects)
-        for idx, name in enumerate(selection, start=1):
-            add_game_object(db.session, game_id, name, order_index=idx)
-
-        # Préparer le JSON structuré pour les participants
-        objects_payload = [
-            { "order_index": idx+1, "objectname": name, "found": False, "skipped": False }
-            for idx, name in enumerate(selection)
-        ]
-        
-        # Initialiser les objets pour chaque participant (sans start_time encore)
-        participants = list_participants(db.session, game_id)
-        for p in participants:
-            p.status = 'ready'  # Statut intermédiaire
-            update_participant_objects(db.session, p.id, objects_payload)
+
+        # Calculer le timestamp de démarrage (maintenant + countdown)
+        from datetime import datetime, timedelta
+        start_timestamp = datetime.utcnow() + timedelta(seconds=countdown_seconds)
+
+        # Statut "starting", objets de la partie et des participants :
+        # une seule transaction, la partie verrouillée pendant l'opération
+        updated = start_game_countdown(db.session, game_id, start_timestamp, selection)
+        if not updated:
+            return jsonify(error='The game has already started'), 400
+        game_state.forget_game(game_id)
+        matchmaking.remove(game_id)
+
+        publish_game_status(updated)
+        # Le passage en "in_progress" est fait par le serveur à start_timestamp
+        schedule_game_start(game_id, start_timestamp)
 
         return jsonify(
             message='Game starting countdown initiated', 
@@ -770,29 +905,9 @@ def create_routes(app):
             return jsonify(error='Game not found'), 404
         
         now = datetime.utcnow()
-        
-        # Si le jeu est en "starting" et que le timestamp est dépassé
-        if game.status == "starting" and game.start_timestamp and now >= game.start_timestamp:
-            # Démarrer réellement la partie
-            participants = list_participants(db.session, game_id)
-            actual_start_time = game.start_timestamp  # Utiliser le timestamp prévu
-            
-            for p in participants:
-                update_participant_status_and_start(
-                    db.session, p.id, actual_start_time, status='in_progress'
-                )
-            
-            # Mettre à jour le statut du jeu
-            update_game(db.session, game_id=game_id, status='in_progress')
-            
-            return jsonify(
-                status='in_progress',
-                started=True,
-                actual_start_time=actual_start_time.isoformat()
-            ), 200
-        
-        elif game.status == "starting":
-            # Encore en attente
+
+        # Lecture seule : la transition est faite par game_scheduler.py
+        if game.status == "starting":
             return jsonify(
                 status='starting',
                 started=False,
@@ -801,7 +916,11 @@ def create_routes(app):
             ), 200
         
         elif game.status == "in_progress":
-            return jsonify(status='in_progress', started=True), 200
+            return jsonify(
+                status='in_progress',
+                started=True,
+                actual_start_time=game.start_timestamp.isoformat() if game.start_timestamp else None
+            ), 200
         
         elif game.status == "finished": # Ajouté pour la fin de partie
             # Si le jeu est terminé, calculer le temps restant pour le décompte de 30 secondes
@@ -841,7 +960,11 @@ def create_routes(app):
         if len(current_parts) >= game.max_players:
             return jsonify(error='Game is already full'), 400
         part = add_participant(db.session, game.id, uid)
+        matchmaking.update(game, len(current_parts) + 1)
         print(f"User {uid} joined game {game.id} as participant {part.id}")
+        user = get_user(db.session, uid)
+        publish_game_event(game.id, "participant_joined",
+                           serialize_participant(part, user.username if user else None))
         return jsonify(game_id=game.id, participant_id=part.id), 200
 
 
@@ -887,6 +1010,12 @@ def create_routes(app):
         
         if not updated_game:
             return jsonify(error='Failed to update game'), 500
+        matchmaking.update(updated_game, len(participants))
+
+        if updated_game.status == "finished":
+            store_game_results(db.session, game_id)
+        if 'status' in update_params or 'start_timestamp' in update_params:
+            publish_game_status(updated_game)
         
         return jsonify({
             "id": updated_game.id,
@@ -924,32 +1053,39 @@ def create_routes(app):
             "created_at": game.created_at.isoformat() if game.created_at else None,
         }), 200
 
+    @app.route('/games/<int:game_id>/results', methods=['GET'])
+    @jwt_required()
+    def get_game_results(game_id):
+        """
+        Classement d'une partie terminée, calculé une fois puis servi tel quel
+        avec un ETag fort : un client qui envoie If-None-Match reçoit un 304.
+        """
+        stored = store_game_results(db.session, game_id)
+        if stored is None:
+            game = get_game(db.session, game_id)
+            if not game:
+                return jsonify(error='Game not found'), 404
+            return jsonify(error='Game not finished', status=game.status), 409
+
+        response = jsonify(stored.results)
+        response.set_etag(stored.etag)
+        response.headers['Cache-Control'] = 'private, max-age=31536000, immutable'
+        return response.make_conditional(request)
+
     @app.route('/games/<int:game_id>/participants', methods=['GET'])
     @jwt_required()
     def get_all_participants(game_id):
         # Optionnel : vérifier que l’utilisateur a bien le droit de voir les participants
         current_user = int(get_jwt_identity())
+        # Partie en cours : lecture directe de l'état en mémoire
+        live = game_state.participants(game_id)
+        if live is not None:
+            return jsonify(live), 200
+
         # Récupération de tous les participants pour la partie
         parts = list_participants(db.session, game_id)
 
-        # Sérialisation manuelle
-        result = []
-        for p in parts:
-            result.append({
-                "id": p.id,
-                "game_id": p.game_id,
-                "user_id": p.user_id,
-                "is_creator": p.is_creator,
-                "join_code": p.join_code,
-                "objects_to_find": p.objects_to_find,    # JSON
-                "start_time": p.start_time.isoformat() if p.start_time else None,
-                "end_time": p.end_time.isoformat() if p.end_time else None,
-                "lap_times": p.lap_times,                # JSON list
-                "status": p.status,
-                "created_at": p.created_at.isoformat() if p.created_at else None,
-            })
-
-        return jsonify(result), 200
+        return jsonify(serialize_participants(db.session, parts)), 200
 
     @app.route('/games/<int:game_id>/objects', methods=['POST'])
     @jwt_required()
@@ -981,10 +1117,13 @@ def create_routes(app):
                 # Si le statut passe à "finished" et qu'il n'y a pas encore de end_timestamp, le définir
                 # Utiliser le end_timestamp fourni par le client s'il y en a un, sinon datetime.utcnow()
                 game_end_timestamp = datetime.fromisoformat(end_timestamp) if end_timestamp else datetime.utcnow()
-                update_game(db.session, game_id=game_id, status=status, end_timestamp=game_end_timestamp)
+                updated = update_game(db.session, game_id=game_id, status=status, end_timestamp=game_end_timestamp)
             else:
-                update_game(db.session, game_id=game_id, status=status)
-            
+                updated = update_game(db.session, game_id=game_id, status=status)
+            if updated.status == "finished":
+                store_game_results(db.session, game_id)
+            publish_game_status(updated)
+
             return jsonify(message=f"Game {game_id} status updated to {status}"), 200
         
         return jsonify(error="No status provided"), 400
@@ -992,6 +1131,7 @@ def create_routes(app):
 
     @app.route('/games/detect', methods=['POST'])
     @jwt_required()
+    @admission_control("battle")
     def game_detect():
         current_user_id = int(get_jwt_identity())
 
@@ -1010,18 +1150,25 @@ def create_routes(app):
         except ValueError:
             return jsonify({"error": "participant_id invalide"}), 400
 
-        # Recherche du participant
-        participant = get_participant(
-            db.session, participant_id=participant_id)
+        try:
+            start_time = parse_client_time(start_time)
+            end_time = parse_client_time(end_time)
+        except ValueError:
+            return jsonify({"error": "start_time / end_time invalides"}), 400
+
+        # Progression du participant (en mémoire, voir game_state.py)
+        participant = game_state.participant(db.session, participant_id)
         if not participant:
             return jsonify({"error": "Participant introuvable"}), 404
 
-        objects = participant.objects_to_find or []
-        lap_times = participant.lap_times or []
+        # Une partie terminée ne change plus (résultats figés)
+        game = get_game(db.session, participant.game_id)
+        if game and game.status == "finished":
+            return jsonify({"error": "La partie est terminée"}), 409
 
         # Trouver le prochain objet non trouvé
-        next_object = next((o for o in objects if not o.get("found") and not o.get("skipped")), None)
-        if not next_object:
+        slot = participant.next_slot()
+        if slot is None:
             return jsonify({
                 "message": "Tous les objets ont déjà été trouvés.",
                 "detections": [] # Retourne une liste vide si tous les objets sont trouvés
@@ -1037,86 +1184,88 @@ def create_routes(app):
             print("test2")
             return jsonify({"error": "Nom de fichier vide"}), 400
 
-        # Enregistrement de la photo
-
-        ext = os.path.splitext(secure_filename(file.filename))[1]
-        unique_name = f"{current_user_id}_{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex}{ext}"
-
-        uploads_dir = os.path.join(current_app.root_path, 'static', 'uploads')
-        os.makedirs(uploads_dir, exist_ok=True)
-        file_path = os.path.join(uploads_dir, unique_name)
-        file.save(file_path)
-
-        file_url = f"/static/uploads/{unique_name}"
-        image = Image.open(file_path).convert('RGB')
+        # Enregistrement de la photo (décodage en mémoire, écriture disque en arrière-plan)
+        upload = ingest_upload(file, current_user_id)
+        file_url = upload.file_url
+        image = upload.image
+        image_hash = upload.image_hash
 
         photo = create_photo(db.session, file_path=file_url,
                              user_id=current_user_id, is_analysed=True)
 
-        # Détection
-        detections = detect_objects(image)
-
-        # Enregistre les détections
-        detection_entries = []
-        for det in detections:
-            is_challenge = next_object["objectname"] and det["name"].lower(
-            ) == next_object["objectname"].lower()
-            entry = create_detection(
-                db.session,
-                photo_id=photo.id,
-                object_name=det["name"],
-                confidence=det["score"],
-                bbox={"box": det["box"]},
-                challenge_object=next_object["objectname"],
-                is_challenge_object=is_challenge,
-                game_participant_id=participant_id  # Important ici
-            )
-            detection_entries.append({
-                "id": entry.id,
-                "object_name": entry.object_name,
-                "confidence": entry.confidence,
-                "bbox": entry.bbox,
-                "game_participant_id": participant_id
-            })
-
-        # Comparaison entre les détections et l’objet attendu
-        found_match = any(
-            det["object_name"].lower() == next_object["objectname"].lower()
-            for det in detection_entries
-        )
-
+        challenge_object = participant.names[slot]
+
+        # Vérification restreinte à l'objet attendu (cascade + arrêt anticipé)
+        found_match, matches = verify_object(image, challenge_object, image_hash=image_hash,
+                                             scale=upload.scale, priority="battle")
+
+        detection_entries = [{
+            "object_name": det["name"],
+            "confidence": det["score"],
+            "bbox": {"box": det["box"]},
+            "game_participant_id": participant_id
+        } for det in matches]
+
+        # Les détections complètes sont enregistrées en arrière-plan
+        app_obj = current_app._get_current_object()
+        photo_id = photo.id
+
+        def save_full_detections(detections):
+            with app_obj.app_context():
+                create_detections_bulk(db.session, photo_id, [
+                    detection_row(det, challenge_object,
+                                  game_participant_id=participant_id)  # Important ici
+                    for det in detections
+                ])
+
+        detect_objects_in_background(image, save_full_detections, image_hash=image_hash, scale=upload.scale)
+
+        # Marque l'objet comme trouvé et ajoute un lap_time. Seule cette étape
+        # est rejouée si une requête concurrente a modifié la progression
+        # pendant l'inférence ; None si elle a déjà validé cet objet.
+        lap_time = None
         if found_match:
-            # Marque l'objet comme trouvé
-            next_object["found"] = True
-
-            # Ajoute un lap_time
-            lap_times.append({
-                "order_index": next_object["order_index"],
-                "start_time": start_time,
-                "end_time": end_time
-            })
-
-            # Sauvegarde des objets et lap_times
-            participant.objects_to_find = objects
-            participant.lap_times = lap_times
-
-            # Vérifie si c'était le dernier objet à trouver
-            all_found = all(o.get("found") for o in objects)
+            try:
+                participant, lap_time = game_state.update(
+                    db.session, participant_id,
+                    lambda state: game_state.mark_found(state, slot, start_time, end_time))
+            except ProgressConflict:
+                return jsonify({"error": "Progression modifiée en parallèle, réessayez"}), 409
+
+        if lap_time:
+            finished_game = None
+            updated_object = participant.object_at(slot)
+
+            # Vérifie si c'était le dernier objet à trouver (déjà écrit en base)
+            all_found = participant.all_found
             if all_found:
-                participant.status = "finished"
-                participant.end_time = end_time  # On prend le end_time transmis par l'utilisateur
-                
                 # Mettre à jour le statut du jeu à "finished"
                 game = get_game(db.session, participant.game_id)
                 if game and game.status != "finished": # Ne le met à jour que si ce n'est pas déjà fait
-                    update_game(db.session, game_id=game.id, status="finished", end_timestamp=datetime.utcnow())
-
-            db.session.commit()
+                    finished_game = update_game(db.session, game_id=game.id, status="finished", end_timestamp=datetime.utcnow())
+                    # Classement figé, servi par /games/<id>/results
+                    store_game_results(db.session, game.id)
+
+            publish_game_event(participant.game_id, "object_found", {
+                "participant_id": participant.id,
+                "user_id": participant.user_id,
+                "order_index": updated_object["order_index"],
+                "objectname": updated_object["objectname"],
+                "lap_time": lap_time
+            })
+            if all_found:
+                publish_game_event(participant.game_id, "participant_finished", {
+                    "participant_id": participant.id,
+                    "user_id": participant.user_id,
+                    "end_time": end_time.isoformat()
+                })
+                if finished_game:
+                    publish_game_status(finished_game)
 
             return jsonify({
-                "message": f"Objet {next_object['objectname']} trouvé !",
+                "message": f"Objet {updated_object['objectname']} trouvé !",
                 "detections": detection_entries,
-                "updated_object": next_object,
+                "updated_object": updated_object,
                 "lap_time_added": True,
                 "game_finished": all_found
             }), 200
@@ -1124,7 +1273,7 @@ def create_routes(app):
 
         else:
             return jsonify({
-                "message": f"Objet attendu : {next_object['objectname']}. Aucun match détecté.",
+                "message": f"Objet attendu : {challenge_object}. Aucun match détecté.",
                 "detections": detection_entries,
                 "updated_object": None,
                 "lap_time_added": False
@@ -1139,19 +1288,72 @@ def create_routes(app):
         participant_id = data.get("participant_id")
         order_index   = data.get("order_index")
 
-        p = get_participant(db.session, participant_id)
+        p = game_state.participant(db.session, participant_id)
         if not p or p.user_id != uid:
             return jsonify(error="Participant invalide"), 404
 
-        objects = p.objects_to_find or []
-        for o in objects:
-            if o["order_index"] == order_index:
-                o["skipped"] = True
-                break
-        else:
+        game = get_game(db.session, p.game_id)
+        if game and game.status == "finished":
+            return jsonify(error="La partie est terminée"), 409
+
+        try:
+            _, skipped = game_state.update(
+                db.session, participant_id, lambda state: game_state.mark_skipped(state, order_index))
+        except ProgressConflict:
+            return jsonify(error="Progression modifiée en parallèle, réessayez"), 409
+        if not skipped:
             return jsonify(error="Objet non trouvé"), 400
+        publish_game_event(p.game_id, "object_skipped", {
+            "participant_id": p.id,
+            "user_id": p.user_id,
+            "order_index": order_index
+        })
 
-        # **CALL** à la fonction CRUD
-        update_participant_objects(db.session, participant_id, objects)
+        return jsonify(message=f"Objet #{order_index} skipped"), 200
 
-        return jsonify(message=f"Objet #{order_index} skipped"), 200
\ No newline at end of file
+    @sock.route('/games/<int:game_id>/ws')
+    def game_channel_ws(ws, game_id):
+        """
+        Canal temps réel d'une partie (remplace le polling du lobby et du jeu).
+        Le token JWT est passé en paramètre : /games/<id>/ws?token=...
+        Messages envoyés : {"event": ..., "data": ...}
+        Réservé aux participants et au créateur de la partie (sinon code 4403).
+        """
+        try:
+            user_id = int(decode_token(request.args.get("token", ""))["sub"])
+        except Exception:
+            ws.close(reason=1008, message="Invalid token")
+            return
+
+        if not is_game_member(db.session, game_id, user_id):
+            db.session.remove()
+            ws.close(reason=4403, message="Not a participant of this game")
+            return
+        if not acquire_game_socket(user_id):
+            db.session.remove()
+            ws.close(reason=4429, message="Too many open game sockets")
+            return
+
+        channel = game_channel(game_id)
+        queue = broker.subscribe(channel)
+        try:
+            snapshot = game_snapshot(db.session, game_id)
+            if snapshot is None:
+                ws.close(reason=1008, message="Game not found")
+                return
+            ws.send(json.dumps({"event": "snapshot", "data": snapshot}, default=str))
+            # Libère la connexion BDD : la suite ne fait qu'attendre des événements
+            db.session.remove()
+
+            while True:
+                message = next_event(queue, timeout=GAME_CHANNEL_PING_SECONDS)
+                if message is None:
+                    ws.send(json.dumps({"event": "ping", "data": {}}))
+                    continue
+                event, data = message
+                ws.send(json.dumps({"event": event, "data": data}, default=str))
+        except ConnectionClosed:
+            pass
+        finally:
+            broker.unsubscribe(channel, queue)
+            release_game_socket(user_id)
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Séries de jours consécutifs avec un défi complété (streaks).
+
+L'état est stocké sur l'utilisateur (last_active_day, current_streak,
+longest_streak) et avancé en O(1) à chaque complétion par advance_streak.
+repair_streaks recalcule tous les utilisateurs en une requête depuis le
+registre challenge_completions (reprise, correction) :
+
+    python -m backend.streaks
+"""
+from datetime import date, timedelta
+from sqlalchemy import text
+
+
+def next_streak(user, day: date):
+    """Streak de l'utilisateur après une complétion le jour `day`"""
+    if user.last_active_day == day:
+        return user.current_streak or 0
+    if user.last_active_day == day - timedelta(days=1):
+        return (user.current_streak or 0) + 1
+    return 1
+
+
+def advance_streak(user, day: date):
+    """Applique une complétion du jour `day` à l'état de l'utilisateur"""
+    if user.last_active_day is not None and day < user.last_active_day:
+        # Complétion plus ancienne que la dernière connue : rien à avancer
+        return user.current_streak
+    user.current_streak = next_streak(user, day)
+    user.longest_streak = max(user.longest_streak or 0, user.current_streak)
+    user.last_active_day = day
+    return user.current_streak
+
+
+# Îlots de jours consécutifs : jour - rang est constant dans un îlot.
+# Le streak courant est la longueur du dernier îlot ; le record ne baisse
+# jamais (l'historique a pu être purgé).
+REPAIR_STREAKS_SQL = """
+    WITH days AS (
+        SELECT DISTINCT user_id, completion_day AS day FROM challenge_completions
+    ), islands AS (
+        SELECT user_id, day,
+               day - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day))::int AS island
+        FROM days
+    ), runs AS (
+        SELECT user_id, COUNT(*) AS length, MAX(day) AS last_day
+        FROM islands GROUP BY user_id, island
+    ), per_user AS (
+        SELECT user_id, MAX(last_day) AS last_day, MAX(length) AS longest,
+               (ARRAY_AGG(length ORDER BY last_day DESC))[1] AS current
+        FROM runs GROUP BY user_id
+    )
+    UPDATE users u
+    SET last_active_day = p.last_day,
+        current_streak = COALESCE(p.current, 0),
+        longest_streak = GREATEST(COALESCE(u.longest_streak, 0), COALESCE(p.longest, 0))
+    FROM users u2 LEFT JOIN per_user p ON p.user_id = u2.id
+    WHERE u.id = u2.id
+"""
+
+
+def repair_streaks(session):
+    """Recalcule le streak de tous les utilisateurs ; retourne le nombre de lignes"""
+    result = session.execute(text(REPAIR_STREAKS_SQL))
+    session.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    from . import create_app
+    from .database import db
+
+    with create_app().app_context():
+        print(f"streaks: {repair_streaks(db.session)} users updated")
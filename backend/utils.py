@@ -1,36 +1,232 @@
-from ultralytics import YOLO
 from PIL import Image
 import numpy as np
 import os
+import threading
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
+from .inference import InferenceScheduler, DEFAULT_PRIORITY
+from .inference_backends import load_model, INFERENCE_BACKEND
+from .detection_cache import detection_cache
+from .ingestion import INFERENCE_INPUT_SIZE
+from .inference_pool import INFERENCE_POOL_ADDRESS, INFERENCE_TORCH_THREADS, InferencePoolClient
 
 
-# Charger le modèle YOLO
-model = YOLO("yolo11x.pt")  # Modèle pré-entraîné
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolo11x.pt")  # Modèle pré-entraîné
 
-def detect_objects(image):
-    # Analyse une image avec YOLOv11 et retourne les détections.
-    # :param image: Image PIL
-    # :return: Liste des détections
+# Cascade : quand on cherche un objet précis, un petit modèle passe d'abord
+# et yolo11x n'est lancé que s'il ne trouve pas l'objet avec assez de confiance.
+# CASCADE_MODEL vide = cascade désactivée
+CASCADE_MODEL = os.getenv("CASCADE_MODEL", "yolo11n.pt")
+CASCADE_CONFIDENCE = float(os.getenv("CASCADE_CONFIDENCE", "0.5"))
 
-    # Convertir l'image en numpy array
-    img_array = np.array(image)
+# Micro-batching : taille max d'un lot et attente max avant de le lancer
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "10"))
+# Nombre de lots envoyés en parallèle au pool d'inférence
+INFERENCE_MAX_CONCURRENT_BATCHES = int(os.getenv("INFERENCE_MAX_CONCURRENT_BATCHES", "2"))
+
+# Si INFERENCE_POOL_ADDRESS est défini, l'inférence tourne dans le pool
+# (python -m backend.inference_pool) et le modèle n'est jamais chargé ici
+pool_client = InferencePoolClient(INFERENCE_POOL_ADDRESS) if INFERENCE_POOL_ADDRESS else None
+
+_models = {}
+_models_lock = threading.Lock()
 
-    # Effectuer la détection
-    results = model(img_array)
 
-    # Récupérer les noms des classes
-    class_names = results[0].names  # Dictionnaire {class_id: "class_name"}
+def get_model(model_path: str = YOLO_MODEL):
+    # Charge le modèle YOLO au premier usage seulement, avec le backend
+    # choisi par INFERENCE_BACKEND (torch, onnx, openvino)
+    if model_path not in _models:
+        with _models_lock:
+            if model_path not in _models:
+                if INFERENCE_TORCH_THREADS:
+                    import torch
+                    torch.set_num_threads(INFERENCE_TORCH_THREADS)
+                _models[model_path] = load_model(model_path)
+    return _models[model_path]
+
+
+def parse_result(result):
+    # Convertit un résultat YOLO en liste de détections
+    class_names = result.names  # Dictionnaire {class_id: "class_name"}
 
-    # Traiter les résultats
     detections = []
-    for result in results[0].boxes.data.tolist():
-        x1, y1, x2, y2, score, class_id = result
+    for box in result.boxes.data.tolist():
+        x1, y1, x2, y2, score, class_id = box
         detections.append({
             "class_id": int(class_id),
             "name": class_names[int(class_id)],  # Associer le class_id à un nom
             "score": float(score),
             "box": [x1, y1, x2, y2]
         })
+    return detections
+
+
+def class_ids_for(yolo_model, target: str):
+    # Identifiants de classe correspondant au nom recherché ([] si inconnu)
+    return [class_id for class_id, name in yolo_model.names.items()
+            if name.lower() == target.lower()]
+
+
+def run_model(yolo_model, img_arrays, target: str = None):
+    # Lance le modèle ; avec `target`, le NMS et le post-traitement
+    # ne gardent que cette classe
+    if target is None:
+        results = yolo_model(list(img_arrays))
+    else:
+        results = yolo_model(list(img_arrays), classes=class_ids_for(yolo_model, target))
+    return [parse_result(result) for result in results]
+
+
+def detect_objects_batch(items, model_path: str = YOLO_MODEL):
+    # Analyse plusieurs images en un minimum d'appels YOLO.
+    # :param items: Liste de tuples (numpy array RGB, classe ciblée ou None)
+    # :return: Une liste de détections par image, dans le même ordre
+    # Un appel par classe ciblée présente dans le lot
+    groups = {}
+    for index, (img_array, target) in enumerate(items):
+        groups.setdefault(target, []).append((index, img_array))
+
+    detections = [None] * len(items)
+    for target, group in groups.items():
+        arrays = [img_array for _, img_array in group]
+        if pool_client is not None:
+            group_results = pool_client.run_batch(arrays, model_path, {"target": target})
+        else:
+            group_results = run_model(get_model(model_path), arrays, target)
+        for (index, _), result in zip(group, group_results):
+            detections[index] = result
+    return detections
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model_path: str = YOLO_MODEL):
+    # Un scheduler (et donc une file de lots) par modèle
+    with _schedulers_lock:
+        if model_path not in _schedulers:
+            _schedulers[model_path] = InferenceScheduler(
+                partial(detect_objects_batch, model_path=model_path),
+                max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=INFERENCE_MAX_WAIT_MS,
+                max_concurrent_batches=INFERENCE_MAX_CONCURRENT_BATCHES if pool_client else 1
+            )
+        return _schedulers[model_path]
+
+
+def rescale_detections(detections, scale):
+    # Ramène les boîtes aux coordonnées de l'image d'origine
+    # (l'image analysée peut avoir été décodée à une taille réduite)
+    sx, sy = scale
+    if sx == 1 and sy == 1:
+        return detections
+    return [
+        {**det, "box": [det["box"][0] * sx, det["box"][1] * sy, det["box"][2] * sx, det["box"][3] * sy]}
+        for det in detections
+    ]
+
+
+def contains_object(detections, target: str, min_score: float = 0.0):
+    # Vrai si `target` fait partie des détections avec un score suffisant
+    return any(
+        det["name"].lower() == target.lower() and det["score"] >= min_score
+        for det in detections
+    )
+
+
+# Version du modèle pour le cache : un changement de modèle, de backend,
+# de cascade ou de taille de décodage invalide les résultats en cache
+MODEL_VERSION = (f"{YOLO_MODEL}|{INFERENCE_BACKEND}|{CASCADE_MODEL}|{CASCADE_CONFIDENCE}"
+                 f"|{INFERENCE_INPUT_SIZE}")
+
+
+def _detect_objects(img_array, target: str = None, priority: str = DEFAULT_PRIORITY):
+    if target and CASCADE_MODEL:
+        # Petit modèle d'abord : suffisant quand l'objet est bien visible
+        detections = get_scheduler(CASCADE_MODEL).infer((img_array, None), priority=priority)
+        if contains_object(detections, target, CASCADE_CONFIDENCE):
+            return detections
+
+    # Effectuer la détection (dans un lot partagé avec les autres requêtes)
+    return get_scheduler(YOLO_MODEL).infer((img_array, None), priority=priority)
+
+
+def detect_objects(image, target: str = None, image_hash: str = None, scale=(1, 1),
+                   priority: str = DEFAULT_PRIORITY):
+    # Analyse une image avec YOLOv11 et retourne les détections.
+    # Les appels concurrents sont regroupés en lots par le scheduler.
+    # :param image: Image PIL
+    # :param target: Objet recherché (défi, partie) ; active la cascade
+    # :param image_hash: Empreinte du fichier ; si fournie, le cache est utilisé
+    # :param scale: Facteur (sx, sy) vers l'image d'origine (voir ingestion.py)
+    # :param priority: Classe de priorité dans la file d'inférence (inference.py)
+    # :return: Liste des détections, en coordonnées de l'image d'origine
+    variant = f"cascade:{target.lower()}" if target and CASCADE_MODEL else "full"
+    if image_hash:
+        cached = detection_cache.get(image_hash, MODEL_VERSION, variant)
+        if cached is None and variant != "full":
+            cached = detection_cache.get(image_hash, MODEL_VERSION, "full")
+        if cached is not None:
+            return cached
+
+    # Convertir l'image en numpy array
+    img_array = np.array(image)
+    detections = rescale_detections(_detect_objects(img_array, target, priority), scale)
+
+    if image_hash:
+        detection_cache.put(image_hash, MODEL_VERSION, variant, detections)
+    return detections
+
+
+def _verify_object(img_array, target: str, min_score: float, priority: str):
+    if CASCADE_MODEL:
+        detections = get_scheduler(CASCADE_MODEL).infer((img_array, target), priority=priority)
+        if contains_object(detections, target, max(min_score, CASCADE_CONFIDENCE)):
+            return detections
+
+    return get_scheduler(YOLO_MODEL).infer((img_array, target), priority=priority)
+
+
+def verify_object(image, target: str, min_score: float = 0.0, image_hash: str = None, scale=(1, 1),
+                  priority: str = DEFAULT_PRIORITY):
+    # Vérifie seulement la présence de `target` dans l'image.
+    # L'inférence est restreinte à cette classe et s'arrête dès que
+    # le petit modèle de la cascade confirme l'objet.
+    # :return: (trouvé, détections de la classe ciblée)
+    variant = f"verify:{target.lower()}"
+    detections = None
+    if image_hash:
+        detections = detection_cache.get(image_hash, MODEL_VERSION, variant)
+        if detections is None:
+            # Une détection complète déjà en cache suffit
+            full = detection_cache.get(image_hash, MODEL_VERSION, "full")
+            if full is not None:
+                detections = [det for det in full if det["name"].lower() == target.lower()]
+
+    if detections is None:
+        detections = rescale_detections(_verify_object(np.array(image), target, min_score, priority), scale)
+        if image_hash:
+            detection_cache.put(image_hash, MODEL_VERSION, variant, detections)
+
+    return contains_object(detections, target, min_score), detections
+
+
+# Détections complètes lancées après la réponse (enregistrements en base)
+background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="full-detection")
+
+
+def detect_objects_in_background(image, callback, image_hash: str = None, scale=(1, 1)):
+    # Lance detect_objects hors du chemin critique puis appelle callback(détections),
+    # avec la priorité la plus basse : personne n'attend ce résultat
+    return background_executor.submit(
+        lambda: callback(detect_objects(image, image_hash=image_hash, scale=scale, priority="background")))
+
 
-    return detections
\ No newline at end of file
+def inference_stats():
+    # Profondeur de file et temps d'attente par classe de priorité, par modèle
+    with _schedulers_lock:
+        schedulers = dict(_schedulers)
+    return {model_path: scheduler.stats() for model_path, scheduler in schedulers.items()}
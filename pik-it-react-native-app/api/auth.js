@@ -1,7 +1,7 @@
 import axios from 'axios';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 
-const API_URL = 'http://kykonline.ddns.net:5000';
+export const API_URL = 'http://kykonline.ddns.net:5000';
 
 // Enregistrer un nouvel utilisateur
 export async function register({ username, email, password }) {
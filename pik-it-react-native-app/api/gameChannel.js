@@ -0,0 +1,68 @@
+import { API_URL, getToken } from './auth';
+
+// Canal temps réel d'une partie (WebSocket) : remplace le polling.
+// À chaque (re)connexion le serveur renvoie un "snapshot" complet,
+// puis les événements : status, participant_joined, object_found,
+// object_skipped, participant_finished.
+// Si le serveur refuse la connexion (voir REFUSED_CLOSE_CODES), le canal
+// ne se reconnecte pas et envoie l'événement "refused" : { code, reason }.
+
+// Refus définitifs : jeton invalide ou partie inconnue (1008), pas
+// participant de la partie (4403), trop de sockets ouverts (4429)
+export const REFUSED_CLOSE_CODES = [1008, 4403, 4429];
+
+export function openGameChannel(gameId, onEvent) {
+  let socket = null;
+  let closed = false;
+  let retryDelay = 1000;
+  let retryTimeout = null;
+
+  const connect = async () => {
+    const token = await getToken();
+    if (closed) return;
+
+    const wsUrl = API_URL.replace(/^http/, 'ws');
+    socket = new WebSocket(`${wsUrl}/games/${gameId}/ws?token=${encodeURIComponent(token ?? '')}`);
+
+    socket.onopen = () => {
+      retryDelay = 1000;
+    };
+
+    socket.onmessage = (message) => {
+      try {
+        const { event, data } = JSON.parse(message.data);
+        if (event !== 'ping') {
+          onEvent(event, data);
+        }
+      } catch (e) {
+        console.error('Message du canal de jeu invalide:', e);
+      }
+    };
+
+    socket.onclose = (e) => {
+      if (closed) return;
+      if (REFUSED_CLOSE_CODES.includes(e.code)) {
+        // Réessayer donnerait le même refus
+        closed = true;
+        onEvent('refused', { code: e.code, reason: e.reason });
+        return;
+      }
+      // Reconnexion avec un délai croissant (max 15 s)
+      retryTimeout = setTimeout(connect, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, 15000);
+    };
+
+    socket.onerror = (e) => {
+      console.warn('Erreur du canal de jeu:', e.message);
+    };
+  };
+
+  connect();
+
+  // Fonction de fermeture à appeler au démontage de l'écran
+  return () => {
+    closed = true;
+    if (retryTimeout) clearTimeout(retryTimeout);
+    if (socket) socket.close();
+  };
+}
@@ -24,12 +24,13 @@ export async function getUserStats() {
   }
 }
 
-// Récupérer les photos de l'utilisateur
-export async function getUserPhotos() {
+// Récupérer une page de photos de l'utilisateur (plus récentes d'abord).
+// `cursor` : valeur nextCursor de la page précédente
+export async function getUserPhotos(cursor = null) {
   try {
     const client = await apiClient();
-    const response = await client.get('/photos/me');
-    return response.data;
+    const response = await client.get('/photos/me', { params: cursor ? { cursor } : {} });
+    return { photos: response.data, nextCursor: response.headers['x-next-cursor'] || null };
   } catch (error) {
     console.error('Erreur lors de la récupération des photos:', error);
     throw error;
@@ -60,12 +61,12 @@ export async function getDetectionsByPhoto(photoId) {
   }
 }
 
-// Récupérer les récompenses de l'utilisateur
-export async function getUserRewards(userId) {
+// Récupérer une page de récompenses de l'utilisateur (plus récentes d'abord)
+export async function getUserRewards(userId, cursor = null) {
   try {
     const client = await apiClient();
-    const response = await client.get(`/rewards?user_id=${userId}`);
-    return response.data;
+    const response = await client.get('/rewards', { params: cursor ? { user_id: userId, cursor } : { user_id: userId } });
+    return { rewards: response.data, nextCursor: response.headers['x-next-cursor'] || null };
   } catch (error) {
     console.error('Erreur lors de la récupération des récompenses:', error);
     throw error;
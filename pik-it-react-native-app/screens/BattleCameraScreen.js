@@ -93,7 +93,14 @@ export default function BattleCameraScreen({ route, navigation }) {
       
     } catch (e) {
       console.error(e);
-      Alert.alert("Erreur", "Erreur lors de l'envoi de la photo.");
+      const status = e.response?.status;
+      if (status === 429 || status === 503) {
+        // Serveur saturé ou trop de photos envoyées : réessayer plus tard
+        const retryAfter = e.response.headers?.["retry-after"];
+        Alert.alert("Patientez", `${e.response.data?.error}${retryAfter ? ` (${retryAfter} s)` : ""}`);
+      } else {
+        Alert.alert("Erreur", "Erreur lors de l'envoi de la photo.");
+      }
     } finally {
       setIsUploading(false);
     }
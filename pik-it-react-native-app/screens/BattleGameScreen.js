@@ -7,8 +7,10 @@ import {
   FlatList,
   ActivityIndicator,
   Modal,
+  Alert,
 } from "react-native";
 import { apiClient } from "../api/auth";
+import { openGameChannel } from "../api/gameChannel";
 import { XCircle, ArrowRightCircle, Clock } from "lucide-react-native";
 import { SafeAreaView } from "react-native-safe-area-context";
 
@@ -20,23 +22,18 @@ export default function BattleGameScreen({ route, navigation }) {
   const [gameStatus, setGameStatus] = useState(null);
   const [countdown, setCountdown] = useState(null);
   const countdownIntervalRef = useRef(null);
-  const participantsIntervalRef = useRef(null);
-  const gameStatusIntervalRef = useRef(null);
+  const channelCloseRef = useRef(null);
   const hasRedirectedRef = useRef(false); // Flag pour éviter les redirections multiples
 
-  // Fonction pour nettoyer tous les intervalles
+  // Fonction pour nettoyer le compte à rebours et fermer le canal
   const clearAllIntervals = () => {
     if (countdownIntervalRef.current) {
       clearInterval(countdownIntervalRef.current);
       countdownIntervalRef.current = null;
     }
-    if (participantsIntervalRef.current) {
-      clearInterval(participantsIntervalRef.current);
-      participantsIntervalRef.current = null;
-    }
-    if (gameStatusIntervalRef.current) {
-      clearInterval(gameStatusIntervalRef.current);
-      gameStatusIntervalRef.current = null;
+    if (channelCloseRef.current) {
+      channelCloseRef.current();
+      channelCloseRef.current = null;
     }
   };
 
@@ -56,81 +53,99 @@ export default function BattleGameScreen({ route, navigation }) {
     setMe(res.data);
   };
 
-  // Fonction pour récupérer la liste des participants et isoler le tien
-  const fetchMyParticipant = async () => {
-    if (!me || hasRedirectedRef.current) return; // Ne pas continuer si redirection en cours
-    
-    const client = await apiClient();
-    const res = await client.get(`/games/${gameId}/participants`);
-    const mine = res.data.find((p) => p.user_id === me.id);
-    if (!mine) {
-      console.warn("User not in this game.");
-      return;
-    }
-    setParticipant(mine);
-  };
-
-  // Fonction pour vérifier le statut de la partie
-  const checkGameStatus = async () => {
+  // Applique le statut de la partie reçu du serveur
+  const applyGameStatus = (currentStatus, gameEndTimestamp) => {
     if (hasRedirectedRef.current) return; // Ne pas continuer si redirection en cours
 
-    if (!navigation.isFocused()) return;
+    setGameStatus(currentStatus);
 
-    try {
-      const client = await apiClient();
-      const res = await client.get(`/games/id/${gameId}`);
-      const currentStatus = res.data.status;
-      const gameEndTimestamp = res.data.end_timestamp;
-
-      setGameStatus(currentStatus);
+    if (currentStatus === "finished") {
+      
+      if (gameEndTimestamp) {
+        const now = new Date();
+        const endDateTime = new Date(gameEndTimestamp);
+        const timeElapsed = (now.getTime() - endDateTime.getTime()) / 1000;
+        const remainingTime = Math.max(0, 30 - Math.floor(timeElapsed));
 
-      if (currentStatus === "finished") {
+        setCountdown(remainingTime);
         
-        if (gameEndTimestamp) {
-          const now = new Date();
-          const endDateTime = new Date(gameEndTimestamp);
-          const timeElapsed = (now.getTime() - endDateTime.getTime()) / 1000;
-          const remainingTime = Math.max(0, 30 - Math.floor(timeElapsed));
+        if (remainingTime <= 0) {
+          redirectToResults();
+        } else if (!countdownIntervalRef.current) {
+          // Démarrer le compte à rebours
+          countdownIntervalRef.current = setInterval(() => {
+            setCountdown(prev => {
+              if (prev <= 1) {
+                redirectToResults();
+                return 0;
+              }
+              return prev - 1;
+            });
+          }, 1000);
+        }
+      } else {
+        // Cas où le jeu est "finished" mais end_timestamp n'est pas encore défini
+        setCountdown(30);
+        if (!countdownIntervalRef.current) {
+          countdownIntervalRef.current = setInterval(() => {
+            setCountdown(prev => {
+              if (prev <= 1) {
+                redirectToResults();
+                return 0;
+              }
+              return prev - 1;
+            });
+          }, 1000);
+        }
+      }
+    } else if (countdownIntervalRef.current) {
+      // Arrêter le compte à rebours si le statut n'est plus "finished"
+      clearInterval(countdownIntervalRef.current);
+      countdownIntervalRef.current = null;
+      setCountdown(null);
+    }
+  };
 
-          setCountdown(remainingTime);
-          
-          if (remainingTime <= 0) {
-            redirectToResults();
-          } else if (!countdownIntervalRef.current) {
-            // Démarrer le compte à rebours
-            countdownIntervalRef.current = setInterval(() => {
-              setCountdown(prev => {
-                if (prev <= 1) {
-                  redirectToResults();
-                  return 0;
-                }
-                return prev - 1;
-              });
-            }, 1000);
-          }
-        } else {
-          // Cas où le jeu est "finished" mais end_timestamp n'est pas encore défini
-          setCountdown(30);
-          if (!countdownIntervalRef.current) {
-            countdownIntervalRef.current = setInterval(() => {
-              setCountdown(prev => {
-                if (prev <= 1) {
-                  redirectToResults();
-                  return 0;
-                }
-                return prev - 1;
-              });
-            }, 1000);
+  // Met à jour localement un objet de mon participant
+  const updateMyObject = (orderIndex, changes) => {
+    setParticipant((prev) =>
+      prev
+        ? {
+            ...prev,
+            objects_to_find: prev.objects_to_find.map((o) =>
+              o.order_index === orderIndex ? { ...o, ...changes } : o
+            ),
           }
-        }
-      } else if (countdownIntervalRef.current) {
-        // Arrêter le compte à rebours si le statut n'est plus "finished"
-        clearInterval(countdownIntervalRef.current);
-        countdownIntervalRef.current = null;
-        setCountdown(null);
+        : prev
+    );
+  };
+
+  const handleGameEvent = (event, data) => {
+    if (event === "snapshot") {
+      const mine = data.participants.find((p) => p.user_id === me.id);
+      if (!mine) {
+        console.warn("User not in this game.");
+      } else {
+        setParticipant(mine);
       }
-    } catch (e) {
-      console.error("Erreur lors de la vérification du statut du jeu:", e);
+      setLoading(false);
+      applyGameStatus(data.status.status, data.status.end_timestamp);
+    } else if (event === "status") {
+      applyGameStatus(data.status, data.end_timestamp);
+    } else if (event === "object_found" && data.user_id === me.id) {
+      updateMyObject(data.order_index, { found: true });
+    } else if (event === "object_skipped" && data.user_id === me.id) {
+      updateMyObject(data.order_index, { skipped: true });
+    } else if (event === "refused") {
+      // Le serveur ne laissera pas ce compte suivre la partie : retour au menu
+      clearAllIntervals();
+      Alert.alert(
+        "Partie indisponible",
+        data.code === 4429
+          ? "Trop de parties ouvertes en même temps sur ce compte."
+          : "Impossible de suivre cette partie."
+      );
+      navigation.replace("BattleScreen");
     }
   };
 
@@ -145,26 +160,16 @@ export default function BattleGameScreen({ route, navigation }) {
   }, []);
 
   useEffect(() => {
-    if (me && !hasRedirectedRef.current) {
-      (async () => {
-        try {
-          await fetchMyParticipant();
-          await checkGameStatus();
-        } catch (e) {
-          console.error(e);
-        } finally {
-          setLoading(false);
-        }
-      })();
-      
-      // Rafraîchir périodiquement les participants et le statut du jeu
-      participantsIntervalRef.current = setInterval(fetchMyParticipant, 5000);
-      gameStatusIntervalRef.current = setInterval(checkGameStatus, 2000);
-    }
+    if (!me || hasRedirectedRef.current) return;
+
+    // Canal temps réel : état initial puis événements, sans polling
+    const closeChannel = openGameChannel(gameId, handleGameEvent);
+    channelCloseRef.current = closeChannel;
 
     // Cleanup function
     return () => {
-      clearAllIntervals();
+      closeChannel();
+      channelCloseRef.current = null;
     };
   }, [me]);
 
@@ -208,7 +213,7 @@ export default function BattleGameScreen({ route, navigation }) {
         participant_id: participant.id,
         order_index: nextObj.order_index,
       });
-      fetchMyParticipant();
+      updateMyObject(nextObj.order_index, { skipped: true });
     } catch (e) {
       console.error(e);
     }
@@ -11,6 +11,7 @@ import {
 } from "react-native";
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { apiClient } from "../api/auth";
+import { openGameChannel } from "../api/gameChannel";
 import { XCircle, Users, Lock, Clock, Settings } from "lucide-react-native"; // Add Settings here
 
 export default function BattleLobbyScreen({ route, navigation }) {
@@ -25,7 +26,15 @@ export default function BattleLobbyScreen({ route, navigation }) {
   const [errorMessage, setErrorMessage] = useState("");
   const [showCountdownChoiceModal, setShowCountdownChoiceModal] =
     useState(false);
-  const gameStatusIntervalRef = useRef(null);
+
+  const hasNavigatedRef = useRef(false); // Évite les navigations multiples
+
+  // Quitte le lobby une seule fois (événement et check-start peuvent se croiser)
+  const leaveLobby = (screen) => {
+    if (hasNavigatedRef.current) return;
+    hasNavigatedRef.current = true;
+    navigation.replace(screen, { gameId });
+  };
 
   // Fonction pour afficher une modal d'erreur personnalisée
   const showAlert = (message) => {
@@ -33,40 +42,35 @@ export default function BattleLobbyScreen({ route, navigation }) {
     setShowErrorModal(true);
   };
 
-  // Fetch game info and check for start status
-  const fetchGame = async () => {
-    try {
-      const client = await apiClient();
-      const res = await client.get(`/games/id/${gameId}`);
-      setGameInfo(res.data);
-
-      if (res.data.status === "starting") {
+  // Applique un changement de statut reçu du serveur
+  const handleStatus = (status) => {
+    if (status.status === "starting") {
+      if (status.seconds_remaining > 0) {
+        setGameStarting(true);
+        setCountdown(status.seconds_remaining);
+      } else {
         checkGameStart();
-      } else if (res.data.status === "in_progress") {
-        navigation.replace("BattleGameScreen", { gameId });
-      } else if (res.data.status === "finished") {
-        navigation.replace("BattleResultScreen", { gameId });
       }
-    } catch (e) {
-      console.error("Erreur lors de la récupération des infos du jeu:", e);
-      showAlert("Impossible de récupérer les informations de la partie.");
-    } finally {
-      setLoading(false);
+    } else if (status.status === "in_progress") {
+      leaveLobby("BattleGameScreen");
+    } else if (status.status === "finished") {
+      leaveLobby("BattleResultScreen");
+    } else if (status.status === "expired") {
+      setGameStarting(false);
+      showAlert("Cette partie a expiré faute d'activité.");
     }
   };
 
+  // Demande unique au serveur quand le compte à rebours arrive à zéro
   const checkGameStart = async () => {
     try {
       const client = await apiClient();
       const res = await client.get(`/games/${gameId}/check-start`);
 
       if (res.data.started) {
-        navigation.replace("BattleGameScreen", { gameId });
-      } else if (res.data.status === "starting") {
-        setGameStarting(true);
-        setCountdown(res.data.seconds_remaining);
+        leaveLobby("BattleGameScreen");
       } else if (res.data.status === "finished") {
-        navigation.replace("BattleResultScreen", { gameId });
+        leaveLobby("BattleResultScreen");
       }
     } catch (e) {
       console.error("Erreur lors de la vérification du démarrage du jeu:", e);
@@ -74,54 +78,39 @@ export default function BattleLobbyScreen({ route, navigation }) {
     }
   };
 
-  // Fetch participants avec les informations utilisateur complètes
-  const fetchParticipants = async () => {
-    try {
-      const client = await apiClient();
-      const res = await client.get(`/games/${gameId}/participants`);
+  // Participant tel qu'attendu par l'affichage (nom d'utilisateur inclus)
+  const withUser = (participant) => ({
+    ...participant,
+    user: { username: participant.username ?? `User ${participant.user_id}` },
+  });
 
-      // Récupérer les informations utilisateur pour chaque participant
-      const participantsWithUserInfo = await Promise.all(
-        res.data.map(async (participant) => {
-          try {
-            const userRes = await client.get(`/users/${participant.user_id}`);
-            return {
-              ...participant,
-              user: userRes.data,
-            };
-          } catch (e) {
-            console.error(
-              `Erreur lors de la récupération de l'utilisateur ${participant.user_id}:`,
-              e
-            );
-            return {
-              ...participant,
-              user: { username: `User ${participant.user_id}` }, // Fallback
-            };
-          }
-        })
+  const handleGameEvent = (event, data) => {
+    if (event === "snapshot") {
+      setGameInfo(data.game);
+      setParticipants(data.participants.map(withUser));
+      setLoading(false);
+      handleStatus(data.status);
+    } else if (event === "status") {
+      setGameInfo((prev) => (prev ? { ...prev, ...data } : prev));
+      handleStatus(data);
+    } else if (event === "participant_joined") {
+      setParticipants((prev) =>
+        prev.some((p) => p.id === data.id) ? prev : [...prev, withUser(data)]
+      );
+    } else if (event === "refused") {
+      setLoading(false);
+      showAlert(
+        data.code === 4429
+          ? "Trop de parties ouvertes en même temps sur ce compte."
+          : "Impossible de suivre cette partie."
       );
-
-      setParticipants(participantsWithUserInfo);
-    } catch (e) {
-      console.error("Erreur lors de la récupération des participants:", e);
-      showAlert("Impossible de récupérer la liste des participants.");
     }
   };
 
   useEffect(() => {
-    fetchParticipants();
-    fetchGame();
-
-    const participantsInterval = setInterval(fetchParticipants, 3000);
-    gameStatusIntervalRef.current = setInterval(checkGameStart, 2000);
-
-    return () => {
-      clearInterval(participantsInterval);
-      if (gameStatusIntervalRef.current) {
-        clearInterval(gameStatusIntervalRef.current);
-      }
-    };
+    // Canal temps réel : plus de polling, seulement des reconnexions
+    const closeChannel = openGameChannel(gameId, handleGameEvent);
+    return closeChannel;
   }, []);
 
   useEffect(() => {
@@ -132,6 +121,7 @@ export default function BattleLobbyScreen({ route, navigation }) {
         setCountdown((prev) => {
           if (prev <= 1) {
             setGameStarting(false);
+            checkGameStart();
             return 0;
           }
           return prev - 1;
@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useMemo } from "react";
+import React, { useEffect, useState } from "react";
 import {
   View,
   Text,
@@ -11,10 +11,13 @@ import { SafeAreaView } from "react-native-safe-area-context";
 import { apiClient } from "../api/auth";
 import { Award, Trophy, Users, Clock } from "lucide-react-native";
 
+// Résultats déjà reçus par partie : { etag, data }. Une partie terminée ne
+// change plus, le serveur répond 304 si l'ETag correspond.
+const resultsCache = new Map();
+
 export default function BattleResultScreen({ route, navigation }) {
   const { gameId } = route.params;
-  const [gameInfo, setGameInfo] = useState(null);
-  const [participants, setParticipants] = useState([]);
+  const [results, setResults] = useState(null);
   const [loading, setLoading] = useState(true);
   const [me, setMe] = useState(null);
 
@@ -29,43 +32,33 @@ export default function BattleResultScreen({ route, navigation }) {
     }
   };
 
-  // Fonction pour récupérer les détails de la partie et les participants
-  const fetchGameResults = async () => {
+  // Classement calculé par le serveur à la fin de la partie
+  const fetchGameResults = async (retries = 3) => {
     try {
       const client = await apiClient();
-      const gameRes = await client.get(`/games/id/${gameId}`);
-      setGameInfo(gameRes.data);
-
-      const participantsRes = await client.get(`/games/${gameId}/participants`);
-
-      // Récupérer les informations utilisateur pour chaque participant
-      const participantsWithUserInfo = await Promise.all(
-        participantsRes.data.map(async (participant) => {
-          try {
-            const userRes = await client.get(`/users/${participant.user_id}`);
-            return {
-              ...participant,
-              user: userRes.data,
-            };
-          } catch (e) {
-            console.error(
-              `Erreur lors de la récupération de l'utilisateur ${participant.user_id}:`,
-              e
-            );
-            return {
-              ...participant,
-              user: { username: `User ${participant.user_id}` }, // Fallback
-            };
-          }
-        })
-      );
-
-      setParticipants(participantsWithUserInfo);
+      const cached = resultsCache.get(gameId);
+      const res = await client.get(`/games/${gameId}/results`, {
+        headers: cached ? { "If-None-Match": cached.etag } : {},
+        validateStatus: (status) =>
+          (status >= 200 && status < 300) || status === 304 || status === 409,
+      });
+
+      if (res.status === 304) {
+        setResults(cached.data);
+      } else if (res.status === 409) {
+        // Partie pas encore clôturée côté serveur : nouvel essai
+        if (retries > 0) {
+          setTimeout(() => fetchGameResults(retries - 1), 2000);
+          return;
+        }
+      } else {
+        resultsCache.set(gameId, { etag: res.headers.etag, data: res.data });
+        setResults(res.data);
+      }
     } catch (e) {
       console.error("Erreur lors de la récupération des résultats du jeu:", e);
-    } finally {
-      setLoading(false);
     }
+    setLoading(false);
   };
 
   useEffect(() => {
@@ -77,107 +70,27 @@ export default function BattleResultScreen({ route, navigation }) {
     initializeData();
   }, [gameId]);
 
-  // Utilisation de useMemo pour éviter les recalculs inutiles
-  const winner = useMemo(() => {
-    if (!participants.length) return null;
-
-    const sortedParticipants = [...participants].sort((a, b) => {
-      const aFinished = a.objects_to_find?.every((obj) => obj.found);
-      const bFinished = b.objects_to_find?.every((obj) => obj.found);
-
-      if (aFinished && !bFinished) return -1;
-      if (!aFinished && bFinished) return 1;
-
-      if (aFinished && bFinished) {
-        const aEndTime = a.end_time ? new Date(a.end_time).getTime() : Infinity;
-        const bEndTime = b.end_time ? new Date(b.end_time).getTime() : Infinity;
-        return aEndTime - bEndTime;
-      }
-
-      const aFoundCount =
-        a.objects_to_find?.filter((obj) => obj.found).length || 0;
-      const bFoundCount =
-        b.objects_to_find?.filter((obj) => obj.found).length || 0;
-      return bFoundCount - aFoundCount;
-    });
-
-    return sortedParticipants[0];
-  }, [participants]);
-
-  // Mémorisation des participants triés pour éviter les recalculs
-  const sortedParticipants = useMemo(() => {
-    return [...participants].sort((a, b) => {
-      const aFinished = a.objects_to_find?.every((obj) => obj.found);
-      const bFinished = b.objects_to_find?.every((obj) => obj.found);
-
-      if (aFinished && !bFinished) return -1;
-      if (!aFinished && bFinished) return 1;
-
-      if (aFinished && bFinished) {
-        const aEndTime = a.end_time ? new Date(a.end_time).getTime() : Infinity;
-        const bEndTime = b.end_time ? new Date(b.end_time).getTime() : Infinity;
-        return aEndTime - bEndTime;
-      }
-
-      const aFoundCount =
-        a.objects_to_find?.filter((obj) => obj.found).length || 0;
-      const bFoundCount =
-        b.objects_to_find?.filter((obj) => obj.found).length || 0;
-      return bFoundCount - aFoundCount;
-    });
-  }, [participants]);
-
-  const calculateDuration = (startTime, endTime) => {
-    if (!startTime || !endTime) {
-      return "N/A";
-    }
-
-    try {
-      // Créer les objets Date
-      const start = new Date(startTime);
-      const end = new Date(endTime);
-
-      // Vérifier que les dates sont valides
-      if (isNaN(start.getTime()) || isNaN(end.getTime())) {
-        console.warn("Dates invalides:", { startTime, endTime });
-        return "N/A";
-      }
-
-      // Vérifier que end_time est postérieur à start_time
-      if (end.getTime() <= start.getTime()) {
-        console.warn("end_time antérieur ou égal à start_time:", {
-          startTime,
-          endTime,
-        });
-        return "N/A";
-      }
-
-      // Calculer la différence en millisecondes puis en secondes
-      const diffMs = end.getTime() - start.getTime();
-      const diffSeconds = Math.floor(diffMs / 1000);
-
-      // Calculer minutes et secondes
-      const minutes = Math.floor(diffSeconds / 60);
-      const seconds = diffSeconds % 60;
+  const winner = results?.winner;
+  const rankings = results?.rankings || [];
 
-      return `${minutes}m ${seconds}s`;
-    } catch (error) {
-      console.error("Erreur lors du calcul de la durée:", error);
+  const formatDuration = (totalSeconds) => {
+    if (totalSeconds === null || totalSeconds === undefined) {
       return "N/A";
     }
+    const diffSeconds = Math.floor(totalSeconds);
+    const minutes = Math.floor(diffSeconds / 60);
+    const seconds = diffSeconds % 60;
+    return `${minutes}m ${seconds}s`;
   };
 
-  // Dans votre renderParticipantResult, remplacez le calcul actuel par :
   const renderParticipantResult = React.useCallback(
     ({ item }) => {
-      const foundCount =
-        item.objects_to_find?.filter((obj) => obj.found).length || 0;
-      const totalObjects = item.objects_to_find?.length || 0;
-      const isWinner = winner && winner.id === item.id;
+      const foundCount = item.found_count;
+      const totalObjects = item.total_objects;
+      const isWinner = winner && winner.participant_id === item.participant_id;
       const isMe = me && me.id === item.user_id;
 
-      // Utiliser la nouvelle fonction de calcul
-      const duration = calculateDuration(item.start_time, item.end_time);
+      const duration = formatDuration(item.total_time_seconds);
 
       return (
         <View
@@ -190,7 +103,7 @@ export default function BattleResultScreen({ route, navigation }) {
           <View style={styles.participantHeader}>
             <Users size={24} color={isWinner ? "#FFD700" : "#374151"} />
             <Text style={styles.participantName}>
-              {item.user?.username || `User ${item.user_id}`}{" "}
+              {item.rank}. {item.username || `User ${item.user_id}`}{" "}
               {isMe ? "(Moi)" : ""}
             </Text>
             {isWinner && (
@@ -221,15 +134,15 @@ export default function BattleResultScreen({ route, navigation }) {
   return (
     <SafeAreaView style={styles.container}>
       <Text style={styles.headerTitle}>Résultats de la partie</Text>
-      {gameInfo && (
-        <Text style={styles.gameCode}>Code de la partie : {gameInfo.code}</Text>
+      {results && (
+        <Text style={styles.gameCode}>Code de la partie : {results.code}</Text>
       )}
 
       {winner && (
         <View style={styles.winnerSection}>
           <Award size={40} color="#FFD700" />
           <Text style={styles.winnerText}>
-            Gagnant : {winner.user?.username || `User ${winner.user_id}`}
+            Gagnant : {winner.username || `User ${winner.user_id}`}
           </Text>
           <Text style={styles.winnerMessage}>
             Félicitations pour la victoire !
@@ -241,8 +154,8 @@ export default function BattleResultScreen({ route, navigation }) {
         Classement des participants :
       </Text>
       <FlatList
-        data={sortedParticipants}
-        keyExtractor={(item) => item.id.toString()}
+        data={rankings}
+        keyExtractor={(item) => item.participant_id.toString()}
         renderItem={renderParticipantResult}
         contentContainerStyle={styles.participantsList}
       />
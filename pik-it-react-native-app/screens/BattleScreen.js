@@ -27,6 +27,7 @@ export default function BattleScreen({ navigation }) {
   const [roomCode, setRoomCode] = useState('');
   const [isCreating, setIsCreating] = useState(false);
   const [isJoining, setIsJoining] = useState(false);
+  const [isQuickJoining, setIsQuickJoining] = useState(false);
 
   const createGame = async () => {
     setIsCreating(true);
@@ -42,6 +43,26 @@ export default function BattleScreen({ navigation }) {
     }
   };
 
+  // Rejoint une partie publique ouverte (ou en crée une si aucune n'est disponible)
+  const quickJoin = async () => {
+    setIsQuickJoining(true);
+    try {
+      const client = await apiClient();
+      const resp = await client.post('/games/quickjoin', { max_objects: 5 });
+      navigation.navigate('BattleLobbyScreen', {
+        gameId: resp.data.game_id,
+        code: resp.data.code,
+        participantId: resp.data.participant_id,
+        isCreator: resp.data.created,
+      });
+    } catch (e) {
+      console.error(e);
+      alert(e.response?.data?.error || 'Aucune partie disponible');
+    } finally {
+      setIsQuickJoining(false);
+    }
+  };
+
   const joinGame = async () => {
     if (!roomCode) return alert('Entrez un code');
     setIsJoining(true);
@@ -79,6 +100,15 @@ export default function BattleScreen({ navigation }) {
           >
             {isCreating ? <ActivityIndicator color="#fff"/> : <Text style={styles.createTxt}>Créer une partie</Text>}
           </TouchableOpacity>
+
+          {/* Bouton Partie rapide */}
+          <TouchableOpacity
+            style={[styles.actionBtn, styles.createBtn]}
+            onPress={quickJoin}
+            disabled={isQuickJoining}
+          >
+            {isQuickJoining ? <ActivityIndicator color="#fff"/> : <Text style={styles.createTxt}>Partie rapide</Text>}
+          </TouchableOpacity>
           
           {/* Section Rejoindre */}
           <View style={styles.joinSection}>
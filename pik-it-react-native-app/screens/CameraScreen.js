@@ -71,8 +71,15 @@ export default function CameraScreen({ route, navigation }) {
       if (challengeId) formData.append("challenge_id", String(challengeId));
       const response = await client.post("/photos/detect", formData, { headers: { "Content-Type": "multipart/form-data" } });
       navigation.navigate("AnnotatedImage", { imageUri: photo.uri, detections: response.data.detections, objectToPhotograph, challengeId });
-    } catch {
-      Alert.alert("Erreur", "Erreur lors de l'envoi de la photo.");
+    } catch (e) {
+      const status = e.response?.status;
+      if (status === 429 || status === 503) {
+        // Serveur saturé ou trop de photos envoyées : réessayer plus tard
+        const retryAfter = e.response.headers?.["retry-after"];
+        Alert.alert("Patientez", `${e.response.data?.error}${retryAfter ? ` (${retryAfter} s)` : ""}`);
+      } else {
+        Alert.alert("Erreur", "Erreur lors de l'envoi de la photo.");
+      }
     } finally {
       setIsUploading(false);
     }
@@ -19,6 +19,8 @@ const ITEM_SIZE = (SCREEN_WIDTH - 48) / 2; // 2 colonnes avec espaces
 
 const PhotoGalleryScreen = ({ navigation }) => {
   const [photos, setPhotos] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -30,8 +32,9 @@ const PhotoGalleryScreen = ({ navigation }) => {
     try {
       setLoading(true);
       setError(null);
-      const photosData = await getUserPhotos();
-      setPhotos(photosData);
+      const page = await getUserPhotos();
+      setPhotos(page.photos);
+      setNextCursor(page.nextCursor);
     } catch (err) {
       console.error('Erreur lors du chargement des photos:', err);
       setError('Impossible de charger les photos');
@@ -41,6 +44,21 @@ const PhotoGalleryScreen = ({ navigation }) => {
     }
   };
 
+  // Page suivante quand on arrive en bas de la galerie
+  const loadMorePhotos = async () => {
+    if (!nextCursor || loadingMore) return;
+    try {
+      setLoadingMore(true);
+      const page = await getUserPhotos(nextCursor);
+      setPhotos((previous) => [...previous, ...page.photos]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error('Erreur lors du chargement des photos:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handlePhotoPress = (photo) => {
     navigation.navigate('PhotoDetailScreen', { 
       photoId: photo.id,
@@ -154,6 +172,9 @@ const PhotoGalleryScreen = ({ navigation }) => {
         contentContainerStyle={styles.photosList}
         showsVerticalScrollIndicator={false}
         ListEmptyComponent={renderEmptyState}
+        onEndReached={loadMorePhotos}
+        onEndReachedThreshold={0.5}
+        ListFooterComponent={loadingMore ? <ActivityIndicator style={{ marginVertical: 16 }} /> : null}
       />
     </SafeAreaView>
   );
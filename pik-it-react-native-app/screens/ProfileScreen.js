@@ -3,13 +3,12 @@ import { View, Text, Image, TouchableOpacity, StyleSheet, Dimensions, ScrollView
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { Settings, User, Edit, BookOpen, Home, Award, Search, ArrowRight } from 'lucide-react-native'; // Importe ArrowRight
 import NavBar from '../components/navbar';
-import { getUserProfile, getUserPhotos } from '../api/userService';
+import { getUserProfile } from '../api/userService';
 
 const { width: SCREEN_WIDTH } = Dimensions.get('window');
 
 const ProfileScreen = ({ navigation }) => {
   const [userProfile, setUserProfile] = useState(null);
-  const [userPhotos, setUserPhotos] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
@@ -22,14 +21,9 @@ const ProfileScreen = ({ navigation }) => {
       setLoading(true);
       setError(null);
 
-      // Récupérer le profil et les photos en parallèle
-      const [profileData, photosData] = await Promise.all([
-        getUserProfile(),
-        getUserPhotos()
-      ]);
-
+      // Le profil contient les compteurs de photos
+      const profileData = await getUserProfile();
       setUserProfile(profileData);
-      setUserPhotos(photosData);
     } catch (err) {
       console.error('Erreur lors du chargement des données:', err);
       setError('Impossible de charger les données du profil');
@@ -56,7 +50,7 @@ const ProfileScreen = ({ navigation }) => {
 
   // Fonction pour calculer les "Piks" (nombre de photos analysées avec succès)
   const getPiksCount = () => {
-    return userPhotos.filter(photo => photo.is_analysed).length;
+    return userProfile?.analysed_photos || 0;
   };
 
   // Fonction pour calculer les titres (basé sur les défis complétés)
@@ -105,7 +99,7 @@ const ProfileScreen = ({ navigation }) => {
   const piks = getPiksCount();
   const titles = getTitlesCount();
   const stats = {
-    images: userPhotos.length,
+    images: userProfile?.photos_count || 0,
     money: getMoneyEarned(),
     picoins: userProfile?.user?.total_coins || 0,
     credits: Math.floor((userProfile?.user?.total_points || 0) / 10), // 10 points = 1 crédit
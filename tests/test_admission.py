@@ -0,0 +1,83 @@
+import pytest
+from backend import admission as admission_module
+from backend.admission import AdmissionController
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission_module.time, "monotonic", clock.monotonic)
+    return clock
+
+
+def admitted(controller, user_id, priority="gallery"):
+    ticket, refusal = controller.try_acquire(user_id, priority)
+    if ticket is not None:
+        ticket.release()
+    return refusal is None
+
+
+def test_burst_is_admitted_then_refused_with_retry_after(clock):
+    controller = AdmissionController(rate=0.5, burst=3, max_in_flight=10)
+
+    assert [admitted(controller, 1) for _ in range(3)] == [True, True, True]
+    ticket, refusal = controller.try_acquire(1, "gallery")
+    assert ticket is None
+    # Un jeton revient en 2 s à 0.5 jeton par seconde
+    assert refusal[0] == 429 and refusal[2] == 2
+
+
+def test_tokens_refill_over_time_up_to_the_burst(clock):
+    controller = AdmissionController(rate=1, burst=2, max_in_flight=10)
+    assert admitted(controller, 1) and admitted(controller, 1)
+    assert not admitted(controller, 1)
+
+    clock.now += 1
+    assert admitted(controller, 1)
+    assert not admitted(controller, 1)
+
+    clock.now += 60
+    assert [admitted(controller, 1) for _ in range(3)] == [True, True, False]
+
+
+def test_buckets_are_per_user(clock):
+    controller = AdmissionController(rate=1, burst=1, max_in_flight=10)
+
+    assert admitted(controller, 1)
+    assert not admitted(controller, 1)
+    assert admitted(controller, 2)
+
+
+def test_in_flight_limit_keeps_room_for_battle(clock):
+    controller = AdmissionController(rate=0, max_in_flight=4, low_priority_share=0.5)
+    tickets = [controller.try_acquire(1, "gallery")[0] for _ in range(2)]
+
+    ticket, refusal = controller.try_acquire(1, "daily")
+    assert ticket is None and refusal[0] == 503
+
+    battle = [controller.try_acquire(1, "battle")[0] for _ in range(2)]
+    assert all(battle)
+    assert controller.try_acquire(1, "battle")[1][0] == 503
+
+    for t in tickets + battle:
+        t.release()
+    assert controller.stats()["in_flight"] == 0
+
+
+def test_ticket_release_is_idempotent(clock):
+    controller = AdmissionController(rate=0, max_in_flight=2)
+    ticket, _ = controller.try_acquire(1, "battle")
+    other, _ = controller.try_acquire(2, "battle")
+
+    ticket.release()
+    ticket.release()
+    assert controller.stats()["in_flight"] == 1
+    other.release()
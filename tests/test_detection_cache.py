@@ -0,0 +1,23 @@
+from backend.detection_cache import DetectionCache, hash_image_bytes
+
+
+def test_entries_are_keyed_by_model_version_and_variant():
+    cache = DetectionCache(maxsize=8, persistent=False)
+    image_hash = hash_image_bytes(b"image")
+    cache.put(image_hash, "v1", "full", [{"name": "cup"}])
+
+    assert cache.get(image_hash, "v1", "full") == [{"name": "cup"}]
+    assert cache.get(image_hash, "v2", "full") is None
+    assert cache.get(image_hash, "v1", "verify:cup") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = DetectionCache(maxsize=2, persistent=False)
+    cache.put("a", "v1", "full", [1])
+    cache.put("b", "v1", "full", [2])
+    cache.get("a", "v1", "full")
+    cache.put("c", "v1", "full", [3])
+
+    assert cache.get("a", "v1", "full") == [1]
+    assert cache.get("b", "v1", "full") is None
+    assert cache.get("c", "v1", "full") == [3]
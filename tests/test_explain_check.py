@@ -0,0 +1,32 @@
+import os
+import pytest
+from backend.explain_check import full_scans
+
+
+def test_full_scans_finds_nested_seq_scans_and_unbounded_index_scans():
+    plan = {"Node Type": "Nested Loop", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "users", "Index Cond": "(id = 1)"},
+        {"Node Type": "Seq Scan", "Relation Name": "rewards"},
+        {"Node Type": "Limit", "Plans": [{"Node Type": "Index Only Scan", "Relation Name": "photos"}]},
+    ]}
+
+    assert full_scans(plan) == ["Seq Scan on rewards", "Index Only Scan without condition on photos"]
+
+
+def test_indexed_plan_has_no_full_scan():
+    plan = {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Index Scan", "Relation Name": "photos", "Index Cond": "(user_id = 1)"}]}
+
+    assert full_scans(plan) == []
+
+
+@pytest.mark.skipif(os.getenv("RUN_DB_TESTS") != "1", reason="RUN_DB_TESTS=1 pour tester sur PostgreSQL")
+def test_crud_queries_use_an_index():
+    # Base PostgreSQL migrée, configurée par les variables DB_* du serveur
+    pytest.importorskip("psycopg2")
+    from backend import create_app
+    from backend.explain_check import check_plans
+
+    with create_app().app_context():
+        failures = check_plans()
+    assert failures == {}
@@ -0,0 +1,19 @@
+from backend import game_events
+from backend.game_events import acquire_game_socket, release_game_socket
+
+
+def test_sockets_are_capped_per_user(monkeypatch):
+    monkeypatch.setattr(game_events, "GAME_CHANNEL_MAX_SOCKETS_PER_USER", 2)
+
+    assert acquire_game_socket(1)
+    assert acquire_game_socket(1)
+    assert not acquire_game_socket(1)
+    # La limite est par utilisateur
+    assert acquire_game_socket(2)
+
+    release_game_socket(1)
+    assert acquire_game_socket(1)
+
+    for user_id in (1, 1, 2):
+        release_game_socket(user_id)
+    assert dict(game_events._open_sockets) == {}
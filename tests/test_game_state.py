@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from backend import game_state as game_state_module
+from backend.game_state import GameStateEngine, ParticipantState
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def participant(version=0, status="in_progress"):
+    return SimpleNamespace(id=7, game_id=3, user_id=11, join_code=None, is_creator=False,
+                           start_time=START, created_at=START, status=status, end_time=None,
+                           version=version)
+
+
+def progress(*names, found=(), skipped=()):
+    rows = []
+    for slot, name in enumerate(names):
+        lap_end = START + timedelta(seconds=10 * (slot + 1)) if slot in found else None
+        rows.append(SimpleNamespace(
+            order_index=slot + 1, object_name=name, found=slot in found, skipped=slot in skipped,
+            lap_start=START if slot in found else None, lap_end=lap_end, found_at=lap_end,
+            skipped_at=START if slot in skipped else None))
+    return rows
+
+
+def test_next_slot_skips_found_and_skipped_objects():
+    state = ParticipantState(participant(), progress("cup", "book", "chair", found={0}, skipped={1}))
+    assert state.next_slot() == 2
+    assert not state.all_found
+
+
+def test_merge_keeps_local_changes_not_found_remotely():
+    local = ParticipantState(participant(), progress("cup", "book"))
+    local.found |= 1
+    local.lap_end[0] = START + timedelta(seconds=3)
+    remote = ParticipantState(participant(version=1), progress("cup", "book", skipped={1}))
+    dirty = {0}
+
+    local.merge(remote, dirty)
+
+    assert dirty == {0}
+    assert local.found == 0b01
+    assert local.lap_end[0] == START + timedelta(seconds=3)
+    # Slot non modifié localement : repris de la base
+    assert local.skipped == 0b10
+    assert local.version == 1
+
+
+def test_merge_keeps_remote_lap_when_found_on_both_sides():
+    local = ParticipantState(participant(), progress("cup", "book"))
+    local.found |= 1
+    local.lap_end[0] = START + timedelta(seconds=3)
+    remote = ParticipantState(participant(version=2), progress("cup", "book", found={0}))
+    dirty = {0}
+
+    local.merge(remote, dirty)
+
+    assert dirty == set()
+    assert local.lap_end[0] == remote.lap_end[0]
+
+
+def test_merge_finishes_participant_when_everything_is_found():
+    local = ParticipantState(participant(), progress("cup", "book", found={0}))
+    local.found |= 0b10
+    local.lap_end[1] = START + timedelta(seconds=42)
+    remote = ParticipantState(participant(version=1), progress("cup", "book", found={0}))
+
+    local.merge(remote, {1})
+
+    assert local.status == "finished"
+    assert local.end_time == START + timedelta(seconds=42)
+
+
+def engine_with(state):
+    engine = GameStateEngine(write_behind=True)
+    engine._games[state.game_id] = {state.id: state}
+    engine._participants[state.id] = state
+    return engine
+
+
+def test_update_drops_result_when_the_slot_was_found_remotely(monkeypatch):
+    state = ParticipantState(participant(), progress("cup"))
+    engine = engine_with(state)
+    remote = ParticipantState(participant(version=1, status="finished"), progress("cup", found={0}))
+    remote.end_time = remote.lap_end[0]
+    conflicts = [{state.id}, set()]
+
+    monkeypatch.setattr(game_state_module, "save_participant_progress",
+                        lambda session, objects, participants: conflicts.pop(0))
+    monkeypatch.setattr(engine, "_merge_from_db",
+                        lambda session, ids: state.merge(remote, engine._dirty.setdefault(state.id, set())))
+
+    end = START + timedelta(seconds=99)
+    _, result = engine.update(None, state.id, lambda s: engine.mark_found(s, 0, START, end))
+
+    assert result is None
+    assert state.lap_end[0] == remote.lap_end[0]
+    assert state.status == "finished"
+
+
+def test_update_keeps_result_when_merge_keeps_the_local_slot(monkeypatch):
+    state = ParticipantState(participant(), progress("cup"))
+    engine = engine_with(state)
+    remote = ParticipantState(participant(version=1), progress("cup"))
+    conflicts = [{state.id}, set()]
+
+    monkeypatch.setattr(game_state_module, "save_participant_progress",
+                        lambda session, objects, participants: conflicts.pop(0))
+    monkeypatch.setattr(engine, "_merge_from_db",
+                        lambda session, ids: state.merge(remote, engine._dirty.setdefault(state.id, set())))
+
+    end = START + timedelta(seconds=99)
+    _, result = engine.update(None, state.id, lambda s: engine.mark_found(s, 0, START, end))
+
+    assert result == {"order_index": 1, "start_time": START.isoformat(), "end_time": end.isoformat()}
+    assert conflicts == []
+    assert engine._dirty == {}
+
+
+class FakeProgress:
+    """Progression en base d'un participant, écrite par compare-and-swap"""
+
+    def __init__(self, *names):
+        self.version = 0
+        self.status = "in_progress"
+        self.rows = progress(*names)
+
+    def load(self, session, participant_id):
+        row = participant(version=self.version, status=self.status)
+        return ParticipantState(row, [SimpleNamespace(**vars(r)) for r in self.rows])
+
+    def save(self, session, objects, participants):
+        if participants[0]["version"] != self.version:
+            return {participants[0]["id"]}
+        for obj in objects:
+            vars(self.rows[obj["order_index"] - 1]).update(
+                {k: v for k, v in obj.items() if k not in ("participant_id", "order_index")})
+        self.version += 1
+        self.status = participants[0]["status"]
+        return set()
+
+
+def default_engine(monkeypatch, db_progress):
+    engine = GameStateEngine(write_behind=False)
+    monkeypatch.setattr(engine, "participant", db_progress.load)
+    monkeypatch.setattr(game_state_module, "save_participant_progress", db_progress.save)
+    return engine
+
+
+def test_default_mode_keeps_a_skip_written_during_a_detection(monkeypatch):
+    db_progress = FakeProgress("cup", "book", "chair")
+    engine = default_engine(monkeypatch, db_progress)
+    end = START + timedelta(seconds=12)
+    calls = []
+
+    def find_cup(state):
+        if not calls:
+            # /games/skip arrive pendant l'inférence de /games/detect
+            engine.update(None, 7, lambda s: engine.mark_skipped(s, 3))
+        calls.append(state)
+        return engine.mark_found(state, 0, START, end)
+
+    state, lap = engine.update(None, 7, find_cup)
+
+    assert lap == {"order_index": 1, "start_time": START.isoformat(), "end_time": end.isoformat()}
+    assert len(calls) == 2  # conflit de version : mutation rejouée sur l'état relu
+    assert db_progress.version == 2
+    assert db_progress.rows[0].found and db_progress.rows[0].lap_end == end
+    assert db_progress.rows[2].skipped
+    assert state.pending == set()
+    assert engine._dirty == {} and engine._participants == {}
+
+
+def test_default_mode_drops_result_when_another_request_found_the_slot(monkeypatch):
+    db_progress = FakeProgress("cup", "book")
+    engine = default_engine(monkeypatch, db_progress)
+    first = START + timedelta(seconds=5)
+    calls = []
+
+    def find_cup(state):
+        if not calls:
+            engine.update(None, 7, lambda s: engine.mark_found(s, 0, START, first))
+        calls.append(state)
+        return engine.mark_found(state, 0, START, START + timedelta(seconds=9))
+
+    _, lap = engine.update(None, 7, find_cup)
+
+    assert lap is None
+    assert db_progress.version == 1
+    assert db_progress.rows[0].lap_end == first
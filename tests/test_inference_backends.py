@@ -0,0 +1,74 @@
+import os
+import pytest
+from backend.inference_backends import compare_detections, exported_model_path
+
+
+def detection(class_id, box, score=0.9):
+    return {"class_id": class_id, "name": str(class_id), "score": score, "box": box}
+
+
+def test_identical_detections_match():
+    detections = [detection(0, [10, 10, 50, 50]), detection(2, [60, 60, 90, 120], 0.5)]
+    assert compare_detections(detections, list(detections)) == []
+
+
+def test_boxes_within_tolerance_match():
+    reference = [detection(0, [10, 10, 50, 50])]
+    candidate = [detection(0, [11.5, 9, 50, 51.9])]
+    assert compare_detections(reference, candidate, box_tolerance=2.0) == []
+
+
+def test_missing_detection_is_reported():
+    reference = [detection(0, [10, 10, 50, 50]), detection(1, [0, 0, 5, 5])]
+    candidate = [detection(0, [10, 10, 50, 50])]
+    mismatches = compare_detections(reference, candidate)
+    assert mismatches == [{"expected": reference[1], "got": None}]
+
+
+def test_moved_box_is_reported():
+    reference = [detection(0, [10, 10, 50, 50])]
+    candidate = [detection(0, [10, 10, 55, 50])]
+    assert compare_detections(reference, candidate) == [{"expected": reference[0], "got": candidate[0]}]
+
+
+def test_extra_candidate_detection_is_reported():
+    reference = [detection(0, [10, 10, 50, 50])]
+    candidate = [detection(0, [10, 10, 50, 50]), detection(3, [100, 100, 150, 150])]
+    assert compare_detections(reference, candidate) == [{"expected": None, "got": candidate[1]}]
+
+
+def test_duplicate_candidate_box_is_reported():
+    reference = [detection(0, [10, 10, 50, 50])]
+    candidate = [detection(0, [10, 10, 50, 50]), detection(0, [10, 11, 50, 50], 0.8)]
+    assert compare_detections(reference, candidate) == [{"expected": None, "got": candidate[1]}]
+
+
+def test_low_scores_are_ignored_both_ways():
+    reference = [detection(0, [10, 10, 50, 50]), detection(1, [0, 0, 5, 5], 0.1)]
+    candidate = [detection(0, [10, 10, 50, 50]), detection(4, [70, 70, 80, 80], 0.2)]
+    assert compare_detections(reference, candidate, min_score=0.3) == []
+
+
+def test_score_crossing_threshold_still_matches():
+    reference = [detection(0, [10, 10, 50, 50], 0.29)]
+    candidate = [detection(0, [10, 10, 50, 50], 0.31)]
+    assert compare_detections(reference, candidate, min_score=0.3) == []
+
+
+@pytest.mark.parametrize("backend, module", [("onnx", "onnxruntime"), ("openvino", "openvino")])
+def test_backend_parity_with_torch(backend, module):
+    pytest.importorskip(module)
+    pytest.importorskip("ultralytics")
+    from ultralytics.utils import ASSETS
+    from backend.inference_backends import check_parity
+    from backend.utils import YOLO_MODEL
+
+    if not os.path.exists(YOLO_MODEL):
+        pytest.skip(f"{YOLO_MODEL} absent")
+    if not os.path.exists(exported_model_path(YOLO_MODEL, backend)) and not os.access(
+            os.path.dirname(os.path.abspath(YOLO_MODEL)), os.W_OK):
+        pytest.skip(f"export {backend} impossible à côté de {YOLO_MODEL}")
+
+    images = sorted(str(path) for path in ASSETS.glob("*.jpg"))
+    report = check_parity(images, backend, YOLO_MODEL)
+    assert {path: m for path, m in report.items() if m} == {}
@@ -0,0 +1,83 @@
+import threading
+import pytest
+from backend.inference import InferenceScheduler
+
+
+class RecordingBatches:
+    """run_batch qui note les lots ; le premier lot attend `release`"""
+
+    def __init__(self):
+        self.batches = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, items):
+        if not self.batches:
+            self.started.set()
+            self.release.wait(5)
+        self.batches.append(list(items))
+        return [f"result:{item}" for item in items]
+
+
+def queue_behind_first_batch(scheduler, run_batch, requests):
+    """Soumet `requests` [(item, priorité)] pendant que le premier lot tourne"""
+    first = scheduler.submit("first")
+    assert run_batch.started.wait(5)
+    futures = [scheduler.submit(item, priority) for item, priority in requests]
+    run_batch.release.set()
+    return [first.result(5)] + [future.result(5) for future in futures]
+
+
+def test_higher_priority_requests_are_served_first():
+    run_batch = RecordingBatches()
+    scheduler = InferenceScheduler(run_batch, max_batch_size=1, max_wait_ms=0)
+
+    queue_behind_first_batch(scheduler, run_batch, [
+        ("bg", "background"), ("gal", "gallery"), ("battle", "battle"), ("day", "daily"), ("gal2", "gallery")
+    ])
+
+    assert run_batch.batches == [["first"], ["battle"], ["day"], ["gal"], ["gal2"], ["bg"]]
+
+
+def test_batch_never_includes_less_urgent_requests():
+    run_batch = RecordingBatches()
+    scheduler = InferenceScheduler(run_batch, max_batch_size=8, max_wait_ms=20)
+
+    results = queue_behind_first_batch(scheduler, run_batch, [
+        ("gal", "gallery"), ("b1", "battle"), ("bg", "background"), ("b2", "battle"), ("day", "daily")
+    ])
+
+    assert run_batch.batches == [["first"], ["b1", "b2"], ["day"], ["gal"], ["bg"]]
+    assert results == ["result:first", "result:gal", "result:b1", "result:bg", "result:b2", "result:day"]
+
+
+def test_batches_are_cut_at_max_batch_size():
+    run_batch = RecordingBatches()
+    scheduler = InferenceScheduler(run_batch, max_batch_size=2, max_wait_ms=20)
+
+    queue_behind_first_batch(scheduler, run_batch, [(f"g{i}", "gallery") for i in range(5)])
+
+    assert run_batch.batches == [["first"], ["g0", "g1"], ["g2", "g3"], ["g4"]]
+
+
+def test_unknown_priority_falls_back_to_default():
+    run_batch = RecordingBatches()
+    scheduler = InferenceScheduler(run_batch, max_batch_size=1, max_wait_ms=0)
+
+    queue_behind_first_batch(scheduler, run_batch, [("bg", "background"), ("odd", "urgent!")])
+
+    assert run_batch.batches == [["first"], ["odd"], ["bg"]]
+    assert scheduler.stats()["gallery"]["processed"] == 2
+    assert scheduler.stats()["background"]["processed"] == 1
+
+
+def test_batch_errors_reach_every_caller():
+    def run_batch(items):
+        raise RuntimeError("model crashed")
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=4, max_wait_ms=20)
+    futures = [scheduler.submit(i) for i in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            future.result(5)
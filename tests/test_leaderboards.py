@@ -0,0 +1,70 @@
+from datetime import datetime
+from backend import leaderboards as leaderboards_module
+from backend.leaderboards import Leaderboard, LeaderboardService, week_start
+
+
+def test_top_and_rank_follow_score_changes():
+    board = Leaderboard()
+    board.set(1, 50)
+    board.set(2, 80)
+    board.set(3, 20)
+    board.add(3, 100)
+
+    assert board.top(2) == [(1, 3, 120), (2, 2, 80)]
+    assert board.rank(1) == (3, 50)
+    assert board.rank(42) is None
+    assert len(board) == 3
+
+
+def test_ties_are_ranked_by_user_id():
+    board = Leaderboard()
+    board.load([(5, 10), (2, 10), (9, 30)])
+
+    assert board.top(10) == [(1, 9, 30), (2, 2, 10), (3, 5, 10)]
+    assert board.rank(5) == (3, 10)
+
+
+def test_load_replaces_the_board():
+    board = Leaderboard()
+    board.set(1, 10)
+    board.load([(2, 5)])
+
+    assert board.top(10) == [(1, 2, 5)]
+    assert board.scores([1, 2]) == {1: 0, 2: 5}
+
+
+def test_week_starts_on_monday_midnight():
+    assert week_start(datetime(2026, 10, 18, 15, 30)) == datetime(2026, 10, 12)
+    assert week_start(datetime(2026, 10, 12, 0, 0)) == datetime(2026, 10, 12)
+
+
+def test_record_points_updates_global_and_weekly_boards(monkeypatch):
+    monkeypatch.setattr(leaderboards_module, "week_start", lambda now=None: datetime(2026, 10, 12))
+    service = LeaderboardService()
+
+    service.record_points(1, total_points=300, points=20)
+    service.record_points(1, total_points=330, points=30)
+    service.record_points(2, total_points=100, points=0)
+
+    assert service.board("global").top(10) == [(1, 1, 330), (2, 2, 100)]
+    assert service.board("weekly").top(10) == [(1, 1, 50)]
+
+
+def test_weekly_board_is_reset_when_the_week_changes(monkeypatch):
+    monkeypatch.setattr(leaderboards_module, "week_start", lambda now=None: datetime(2026, 10, 12))
+    service = LeaderboardService()
+    service.record_points(1, total_points=100, points=100)
+
+    monkeypatch.setattr(leaderboards_module, "week_start", lambda now=None: datetime(2026, 10, 19))
+    service.record_points(2, total_points=10, points=10)
+
+    assert service.board("weekly").top(10) == [(1, 2, 10)]
+    assert service.board("global").rank(1) == (1, 100)
+
+
+def test_friends_board_ranks_the_user_among_friends():
+    service = LeaderboardService()
+    service.global_board.load([(1, 40), (2, 90), (3, 10), (4, 500)])
+
+    # 4 n'est pas un ami ; 5 n'a pas encore de points
+    assert service.friends(1, [2, 3, 5]) == [(1, 2, 90), (2, 1, 40), (3, 3, 10), (4, 5, 0)]
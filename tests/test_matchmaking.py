@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from backend.matchmaking import MatchmakingIndex
+
+CREATED = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def game(game_id, mode="classic", max_objects=5, max_players=4, minutes=0, is_public=True, status="waiting"):
+    return SimpleNamespace(id=game_id, mode=mode, max_objects=max_objects, max_players=max_players,
+                           created_at=CREATED + timedelta(minutes=minutes), is_public=is_public,
+                           status=status)
+
+
+def test_fullest_game_is_reserved_first():
+    index = MatchmakingIndex()
+    index.update(game(1), 1)
+    index.update(game(2), 3)
+    index.update(game(3), 2)
+
+    assert index.reserve() == 2
+
+
+def test_oldest_game_wins_between_equally_full_games():
+    index = MatchmakingIndex()
+    index.update(game(1, minutes=5), 2)
+    index.update(game(2, minutes=1), 2)
+
+    assert index.reserve() == 2
+
+
+def test_reserve_filters_on_mode_and_object_count():
+    index = MatchmakingIndex()
+    index.update(game(1, mode="classic", max_objects=5), 3)
+    index.update(game(2, mode="speed", max_objects=5), 1)
+    index.update(game(3, mode="speed", max_objects=10), 3)
+
+    assert index.reserve(mode="speed", max_objects=5) == 2
+    assert index.reserve(mode="duel") is None
+
+
+def test_reserve_takes_one_slot_until_the_game_is_full():
+    index = MatchmakingIndex()
+    index.update(game(1, max_players=3), 1)
+
+    assert index.reserve() == 1
+    assert index.reserve() == 1
+    assert index.reserve() is None
+
+
+def test_closed_private_and_full_games_are_not_indexed():
+    index = MatchmakingIndex()
+    index.update(game(1, is_public=False), 1)
+    index.update(game(2, status="starting"), 1)
+    index.update(game(3, max_players=2), 2)
+
+    assert index.reserve() is None
+
+
+def test_removed_games_are_skipped():
+    index = MatchmakingIndex()
+    index.update(game(1), 3)
+    index.update(game(2), 2)
+    index.remove(1)
+
+    assert index.reserve() == 2
+
+
+def test_stale_entries_of_an_updated_game_are_skipped():
+    index = MatchmakingIndex()
+    # Partie qui se vide : l'ancienne entrée (1 place libre) ne doit plus servir
+    index.update(game(1), 3)
+    index.update(game(1), 1)
+    index.update(game(2), 2)
+
+    assert index.reserve() == 2
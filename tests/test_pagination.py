@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine, Column, Integer, DateTime
+from sqlalchemy.orm import Session, declarative_base
+from backend.pagination import keyset, page_params, split_page, InvalidCursor
+
+Base = declarative_base()
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret"
+    return app
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        # Deux lignes par instant : l'id départage les égalités
+        session.add_all(Item(id=i, created_at=START + timedelta(minutes=i // 2)) for i in range(1, 12))
+        session.commit()
+        yield session
+
+
+def item_key(item):
+    return [item.created_at, item.id]
+
+
+def cursor_after(app, rows, limit, scope="items", owner=1):
+    with app.app_context():
+        return split_page(rows, limit, item_key, scope, owner)
+
+
+def params(app, scope="items", owner=1, **args):
+    with app.test_request_context("/", query_string=args):
+        return page_params(scope, owner)
+
+
+def test_pages_cover_every_row_once_newest_first(app, session):
+    seen, after = [], None
+    while True:
+        rows = keyset(session.query(Item), [Item.created_at, Item.id], after, 4)
+        page, cursor = cursor_after(app, rows, 4)
+        seen.extend(item.id for item in page)
+        if cursor is None:
+            break
+        _, after = params(app, cursor=cursor)
+
+    assert seen == list(range(11, 0, -1))
+
+
+def test_rows_added_between_pages_do_not_shift_the_next_page(app, session):
+    rows = keyset(session.query(Item), [Item.created_at, Item.id], None, 3)
+    page, cursor = cursor_after(app, rows, 3)
+    session.add(Item(id=100, created_at=START + timedelta(days=1)))
+    session.commit()
+
+    _, after = params(app, cursor=cursor)
+    next_page = keyset(session.query(Item), [Item.created_at, Item.id], after, 3)[:3]
+    assert [item.id for item in page] == [11, 10, 9]
+    assert [item.id for item in next_page] == [8, 7, 6]
+
+
+def test_last_page_has_no_cursor(app, session):
+    rows = keyset(session.query(Item), [Item.created_at, Item.id], None, 20)
+    page, cursor = cursor_after(app, rows, 20)
+    assert len(page) == 11 and cursor is None
+
+
+def test_limit_is_clamped_and_defaults(app):
+    assert params(app) == (20, None)
+    assert params(app, limit=1000)[0] == 100
+    assert params(app, limit=0)[0] == 1
+    with pytest.raises(InvalidCursor):
+        params(app, limit="ten")
+
+
+def test_cursor_is_bound_to_route_and_user(app):
+    _, cursor = cursor_after(app, [Item(id=2, created_at=START), Item(id=1, created_at=START)], 1)
+
+    assert params(app, cursor=cursor)[1] == [START.isoformat(), 2]
+    with pytest.raises(InvalidCursor):
+        params(app, owner=2, cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        params(app, scope="rewards", cursor=cursor)
+
+
+def test_tampered_or_foreign_cursor_is_rejected(app):
+    _, cursor = cursor_after(app, [Item(id=2, created_at=START), Item(id=1, created_at=START)], 1)
+
+    with pytest.raises(InvalidCursor):
+        params(app, cursor=cursor[:-2] + ("A" if cursor[-2] != "A" else "B") + cursor[-1])
+    app.config["JWT_SECRET_KEY"] = "another-secret"
+    with pytest.raises(InvalidCursor):
+        params(app, cursor=cursor)
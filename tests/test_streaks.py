@@ -0,0 +1,47 @@
+from datetime import date
+from types import SimpleNamespace
+from backend.streaks import advance_streak, next_streak
+
+DAY = date(2026, 3, 10)
+
+
+def user(last_active_day=None, current_streak=0, longest_streak=0):
+    return SimpleNamespace(last_active_day=last_active_day, current_streak=current_streak,
+                           longest_streak=longest_streak)
+
+
+def test_first_completion_starts_a_streak():
+    u = user(current_streak=None, longest_streak=None)
+    assert advance_streak(u, DAY) == 1
+    assert (u.last_active_day, u.longest_streak) == (DAY, 1)
+
+
+def test_next_day_extends_the_streak_and_the_record():
+    u = user(date(2026, 3, 9), current_streak=4, longest_streak=4)
+    assert next_streak(u, DAY) == 5
+    assert advance_streak(u, DAY) == 5
+    assert u.longest_streak == 5
+
+
+def test_second_completion_on_the_same_day_keeps_the_streak():
+    u = user(DAY, current_streak=3, longest_streak=7)
+    assert advance_streak(u, DAY) == 3
+    assert u.longest_streak == 7
+
+
+def test_missed_day_resets_the_streak_but_not_the_record():
+    u = user(date(2026, 3, 8), current_streak=6, longest_streak=6)
+    assert advance_streak(u, DAY) == 1
+    assert (u.current_streak, u.longest_streak, u.last_active_day) == (1, 6, DAY)
+
+
+def test_older_completion_does_not_move_the_streak_back():
+    u = user(DAY, current_streak=2, longest_streak=2)
+    assert advance_streak(u, date(2026, 3, 1)) == 2
+    assert u.last_active_day == DAY
+
+
+def test_next_streak_does_not_modify_the_user():
+    u = user(date(2026, 3, 9), current_streak=2, longest_streak=2)
+    next_streak(u, DAY)
+    assert (u.current_streak, u.last_active_day) == (2, date(2026, 3, 9))